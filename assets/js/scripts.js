@@ -56,10 +56,61 @@
             }
         };
 
-        // Function to load statistics from JSON
+        // Content-hashed file names written by data/publish.py, empty until the manifest has arrived
+        let assetManifest = {};
+
+        // Fetch the manifest in the background, nothing waits for it: the plain paths work until it is in.
+        // Only a page publish.py marked has one, elsewhere the plain paths are all there is
+        function loadAssetManifest() {
+            const meta = document.querySelector('meta[name="asset-manifest"]');
+            if (!meta) {
+                return;
+            }
+            fetch(meta.content, { cache: 'no-cache' })
+                .then(response => response.ok ? response.json() : { assets: {} })
+                .then(manifest => { assetManifest = manifest.assets || {}; })
+                .catch(() => {});
+        }
+
+        // Resolve a data path to its published, immutable copy once the manifest says there is one
+        function resolveAsset(path) {
+            return assetManifest[path] || path;
+        }
+
+        // Function to load the counters index, a few hundred bytes with just the averages
         async function loadStatisticsFromJSON() {
             try {
-                const response = await fetch('data/statistics.json');
+                const response = await fetch(resolveAsset('data/api/counters.json'));
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                const index = await response.json();
+                const monthlyForecasts = index.monthly || {};
+
+                Object.keys(index.counters).forEach(id => {
+                    const [dailyAverage, monthlyAverage, yearlyAverage] = index.counters[id];
+                    counters[id] = {
+                        dailyAverage: dailyAverage,
+                        monthlyAverage: monthlyAverage,
+                        yearlyAverage: yearlyAverage,
+                        monthlyForecast: monthlyForecasts[id] || null,
+                        current: 0,
+                    };
+                });
+
+                console.log('Counters index loaded successfully');
+                return index;
+            } catch (error) {
+                console.error('Error loading counters index:', error);
+                console.log('Falling back to statistics.json...');
+                return loadFullStatisticsFromJSON();
+            }
+        }
+
+        // Function to load statistics from the full JSON (fallback when the index is missing)
+        async function loadFullStatisticsFromJSON() {
+            try {
+                const response = await fetch(resolveAsset('data/statistics.json'));
                 if (!response.ok) {
                     throw new Error(`HTTP error! status: ${response.status}`);
                 }
@@ -71,6 +122,7 @@
                     dailyAverage: stats.traffic_accidents_deaths.deaths.daily_average,
                     monthlyAverage: stats.traffic_accidents_deaths.deaths.monthly_average,
                     yearlyAverage: stats.traffic_accidents_deaths.deaths.yearly_average,
+                    monthlyForecast: stats.traffic_accidents_deaths.deaths.monthly_forecast || null,
                     current: 0,
                 };
                 
@@ -141,64 +193,91 @@
 
         let currentPeriod = 'daily';
         let isRealTime = false;
-        let updateInterval;
         let pageLoadTime = new Date();
         let statisticsData = null;
         let currentChart = null;
         let modalData = {};
 
+        // Counter ids and their entries in statistics.json details
+        const detailsMapping = {
+            'traffic-deaths': 'traffic_accidents_deaths',
+            'education-dropouts': 'education_dropouts', 
+            'pollution-deaths': 'air_pollution_deaths',
+            'workers-deaths': 'workers_deaths',
+            'unemployment-claims': 'unemployment_claims',
+            'new-births': 'births',
+            'violence-against-women': 'violence_against_women_deaths',
+            'soil-erosion': 'soil_erosion',
+            'death-penalty': 'death_penalty'
+        };
+
+        // Build the modal data of one counter from its details entry
+        function buildModalEntry(key, details) {
+            const entry = {
+                title: details.title,
+                description: details.description,
+                sources: details.sources,
+                sourcesLinks: details.sources_links || null,
+                chartData: details.chartData,
+                chartYears: details.chartYears,
+                chart: details.chart || null
+            };
+            
+            // Add world data for traffic accidents, air pollution deaths, and workers deaths
+            if ((key === 'traffic-deaths' || key === 'pollution-deaths' || key === 'workers-deaths') && details.world) {
+                entry.worldData = details.world;
+                entry.worldYears = details.world.chartYears;
+                
+                // Extract world sources data
+                entry.worldSources = {};
+                Object.keys(details.world).forEach(countryKey => {
+                    if (countryKey !== 'chartYears' && details.world[countryKey]) {
+                        const countryData = details.world[countryKey];
+                        entry.worldSources[countryKey] = {
+                            source: countryData.source,
+                            sources_link: countryData.sources_link || []
+                        };
+                    }
+                });
+            }
+            
+            return entry;
+        }
+
         // Load modal data from JSON
         function loadModalDataFromJSON(data) {
             if (!data || !data.iran_statistics || !data.iran_statistics.details) return;
             
             const details = data.iran_statistics.details;
-            const mapping = {
-                'traffic-deaths': 'traffic_accidents_deaths',
-                'education-dropouts': 'education_dropouts', 
-                'pollution-deaths': 'air_pollution_deaths',
-                'workers-deaths': 'workers_deaths',
-                'unemployment-claims': 'unemployment_claims',
-                'new-births': 'births',
-                'violence-against-women': 'violence_against_women_deaths',
-                'soil-erosion': 'soil_erosion',
-                'death-penalty': 'death_penalty'
-            };
             
-        Object.keys(mapping).forEach(key => {
-            const jsonKey = mapping[key];
+        Object.keys(detailsMapping).forEach(key => {
+            const jsonKey = detailsMapping[key];
             if (details[jsonKey]) {
-                modalData[key] = {
-                    title: details[jsonKey].title,
-                    description: details[jsonKey].description,
-                    sources: details[jsonKey].sources,
-                    sourcesLinks: details[jsonKey].sources_links || null,
-                    chartData: details[jsonKey].chartData,
-                    chartYears: details[jsonKey].chartYears
-                };
-                
-                // Add world data for traffic accidents, air pollution deaths, and workers deaths
-                if ((key === 'traffic-deaths' || key === 'pollution-deaths' || key === 'workers-deaths') && details[jsonKey].world) {
-                    modalData[key].worldData = details[jsonKey].world;
-                    modalData[key].worldYears = details[jsonKey].world.chartYears;
-                    
-                    // Extract world sources data
-                    modalData[key].worldSources = {};
-                    Object.keys(details[jsonKey].world).forEach(countryKey => {
-                        if (countryKey !== 'chartYears' && details[jsonKey].world[countryKey]) {
-                            const countryData = details[jsonKey].world[countryKey];
-                            modalData[key].worldSources[countryKey] = {
-                                source: countryData.source,
-                                sources_link: countryData.sources_link || []
-                            };
-                        }
-                    });
-                }
+                modalData[key] = buildModalEntry(key, details[jsonKey]);
             }
         });
             
             console.log('Modal data loaded from JSON:', modalData);
         }
 
+        // Fetch a counter's detail file the first time its modal is opened
+        async function loadModalData(counterId) {
+            if (modalData[counterId]) return modalData[counterId];
+            
+            try {
+                const response = await fetch(resolveAsset(`data/api/details/${counterId}.json`));
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                modalData[counterId] = buildModalEntry(counterId, await response.json());
+            } catch (error) {
+                console.error(`Error loading details for '${counterId}':`, error);
+                return null;
+            }
+            
+            return modalData[counterId];
+        }
+
         // Persian calendar utilities
         function getIranTime() {
             // Get current time in Iran timezone
@@ -256,9 +335,60 @@
             return [jy, jm, jd];
         }
 
+        // Persian month start days from data/api/calendar.json, null until loaded
+        let persianCalendar = null;
+
+        // Build the month start days (days since 1970-01-01) from the first Farvardin 1 and the leap years
+        async function loadPersianCalendar() {
+            try {
+                const response = await fetch(resolveAsset('data/api/calendar.json'));
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                const table = await response.json();
+                const starts = new Int32Array(table.leap.length * 12 + 1);
+                starts[0] = table.first_day;
+                table.leap.forEach((leap, year) => {
+                    for (let m = 0; m < 12; m++) {
+                        const length = m < 6 ? 31 : (m < 11 ? 30 : (leap ? 30 : 29));
+                        starts[year * 12 + m + 1] = starts[year * 12 + m] + length;
+                    }
+                });
+                persianCalendar = { firstYear: table.first_year, starts: starts };
+            } catch (error) {
+                console.error('Error loading the calendar table, converting dates arithmetically:', error);
+            }
+        }
+
+        // Month of the calendar table an Iran time falls in, by binary search, or null outside the table
+        function locatePersianMonth(iranTime) {
+            if (!persianCalendar) return null;
+            const starts = persianCalendar.starts;
+            const day = Math.floor(Date.UTC(iranTime.getFullYear(), iranTime.getMonth(), iranTime.getDate()) / 86400000);
+            if (day < starts[0] || day >= starts[starts.length - 1]) return null;
+            let low = 0;
+            let high = starts.length - 1;
+            while (high - low > 1) {
+                const middle = (low + high) >> 1;
+                if (starts[middle] <= day) low = middle; else high = middle;
+            }
+            const yearStart = low - low % 12;
+            return {
+                year: persianCalendar.firstYear + Math.floor(low / 12),
+                month: low % 12 + 1,
+                day: day - starts[low] + 1,
+                monthProgress: (day - starts[low]) / (starts[low + 1] - starts[low]),
+                yearProgress: (day - starts[yearStart]) / (starts[yearStart + 12] - starts[yearStart]),
+                dayOfYear: day - starts[yearStart] + 1
+            };
+        }
+
         function getPersianDate(date = null) {
             const iranTime = date || getIranTime();
-            const [jy, jm, jd] = gregorianToJalali(iranTime.getFullYear(), iranTime.getMonth() + 1, iranTime.getDate());
+            const located = locatePersianMonth(iranTime);
+            const [jy, jm, jd] = located
+                ? [located.year, located.month, located.day]
+                : gregorianToJalali(iranTime.getFullYear(), iranTime.getMonth() + 1, iranTime.getDate());
             
             const monthNames = [
                 'فروردین', 'اردیبهشت', 'خرداد', 'تیر', 'مرداد', 'شهریور',
@@ -316,8 +446,7 @@
         };
 
         // Calculate progress through current period
-        function getProgressThroughPeriod(period) {
-            const now = getIranTime();
+        function getProgressThroughPeriod(period, now = getIranTime()) {
             
             switch(period) {
                 case 'real-time':
@@ -333,6 +462,8 @@
                     
                 case 'monthly':
                     // Progress through current Persian month (0-1)
+                    const locatedMonth = locatePersianMonth(now);
+                    if (locatedMonth) return Math.max(0, Math.min(1, locatedMonth.monthProgress));
                     const persianDate = getPersianDate(now);
                     const daysInPersianMonth = persianDate.month <= 6 ? 31 : (persianDate.month <= 11 ? 30 : 29);
                     const monthProgress = (persianDate.day - 1) / daysInPersianMonth; // day-1 because day starts from 1
@@ -340,6 +471,8 @@
                     
                 case 'yearly':
                     // Progress through current Persian year (0-1)
+                    const locatedYear = locatePersianMonth(now);
+                    if (locatedYear) return Math.max(0, Math.min(1, locatedYear.yearProgress));
                     const currentPersian = getPersianDate(now);
                     // Calculate day of year in Persian calendar
                     let dayOfYear = 0;
@@ -355,86 +488,132 @@
             }
         }
 
+        // Expected total of the current Persian month, from the monthly forecast when there is one
+        function monthlyTotal(counter, now = getIranTime()) {
+            if (counter.monthlyForecast) {
+                const persianDate = getPersianDate(now);
+                const month = `${persianDate.year}-${String(persianDate.month).padStart(2, '0')}`;
+                if (counter.monthlyForecast[month] !== undefined) return counter.monthlyForecast[month];
+            }
+            return counter.monthlyAverage;
+        }
+
+        // Expected total of a whole period
+        function periodTotal(counter, period, now = getIranTime()) {
+            if (period === 'monthly') return monthlyTotal(counter, now);
+            return counter[period + 'Average'] || counter.dailyAverage;
+        }
+
+        // Counter elements, looked up once
+        const counterElements = {};
+
+        function getCounterElements(id) {
+            if (!counterElements[id]) {
+                const value = document.getElementById(id);
+                if (value) {
+                    // Ends the update animation without a timer per counter per tick
+                    value.addEventListener('animationend', () => value.classList.remove('counter-animation'));
+                }
+                counterElements[id] = {
+                    value: value,
+                    period: document.getElementById(id + '-period'),
+                    rate: document.getElementById(id + '-rate')
+                };
+            }
+            return counterElements[id];
+        }
+
+        // Last text written to each element, so unchanged text is neither read back nor rewritten
+        const writtenText = new WeakMap();
+
+        function setText(element, text) {
+            if (writtenText.get(element) === text) return false;
+            writtenText.set(element, text);
+            if (element.textContent === text) return false;
+            element.textContent = text;
+            return true;
+        }
+
+        // Value of every counter for the period at one time base
+        function computeCounterValues(period, now) {
+            const values = {};
+            if (period === 'real-time') {
+                const secondsSincePageLoad = getProgressThroughPeriod('real-time', now);
+                Object.keys(counters).forEach(id => {
+                    const perSecondRate = counters[id].dailyAverage / (24 * 60 * 60);
+                    values[id] = Math.floor(perSecondRate * secondsSincePageLoad);
+                });
+            } else {
+                const progress = getProgressThroughPeriod(period, now);
+                Object.keys(counters).forEach(id => {
+                    values[id] = Math.floor(periodTotal(counters[id], period, now) * progress);
+                });
+            }
+            return values;
+        }
+
         // Initialize counters based on selected period
         function initializeCounters(period) {
+            const now = getIranTime();
+            // Real-time: start from 0 when the period is picked, progressive periods from the time elapsed
+            const values = period === 'real-time' ? {} : computeCounterValues(period, now);
             Object.keys(counters).forEach(id => {
-                const counter = counters[id];
-                
-                if (period === 'real-time') {
-                    // Real-time: start from 0 when page loads
-                    counter.current = 0;
-                } else {
-                    // Progressive periods: show progress based on time elapsed
-                    const progress = getProgressThroughPeriod(period);
-                    const key = period + 'Average';
-                    counter.current = Math.floor((counter[key] || counter.dailyAverage) * progress);
-                }
-                
-                updateDisplay(id, counter.current, period);
+                counters[id].current = values[id] || 0;
+                updateDisplay(id, counters[id].current, period);
             });
             
-            updatePeriodLabels(period);
+            updatePeriodLabels(period, now);
         }
 
         // Update display with animation
         function updateDisplay(id, value, period) {
-            const element = document.getElementById(id);
+            const element = getCounterElements(id).value;
             if (!element) {
                 console.error(`Element with ID '${id}' not found`);
                 return;
             }
             
-            const formattedValue = value.toLocaleString('fa-IR');
-            
-            if (element.textContent !== formattedValue) {
-                element.textContent = formattedValue;
+            if (setText(element, value.toLocaleString('fa-IR'))) {
                 element.classList.add('counter-animation');
-                setTimeout(() => element.classList.remove('counter-animation'), 600);
             }
         }
 
         // Update period labels and rates
-        function updatePeriodLabels(period) {
+        function updatePeriodLabels(period, now = getIranTime()) {
             const config = periodConfig[period];
             
+            // The same description for every counter
+            let periodText = `${config.label}`;
+            if (period === 'daily') {
+                periodText = `${config.label} تا ساعت ${getPersianTime(now)}`;
+            } else if (period === 'monthly') {
+                const persianDate = getPersianDate(now);
+                periodText = `${config.label} تا روز ${persianDate.day} ${persianDate.monthName}`;
+            } else if (period === 'yearly') {
+                const persianDate = getPersianDate(now);
+                const located = locatePersianMonth(now);
+                const startOfYear = new Date();
+                startOfYear.setMonth(2, 21); // Approximate start of Persian year (March 21)
+                const dayOfYear = located
+                    ? located.dayOfYear
+                    : Math.floor((now - startOfYear) / (24 * 60 * 60 * 1000)) + 1;
+                periodText = `${config.label} تا روز ${Math.max(1, dayOfYear)} سال ${persianDate.year}`;
+            }
+            
             Object.keys(counters).forEach(id => {
-                const periodElement = document.getElementById(id + '-period');
-                const rateElement = document.getElementById(id + '-rate');
+                const elements = getCounterElements(id);
                 const counter = counters[id];
                 
-                if (!periodElement) {
+                if (!elements.period) {
                     console.error(`Period element with ID '${id}-period' not found`);
                     return;
                 }
-                if (!rateElement) {
+                if (!elements.rate) {
                     console.error(`Rate element with ID '${id}-rate' not found`);
                     return;
                 }
                 
-                // Update period description
-                if (period === 'real-time') {
-                    periodElement.textContent = `${config.label}`;
-                } else {
-                    const progress = getProgressThroughPeriod(period);
-                    let progressText = '';
-                    
-                    if (period === 'daily') {
-                        const iranTime = getIranTime();
-                        const timeString = getPersianTime(iranTime);
-                        progressText = `تا ساعت ${timeString}`;
-                    } else if (period === 'monthly') {
-                        const persianDate = getPersianDate();
-                        progressText = `تا روز ${persianDate.day} ${persianDate.monthName}`;
-                    } else if (period === 'yearly') {
-                        const persianDate = getPersianDate();
-                        const startOfYear = new Date();
-                        startOfYear.setMonth(2, 21); // Approximate start of Persian year (March 21)
-                        const dayOfYear = Math.floor((getIranTime() - startOfYear) / (24 * 60 * 60 * 1000)) + 1;
-                        progressText = `تا روز ${Math.max(1, dayOfYear)} سال ${persianDate.year}`;
-                    }
-                    
-                    periodElement.textContent = `${config.label} ${progressText}`;
-                }
+                setText(elements.period, periodText);
                 
                 // Update rate information
                 let rateText = '';
@@ -446,57 +625,79 @@
                         rateText = `~${counter.dailyAverage.toLocaleString('fa-IR')} در روز`;
                         break;
                     case 'monthly':
-                        rateText = `~${counter.monthlyAverage.toLocaleString('fa-IR')} در ماه`;
+                        rateText = `~${monthlyTotal(counter, now).toLocaleString('fa-IR')} در ماه`;
                         break;
                     case 'yearly':
                         rateText = `~${counter.yearlyAverage.toLocaleString('fa-IR')} در سال`;
                         break;
                 }
-                rateElement.textContent = rateText;
+                setText(elements.rate, rateText);
             });
         }
 
-        // Real-time counter updates
-        function updateCountersRealTime() {
-            if (!isRealTime) return;
-            
-            Object.keys(counters).forEach(id => {
-                const counter = counters[id];
-                const secondsSincePageLoad = getProgressThroughPeriod('real-time');
-                const perSecondRate = counter.dailyAverage / (24 * 60 * 60);
-                
-                // Calculate expected count based on time elapsed
-                counter.current = Math.floor(perSecondRate * secondsSincePageLoad);
-                updateDisplay(id, counter.current, 'real-time');
-            });
-
-            // Update timestamp with corrected Iran time
-            const iranTime = getIranTime();
-            const timeString = getPersianTime(iranTime);
-            const persianDate = getPersianDate(iranTime);
-            document.getElementById('last-update').textContent = `${timeString} - ${persianDate.formatted}`;
+        function updateLastUpdate(now = getIranTime()) {
+            setText(document.getElementById('last-update'), `${getPersianTime(now)} - ${getPersianDate(now).formatted}`);
         }
 
-        // Update progressive counters for daily/monthly/yearly views
-        function updateProgressiveCounters() {
-            if (isRealTime) return;
+        // One update of the current period: the time base is taken once, every value is computed
+        // before anything is written, then the changed texts are written in a single pass
+        function renderCounters() {
+            const now = getIranTime();
+            const values = computeCounterValues(currentPeriod, now);
             
-            Object.keys(counters).forEach(id => {
-                const counter = counters[id];
-                const progress = getProgressThroughPeriod(currentPeriod);
-                const key = currentPeriod + 'Average';
-                const expectedCount = Math.floor((counter[key] || counter.dailyAverage) * progress);
-                
-                if (counter.current !== expectedCount) {
-                    counter.current = expectedCount;
-                    updateDisplay(id, counter.current, currentPeriod);
+            Object.keys(values).forEach(id => {
+                if (counters[id].current !== values[id]) {
+                    counters[id].current = values[id];
+                    updateDisplay(id, values[id], currentPeriod);
                 }
             });
             
-            // Update period labels to reflect current time
-            updatePeriodLabels(currentPeriod);
+            if (isRealTime) {
+                updateLastUpdate(now);
+            } else {
+                // Update period labels to reflect current time
+                updatePeriodLabels(currentPeriod, now);
+            }
+        }
+
+        // Single scheduler for all counter updates: sleeps until the next second (real-time) or
+        // minute boundary, renders in an animation frame and stops while the tab is hidden
+        const scheduler = { timer: null, frame: null };
+
+        function scheduleNextUpdate() {
+            const interval = isRealTime ? periodConfig['real-time'].updateFrequency : 60000;
+            scheduler.timer = setTimeout(() => {
+                scheduler.timer = null;
+                scheduler.frame = requestAnimationFrame(() => {
+                    scheduler.frame = null;
+                    renderCounters();
+                    scheduleNextUpdate();
+                });
+            }, interval - Date.now() % interval);
         }
 
+        function stopUpdates() {
+            clearTimeout(scheduler.timer);
+            cancelAnimationFrame(scheduler.frame);
+            scheduler.timer = null;
+            scheduler.frame = null;
+        }
+
+        function startUpdates() {
+            stopUpdates();
+            if (!document.hidden) scheduleNextUpdate();
+        }
+
+        document.addEventListener('visibilitychange', () => {
+            if (document.hidden) {
+                stopUpdates();
+            } else {
+                // Catch up at once with the time spent hidden
+                renderCounters();
+                startUpdates();
+            }
+        });
+
         // Handle period button clicks
         function setupPeriodButtons() {
             const buttons = document.querySelectorAll('.period-btn');
@@ -514,30 +715,19 @@
                     currentPeriod = newPeriod;
                     isRealTime = newPeriod === 'real-time';
                     
-                    // Clear existing interval
-                    if (updateInterval) {
-                        clearInterval(updateInterval);
-                        updateInterval = null;
-                    }
-                    
                     // Initialize counters for new period
                     initializeCounters(newPeriod);
                     
-                    // Start appropriate updates
-                    if (isRealTime) {
-                        updateInterval = setInterval(updateCountersRealTime, 1000);
-                    } else {
-                        // Update progressive counters every minute for daily/monthly/yearly
-                        updateInterval = setInterval(updateProgressiveCounters, 60000);
-                    }
+                    // Every second for real-time, every minute for daily/monthly/yearly
+                    startUpdates();
                 });
             });
         }
 
         // Modal functionality
-        function openModal(counterId) {
+        async function openModal(counterId) {
             const modal = document.getElementById('detailModal');
-            const data = modalData[counterId];
+            const data = await loadModalData(counterId);
             const counter = counters[counterId];
             
             if (!data || !counter) return;
@@ -637,7 +827,7 @@
             }
             
             // Create chart
-            createChart(data.chartData, data.chartYears, data.title, counterId);
+            createChart(data, counterId);
             
             // Show modal
             modal.style.display = 'block';
@@ -646,113 +836,125 @@
         function closeModal() {
             const modal = document.getElementById('detailModal');
             modal.style.display = 'none';
-            
-            // Destroy existing chart
-            if (currentChart) {
-                currentChart.destroy();
-                currentChart = null;
+            // The chart is kept, the next modal only swaps its datasets
+        }
+
+        // Dataset styles of the series a chart can show, Iran first
+        const chartStyles = {
+            Iran: { label: 'ایران', color: '#60a5fa', pointBorderColor: '#1e40af', fill: true, borderWidth: 3, pointRadius: 6 },
+            Turkey: { label: 'ترکیه', color: '#f59e0b', pointBorderColor: '#d97706' },
+            US: { label: 'آمریکا', color: '#ef4444', pointBorderColor: '#dc2626' },
+            EU: { label: 'اتحادیه اروپا', color: '#10b981', pointBorderColor: '#059669' },
+            Germany: { label: 'آلمان', color: '#8b5cf6', pointBorderColor: '#7c3aed' }
+        };
+
+        // Integers written by chart_payload.encode(): plain, delta coded, or base64 zigzag varints of the deltas
+        function decodeSeries(encoded, encoding) {
+            if (encoding === 'plain') return encoded;
+            let deltas = encoded;
+            if (encoding === 'varint') {
+                const bytes = atob(encoded);
+                deltas = [];
+                let value = 0;
+                let scale = 1;
+                for (let i = 0; i < bytes.length; i++) {
+                    const byte = bytes.charCodeAt(i);
+                    value += (byte & 0x7f) * scale;
+                    if (byte & 0x80) {
+                        scale *= 128;
+                        continue;
+                    }
+                    deltas.push(value % 2 ? -(value + 1) / 2 : value / 2);
+                    value = 0;
+                    scale = 1;
+                }
             }
+            let total = 0;
+            return deltas.map(delta => total += delta);
         }
 
-        function createChart(chartData, chartYears, title, counterId = null) {
-            const ctx = document.getElementById('statisticsChart').getContext('2d');
-            
-            // Destroy existing chart
-            if (currentChart) {
-                currentChart.destroy();
+        // The chart payload of a modal entry, built from the full arrays of statistics.json when the details file had none
+        function getChartPayload(data, counterId) {
+            if (data.chart) return data.chart;
+            const series = [{ key: 'Iran', years: data.chartYears || [], values: data.chartData || [] }];
+            if ((counterId === 'traffic-deaths' || counterId === 'pollution-deaths' || counterId === 'workers-deaths') && data.worldData) {
+                Object.keys(data.worldData).forEach(country => {
+                    if (country !== 'chartYears') {
+                        series.push({ key: country, years: data.worldYears, values: data.worldData[country].chartData });
+                    }
+                });
             }
+            const payload = { encoding: 'plain', years: [], y: [], series: [] };
+            let years = [];
+            let values = [];
+            series.forEach(entry => {
+                const pairs = entry.years.map((year, i) => [year, entry.values[i]]).filter(pair => pair[1] !== null && pair[1] !== undefined);
+                years = years.concat(entry.years);
+                values = values.concat(pairs.map(pair => pair[1]));
+                if (pairs.length) {
+                    payload.series.push({ key: entry.key, years: pairs.map(pair => pair[0]), values: pairs.map(pair => pair[1]) });
+                }
+            });
+            if (years.length) payload.years = [Math.min(...years), Math.max(...years)];
+            if (values.length) payload.y = [Math.min(...values), Math.max(...values)];
+            return payload;
+        }
+
+        // Labels and Chart.js datasets of a modal entry, decoded once and kept on the entry
+        function getChartDatasets(data, counterId) {
+            if (data.chartDatasets) return data.chartDatasets;
+            const payload = getChartPayload(data, counterId);
+            const [first, last] = payload.years.length ? payload.years : [1398, 1404];
+            const labels = [];
+            for (let year = first; year <= last; year++) labels.push(year.toString());
+            
+            const datasets = [];
+            payload.series.forEach(series => {
+                const style = chartStyles[series.key];
+                if (!style) return;
+                // Back onto the label axis, the missing years are gaps in the line
+                const points = new Array(labels.length).fill(null);
+                // A series with fractional values is written plain whatever the payload encoding
+                const encoding = series.encoding || payload.encoding;
+                const values = decodeSeries(series.values, encoding);
+                decodeSeries(series.years, encoding).forEach((year, i) => { points[year - first] = values[i]; });
+                datasets.push({
+                    label: style.label,
+                    data: points,
+                    borderColor: style.color,
+                    backgroundColor: style.color + '1a',
+                    borderWidth: style.borderWidth || 2,
+                    fill: style.fill || false,
+                    tension: 0.4,
+                    pointBackgroundColor: style.color,
+                    pointBorderColor: style.pointBorderColor,
+                    pointBorderWidth: 2,
+                    pointRadius: style.pointRadius || 5
+                });
+            });
             
-            // Convert Persian years to display format
-            const persianYears = chartYears ? chartYears.map(year => year.toString()) : ['۱۳۹۸', '۱۳۹۹', '۱۴۰۰', '۱۴۰۱', '۱۴۰۲', '۱۴۰۳', '۱۴۰۴'];
-            
-            let datasets = [{
-                label: 'ایران',
-                data: chartData,
-                borderColor: '#60a5fa',
-                backgroundColor: 'rgba(96, 165, 250, 0.1)',
-                borderWidth: 3,
-                fill: true,
-                tension: 0.4,
-                pointBackgroundColor: '#60a5fa',
-                pointBorderColor: '#1e40af',
-                pointBorderWidth: 2,
-                pointRadius: 6
-            }];
+            data.chartDatasets = { labels: labels, datasets: datasets, y: payload.y };
+            return data.chartDatasets;
+        }
 
-            // Add world data for traffic accidents, air pollution deaths, and workers deaths
-            if ((counterId === 'traffic-deaths' || counterId === 'pollution-deaths' || counterId === 'workers-deaths') && modalData[counterId] && modalData[counterId].worldData) {
-                const worldData = modalData[counterId].worldData;
-                const worldYears = modalData[counterId].worldYears;
-                
-                if (worldData.Turkey) {
-                    datasets.push({
-                        label: 'ترکیه',
-                        data: worldData.Turkey.chartData,
-                        borderColor: '#f59e0b',
-                        backgroundColor: 'rgba(245, 158, 11, 0.1)',
-                        borderWidth: 2,
-                        fill: false,
-                        tension: 0.4,
-                        pointBackgroundColor: '#f59e0b',
-                        pointBorderColor: '#d97706',
-                        pointBorderWidth: 2,
-                        pointRadius: 5
-                    });
-                }
-                
-                if (worldData.US) {
-                    datasets.push({
-                        label: 'آمریکا',
-                        data: worldData.US.chartData,
-                        borderColor: '#ef4444',
-                        backgroundColor: 'rgba(239, 68, 68, 0.1)',
-                        borderWidth: 2,
-                        fill: false,
-                        tension: 0.4,
-                        pointBackgroundColor: '#ef4444',
-                        pointBorderColor: '#dc2626',
-                        pointBorderWidth: 2,
-                        pointRadius: 5
-                    });
-                }
-                
-                if (worldData.EU) {
-                    datasets.push({
-                        label: 'اتحادیه اروپا',
-                        data: worldData.EU.chartData,
-                        borderColor: '#10b981',
-                        backgroundColor: 'rgba(16, 185, 129, 0.1)',
-                        borderWidth: 2,
-                        fill: false,
-                        tension: 0.4,
-                        pointBackgroundColor: '#10b981',
-                        pointBorderColor: '#059669',
-                        pointBorderWidth: 2,
-                        pointRadius: 5
-                    });
-                }
-                
-                if (worldData.Germany) {
-                    datasets.push({
-                        label: 'آلمان',
-                        data: worldData.Germany.chartData,
-                        borderColor: '#8b5cf6',
-                        backgroundColor: 'rgba(139, 92, 246, 0.1)',
-                        borderWidth: 2,
-                        fill: false,
-                        tension: 0.4,
-                        pointBackgroundColor: '#8b5cf6',
-                        pointBorderColor: '#7c3aed',
-                        pointBorderWidth: 2,
-                        pointRadius: 5
-                    });
-                }
+        function createChart(data, counterId = null) {
+            const { labels, datasets, y } = getChartDatasets(data, counterId);
+            
+            // Reuse the chart: swap labels, datasets and the precomputed bounds, redraw without animation
+            if (currentChart) {
+                currentChart.data.labels = labels;
+                currentChart.data.datasets = datasets;
+                currentChart.options.scales.y.suggestedMin = y[0];
+                currentChart.options.scales.y.suggestedMax = y[1];
+                currentChart.update('none');
+                return;
             }
             
+            const ctx = document.getElementById('statisticsChart').getContext('2d');
             currentChart = new Chart(ctx, {
                 type: 'line',
                 data: {
-                    labels: persianYears,
+                    labels: labels,
                     datasets: datasets
                 },
                 options: {
@@ -782,6 +984,8 @@
                             }
                         },
                         y: {
+                            suggestedMin: y[0],
+                            suggestedMax: y[1],
                             grid: {
                                 color: 'rgba(255, 255, 255, 0.1)'
                             },
@@ -853,8 +1057,11 @@
 
         // Initialize on page load
         document.addEventListener('DOMContentLoaded', async function() {
-            // Load statistics from JSON first
-            statisticsData = await loadStatisticsFromJSON();
+            // Hashed asset names for the later fetches, the first paint does not wait for them
+            loadAssetManifest();
+
+            // Load statistics from JSON first, the calendar table alongside
+            [statisticsData] = await Promise.all([loadStatisticsFromJSON(), loadPersianCalendar()]);
             
             // Load modal data from JSON
             if (statisticsData) {
@@ -869,11 +1076,8 @@
             initializeCounters('daily'); // Start with daily view
             
             // Start progressive updates for daily view
-            updateInterval = setInterval(updateProgressiveCounters, 60000);
+            startUpdates();
             
             // Update timestamp immediately
-            const iranTime = getIranTime();
-            const timeString = getPersianTime(iranTime);
-            const persianDate = getPersianDate(iranTime);
-            document.getElementById('last-update').textContent = `${timeString} - ${persianDate.formatted}`;
+            updateLastUpdate();
         });
\ No newline at end of file
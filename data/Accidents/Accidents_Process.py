@@ -1,49 +1,51 @@
 # Get the script directory
 import os
+import sys
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
+# Shared build modules live in the parent data directory
+sys.path.insert(0, os.path.dirname(script_dir))
+import forecast_cache
+import jalali
+import model_selection
+import store
+import analysis_options
+import bootstrap
+import charts
+
+options = analysis_options.parse_args('Analyse and forecast the car accident deaths')
+
 #import libraries
 import pandas as pd
 import numpy as np
 
-#import data
-data = pd.read_csv(os.path.join(script_dir, 'data_all.csv'))
+#import data, data_all.csv through the long-format store
+data = store.frame('Accidents/data_all.csv', measures=['death', 'wounded'])
 
-# plot time series of accidents
-import matplotlib.pyplot as plt
+# Figures are described here and drawn by charts.py
+figures = []
 
-# Convert Persian year to Gregorian year for proper datetime handling
-# Persian year 1395 ≈ 2016 CE, so we add 621 to convert
-data['gregorian_year'] = data['year'] + 621
-data['year_datetime'] = pd.to_datetime(data['gregorian_year'], format='%Y')
-data.set_index('year_datetime', inplace=True)
+# Index every Persian year by the day it starts on (Nowruz), 1395 starts on 2016-03-20
+data.index = jalali.year_index(data['year'])
 data.sort_index(inplace=True)
 print(data.head())
 #plot time series of accidents
-plt.figure(figsize=(12,8))
-
-# Create subplot for deaths and wounded
-plt.plot(data.index, data['death'], marker='o', linestyle='-', color='red', label='Deaths')
-plt.title('Number of Deaths Over Years')
-plt.xlabel('Year')
-plt.ylabel('Number of Deaths')
-plt.grid()
-plt.legend()
-
-
-plt.tight_layout()
-plt.savefig(os.path.join(script_dir, 'accidents_analysis.png'), dpi=300, bbox_inches='tight')
-print("Plot saved as 'accidents_analysis.png'")
-# plt.show()  # Comment out for headless environments
+if options.plots:
+    figures.append(charts.figure('accidents_analysis', [
+        # Create subplot for deaths and wounded
+        charts.axes(
+            charts.line(data.index, data['death'], marker='o', linestyle='-', color='red', label='Deaths'),
+            title='Number of Deaths Over Years', xlabel='Year', ylabel='Number of Deaths', grid=True, legend=True),
+    ]))
 
 # Test the stationarity of the time series using Augmented Dickey-Fuller test
-from statsmodels.tsa.stattools import adfuller
 #drop the first row with NaN values in  death 
 
 
 
 def test_stationarity(timeseries):
     # Perform Augmented Dickey-Fuller test
+    from statsmodels.tsa.stattools import adfuller
     result = adfuller(timeseries)
     print('ADF Statistic:', result[0])
     print('p-value:', result[1])
@@ -52,8 +54,9 @@ def test_stationarity(timeseries):
         print(f'   {key}: {value}')
 
 # Test stationarity for deaths and wounded
-print("Stationarity Test for Deaths:")
-test_stationarity(data['death'])
+if options.diagnostics:
+    print("Stationarity Test for Deaths:")
+    test_stationarity(data['death'])
 
 #print("\nStationarity Test for Wounded:")
 #test_stationarity(data['wounded'])
@@ -68,94 +71,72 @@ print("Differenced Deaths:")
 print(data['death_diff'].head())
 #data['wounded_diff'] = data['wounded'].diff().dropna()
 
-print("\nStationarity Test for Differenced Deaths:")
-test_stationarity(data['death_diff'])
+if options.diagnostics:
+    print("\nStationarity Test for Differenced Deaths:")
+    test_stationarity(data['death_diff'])
 #print("\nStationarity Test for Differenced Wounded:")
 #test_stationarity(data['wounded_diff'])
 
 #plot differenced series and ACF and PACF and original series
-from statsmodels.graphics.tsaplots import plot_acf, plot_pacf 
-plt.figure(figsize=(12,12))
-plt.subplot(3, 2, 1)
-plt.plot(data.index, data['death'], marker='o', linestyle='-', color='red', label='Deaths')
-plt.title('Original Deaths Series')
-plt.xlabel('Year')
-plt.ylabel('Number of Deaths')
-plt.grid()
-plt.legend()
-plt.subplot(3, 2, 2)
-plot_acf(data['death'], ax=plt.gca(), lags=4)
-plt.title('ACF of Original Deaths Series')
-plt.subplot(3, 2, 3)
-plt.plot(data.index, data['death_diff'], marker='o', linestyle='-', color='blue', label='Differenced Deaths')
-plt.title('Differenced Deaths Series')
-plt.xlabel('Year')
-plt.ylabel('Differenced Number of Deaths')
-plt.grid()
-plt.legend()
-plt.subplot(3, 2, 4)
-plot_acf(data['death_diff'], ax=plt.gca(), lags=4)
-plt.title('ACF of Differenced Deaths Series')
-plt.subplot(3, 2, 5)
-plot_pacf(data['death_diff'], ax=plt.gca(), lags=4)
-plt.title('PACF of Differenced Deaths Series')
-plt.tight_layout()
-plt.savefig(os.path.join(script_dir, 'deaths_acf_pacf.png'), dpi=300, bbox_inches='tight')
-print("Plot saved as 'deaths_acf_pacf.png'")
-# plt.show()  # Comment out for headless environments
+if options.plots and options.diagnostics:
+    figures.append(charts.figure('deaths_acf_pacf', [
+        charts.axes(
+            charts.line(data.index, data['death'], marker='o', linestyle='-', color='red', label='Deaths'),
+            position=(3, 2, 1), title='Original Deaths Series', xlabel='Year', ylabel='Number of Deaths',
+            grid=True, legend=True),
+        charts.axes(charts.acf(data['death'], lags=4), position=(3, 2, 2), title='ACF of Original Deaths Series'),
+        charts.axes(
+            charts.line(data.index, data['death_diff'], marker='o', linestyle='-', color='blue', label='Differenced Deaths'),
+            position=(3, 2, 3), title='Differenced Deaths Series', xlabel='Year',
+            ylabel='Differenced Number of Deaths', grid=True, legend=True),
+        charts.axes(charts.acf(data['death_diff'], lags=4), position=(3, 2, 4), title='ACF of Differenced Deaths Series'),
+        charts.axes(charts.pacf(data['death_diff'], lags=4), position=(3, 2, 5), title='PACF of Differenced Deaths Series'),
+    ], figsize=(12, 12)))
 
 # the p value is 0.25 so we can reject the null hypothesis of non-stationarity so the differenced series is stationary
 
 # fit ARIMA model to the differenced series
-from statsmodels.tsa.arima.model import ARIMA
-# Fit ARIMA model (p=1, d=1, q=0) based on ACF and PACF plots
-model = ARIMA(data['death_diff'], order=(1, 1, 0))
-model_fit = model.fit()
-print(model_fit.summary())
+# Fit ARIMA model (p=1, d=1, q=0) based on ACF and PACF plots, or the order searched with --auto-order,
+# reusing the cached fit if the series did not change
 # Forecast the next 3 years and plot the results with confidence intervals
-forecast = model_fit.get_forecast(steps=3)
+order = model_selection.select_order(data['death_diff']) if options.auto_order else (1, 1, 0)
+print(f"ARIMA order: {order}")
+forecast = forecast_cache.arima_forecast(data['death_diff'], order=order, steps=3)
+print(forecast['summary'])
 
-# Create proper forecast index - should start from 2025 if data ends at 2024
-last_year = data.index[-1].year
-forecast_years = [last_year + i for i in range(1, 4)]  # 2025, 2026, 2027
-forecast_index = pd.to_datetime([f'{year}-01-01' for year in forecast_years])
+# Forecast the Persian years after the data, 1404 to 1406 if data ends at 1403, indexed by their Nowruz
+last_year = int(data['year'].iloc[-1])
+forecast_years = [last_year + i for i in range(1, 4)]
+forecast_index = jalali.year_index(forecast_years)
 
-forecast_series = pd.Series(forecast.predicted_mean, index=forecast_index)
-forecast_ci = forecast.conf_int()
+forecast_series = pd.Series(forecast['predicted_mean'], index=forecast_index)
+forecast_ci = pd.DataFrame({'lower': forecast['conf_int'][0], 'upper': forecast['conf_int'][1]}, index=forecast_index)
 
 print(f"Data ends at: {data.index[-1]}")
 print(f"Forecast starts at: {forecast_index[0]}")
 print(f"Forecast years: {[year for year in forecast_years]}")
 # Plot first differences (historical and forecasted)
-plt.figure(figsize=(12,6))
-plt.plot(data.index, data['death_diff'], marker='o', linestyle='-', color='red', label='Historical First Differences')
-
-# Plot forecasted first differences
-plt.plot(forecast_index, forecast_series, marker='o', linestyle='--', color='blue', label='Forecasted First Differences', markersize=8)
-plt.fill_between(forecast_index, forecast_ci.iloc[:, 0], forecast_ci.iloc[:, 1], color='blue', alpha=0.2, label='Confidence Interval')
-
-# Calculate and plot unconditional mean of first differences
-unconditional_mean_diff = data['death_diff'].mean()
-plt.axhline(y=unconditional_mean_diff, color='green', linestyle=':', linewidth=2, label=f'Unconditional Mean ({unconditional_mean_diff:.1f})')
-
-# Add forecast values as text annotations
-for i, (date, value) in enumerate(zip(forecast_index, forecast_series)):
-    persian_year = date.year - 621
-    plt.annotate(f'{persian_year}\n{value:.1f}', 
-                xy=(date, value), 
-                xytext=(10, 10), 
-                textcoords='offset points',
-                bbox=dict(boxstyle='round,pad=0.3', facecolor='blue', alpha=0.3),
-                fontsize=9)
-plt.title('Forecast of First Differences in Deaths for Next 3 Years')
-plt.xlabel('Year')
-plt.ylabel('First Difference in Number of Deaths')
-plt.grid()
-plt.legend()
-plt.tight_layout()
-plt.savefig(os.path.join(script_dir, 'deaths_forecast_diff.png'), dpi=300, bbox_inches='tight')
-print("Plot saved as 'deaths_forecast_diff.png'")
-# plt.show()  # Comment out for headless environments
+if options.plots:
+    # Calculate and plot unconditional mean of first differences
+    unconditional_mean_diff = data['death_diff'].mean()
+
+    figures.append(charts.figure('deaths_forecast_diff', [
+        charts.axes(
+            charts.line(data.index, data['death_diff'], marker='o', linestyle='-', color='red', label='Historical First Differences'),
+            # Plot forecasted first differences
+            charts.line(forecast_index, forecast_series, marker='o', linestyle='--', color='blue', label='Forecasted First Differences', markersize=8),
+            charts.fill_between(forecast_index, forecast_ci.iloc[:, 0], forecast_ci.iloc[:, 1], color='blue', alpha=0.2, label='Confidence Interval'),
+            charts.axhline(unconditional_mean_diff, color='green', linestyle=':', linewidth=2, label=f'Unconditional Mean ({unconditional_mean_diff:.1f})'),
+            # Add forecast values as text annotations
+            *[charts.annotate(f'{year}\n{value:.1f}', (date, value),
+                              xytext=(10, 10),
+                              textcoords='offset points',
+                              bbox=dict(boxstyle='round,pad=0.3', facecolor='blue', alpha=0.3),
+                              fontsize=9)
+              for year, date, value in zip(forecast_years, forecast_index, forecast_series)],
+            title='Forecast of First Differences in Deaths for Next 3 Years', xlabel='Year',
+            ylabel='First Difference in Number of Deaths', grid=True, legend=True),
+    ], figsize=(12, 6)))
 
 # Calculate actual deaths forecast by transforming first differences back to levels
 print("\n" + "="*60)
@@ -164,7 +145,7 @@ print("="*60)
 
 # Get the last actual death count
 last_death_count = data['death'].iloc[-1]
-print(f"Last observed death count (2024): {last_death_count}")
+print(f"Last observed death count ({last_year}): {last_death_count}")
 
 # Transform first differences forecast back to death levels
 # For each forecast period, add the predicted difference to the cumulative sum
@@ -174,61 +155,111 @@ current_level = last_death_count
 for i, diff_forecast in enumerate(forecast_series):
     current_level += diff_forecast
     forecasted_deaths.append(current_level)
-    persian_year = forecast_years[i] - 621
-    print(f"Year {persian_year} (CE {forecast_years[i]}): {current_level:.0f} deaths")
+    print(f"Year {forecast_years[i]} (from {forecast_index[i]:%Y-%m-%d}): {current_level:.0f} deaths")
 
 forecasted_deaths = np.array(forecasted_deaths)
 
-# Calculate confidence intervals for death levels
-forecast_ci_lower = []
-forecast_ci_upper = []
-current_level_lower = last_death_count
-current_level_upper = last_death_count
-
-for i in range(len(forecast_series)):
-    current_level_lower += forecast_ci.iloc[i, 0]  # Lower bound
-    current_level_upper += forecast_ci.iloc[i, 1]  # Upper bound
-    forecast_ci_lower.append(current_level_lower)
-    forecast_ci_upper.append(current_level_upper)
-
-# Plot deaths level forecast
-plt.figure(figsize=(14,8))
-
-# Plot historical deaths
-plt.plot(data.index, data['death'], marker='o', linestyle='-', color='red', 
-         label='Historical Deaths', linewidth=2, markersize=6)
-
-# Plot forecasted deaths
-plt.plot(forecast_index, forecasted_deaths, marker='s', linestyle='--', color='blue', 
-         label='Forecasted Deaths', linewidth=2, markersize=8)
-
-# Plot confidence intervals
-plt.fill_between(forecast_index, forecast_ci_lower, forecast_ci_upper, 
-                color='blue', alpha=0.2, label='95% Confidence Interval')
+# Confidence intervals for death levels: the bounds of the differences cannot be summed up,
+# so the residuals of the ARIMA fit are bootstrapped through the model, integrated once more
+forecast_ci_lower, forecast_ci_upper = bootstrap.arima(forecasted_deaths, forecast, order, integrate=1)
+for year, lower, upper in zip(forecast_years, forecast_ci_lower, forecast_ci_upper):
+    print(f"Year {year}: 95% interval {lower:.0f} - {upper:.0f} deaths")
 
 # Calculate and plot unconditional mean of deaths
 unconditional_mean_deaths = data['death'].mean()
-plt.axhline(y=unconditional_mean_deaths, color='green', linestyle=':', linewidth=2, 
-           label=f'Historical Mean ({unconditional_mean_deaths:.0f})')
-
-# Add forecast values as text annotations
-for i, (date, value) in enumerate(zip(forecast_index, forecasted_deaths)):
-    persian_year = date.year - 621
-    plt.annotate(f'{persian_year}\n{value:.0f}', 
-                xy=(date, value), 
-                xytext=(15, 15), 
-                textcoords='offset points',
-                bbox=dict(boxstyle='round,pad=0.4', facecolor='blue', alpha=0.4),
-                fontsize=10, fontweight='bold')
-
-plt.title('Deaths Forecast: Historical Data and 3-Year Prediction', fontsize=14, fontweight='bold')
-plt.xlabel('Year', fontsize=12)
-plt.ylabel('Number of Deaths', fontsize=12)
-plt.grid(True, alpha=0.3)
-plt.legend(fontsize=11)
-plt.tight_layout()
-plt.savefig(os.path.join(script_dir, 'deaths_level_forecast.png'), dpi=300, bbox_inches='tight')
-print(f"\nPlot saved as 'deaths_level_forecast.png'")
+
+# Plot deaths level forecast
+if options.plots:
+    figures.append(charts.figure('deaths_level_forecast', [
+        charts.axes(
+            # Plot historical deaths
+            charts.line(data.index, data['death'], marker='o', linestyle='-', color='red',
+                        label='Historical Deaths', linewidth=2, markersize=6),
+            # Plot forecasted deaths
+            charts.line(forecast_index, forecasted_deaths, marker='s', linestyle='--', color='blue',
+                        label='Forecasted Deaths', linewidth=2, markersize=8),
+            # Plot confidence intervals
+            charts.fill_between(forecast_index, forecast_ci_lower, forecast_ci_upper,
+                                color='blue', alpha=0.2, label='95% Confidence Interval'),
+            charts.axhline(unconditional_mean_deaths, color='green', linestyle=':', linewidth=2,
+                           label=f'Historical Mean ({unconditional_mean_deaths:.0f})'),
+            # Add forecast values as text annotations
+            *[charts.annotate(f'{year}\n{value:.0f}', (date, value),
+                              xytext=(15, 15),
+                              textcoords='offset points',
+                              bbox=dict(boxstyle='round,pad=0.4', facecolor='blue', alpha=0.4),
+                              fontsize=10, fontweight='bold')
+              for year, date, value in zip(forecast_years, forecast_index, forecasted_deaths)],
+            title='Deaths Forecast: Historical Data and 3-Year Prediction', xlabel='Year', ylabel='Number of Deaths',
+            grid={'alpha': 0.3}, legend={'fontsize': 11},
+            title_style={'fontsize': 14, 'fontweight': 'bold'}, label_style={'fontsize': 12}),
+    ], figsize=(14, 8)))
+
+# Monthly deaths: every month reported in data_12.csv on a gapless grid of Persian months
+monthly = store.frame('Accidents/data_12.csv', measures=['death']).dropna(subset=['death'])
+month_numbers = monthly['year'].astype(int) * 12 + monthly['month'].astype(int) - 1
+monthly_deaths = pd.Series(monthly['death'].to_numpy(dtype=float), index=month_numbers.to_numpy()).sort_index()
+monthly_deaths = monthly_deaths.reindex(range(monthly_deaths.index[0], monthly_deaths.index[-1] + 1))
+month_years = monthly_deaths.index.to_numpy() // 12
+last_month_number = monthly_deaths.index[-1]
+
+# The yearly deaths and their interval, observed or from the yearly forecast above
+yearly_level = dict(zip(data['year'], data['death']))
+yearly_level.update(zip(forecast_years, forecasted_deaths))
+yearly_bounds = {year: (deaths, deaths) for year, deaths in zip(data['year'], data['death'])}
+yearly_bounds.update(zip(forecast_years, zip(forecast_ci_lower, forecast_ci_upper)))
+
+# The counter reads the forecast of the current Persian month, so the horizon starts there
+# (or after the last reported month) and keeps to the years with a yearly level
+monthly_steps = 12
+today = jalali.persian_date(jalali.iran_time())
+first_forecast_number = max(today['year'] * 12 + today['month'] - 1, last_month_number + 1)
+forecast_month_numbers = np.arange(first_forecast_number, first_forecast_number + monthly_steps)
+forecast_month_numbers = forecast_month_numbers[np.isin(forecast_month_numbers // 12, list(yearly_level))]
+forecast_month_years, forecast_months = forecast_month_numbers // 12, forecast_month_numbers % 12 + 1
+
+# Every Persian month indexed by the day it starts on
+monthly_deaths.index = jalali.month_index(month_years, monthly_deaths.index.to_numpy() % 12 + 1)
+forecast_month_index = jalali.month_index(forecast_month_years, forecast_months)
+
+# Every month gets its year's share. A seasonal term needs two full years of reported months
+# and data_12.csv has about ten, so the seasonal model (forecast_cache.sarimax_forecast with
+# the year's deaths / 12 as regressor) comes back once that many are reported
+reported_months = int(monthly_deaths.notna().sum())
+print(f"\n{reported_months} reported months, the monthly forecast is the yearly forecast / 12")
+monthly_method = 'yearly / 12'
+monthly_mean = np.array([yearly_level[year] / 12 for year in forecast_month_years], dtype=float)
+monthly_lower, monthly_upper = (np.array([yearly_bounds[year][side] / 12 for year in forecast_month_years],
+                                         dtype=float) for side in (0, 1))
+
+monthly_forecast_table = pd.DataFrame({
+    'Year': forecast_month_years,
+    'Month': forecast_months,
+    'Forecast': monthly_mean,
+    'Lower': monthly_lower,
+    'Upper': monthly_upper,
+    'Method': monthly_method,
+})
+# Read by json_creator.py for the monthly period of the counter
+monthly_forecast_table.to_csv(os.path.join(script_dir, 'monthly_forecast.csv'), index=False)
+print("\nMonthly deaths forecast:")
+print(monthly_forecast_table.round().to_string(index=False))
+
+if options.plots:
+    observed_months = monthly_deaths.dropna()
+    figures.append(charts.figure('deaths_monthly_forecast', [
+        charts.axes(
+            charts.scatter(observed_months.index, observed_months, color='red', label='Reported Months'),
+            charts.line(forecast_month_index, monthly_forecast_table['Forecast'], marker='s', linestyle='--',
+                        color='blue', label='Forecasted Months'),
+            charts.fill_between(forecast_month_index, monthly_forecast_table['Lower'], monthly_forecast_table['Upper'],
+                                color='blue', alpha=0.2, label='95% Confidence Interval'),
+            title=f'Monthly Deaths: Reported Months and {len(forecast_month_numbers)}-Month Prediction ({monthly_method})', xlabel='Month Start',
+            ylabel='Number of Deaths', grid=True, legend=True),
+    ], figsize=(14, 6)))
+
+# Render the figures, or leave them to the charts stage of the pipeline
+analysis_options.emit_figures(script_dir, figures, options)
 
 # Print summary statistics
 print(f"\nForecast Summary:")
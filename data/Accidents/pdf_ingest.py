@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Ingest the monthly and yearly accident reports in done/ into the CSVs.
+
+The reports of the forensic medicine organisation that compare two years
+("مقایسه آمار متوفیات ...") end with a national total row holding the deaths
+and the wounded of the reported period for both years. Every PDF is parsed in
+a process pool, the result is cached per file content hash in
+data/.pdf_cache, so dropping a new report into done/ only costs parsing that
+one file. Year totals are appended to data_all.csv and single months to
+data_12.csv; rows already in the CSVs are never overwritten, a different
+value is reported as a conflict instead.
+
+Reports for other periods (Nowruz holidays, 3 month totals) and the detailed
+breakdown tables are recorded as skipped. pdfplumber is only needed for files
+that are not cached yet (pip install pdfplumber).
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Shared build modules live in the parent data directory
+sys.path.insert(0, os.path.dirname(script_dir))
+from json_writer import write_json
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+reports_dir = os.path.join(script_dir, 'done')
+cache_dir = os.path.join(os.path.dirname(script_dir), '.pdf_cache')
+yearly_path = os.path.join(script_dir, 'data_all.csv')
+monthly_path = os.path.join(script_dir, 'data_12.csv')
+
+# Bump when parse_text() changes so every cached result is parsed again
+PARSER_VERSION = 1
+
+MONTHS = ['فروردین', 'اردیبهشت', 'خرداد', 'تیر', 'مرداد', 'شهریور',
+          'مهر', 'آبان', 'آذر', 'دی', 'بهمن', 'اسفند']
+
+# Persian and Arabic-Indic digits to ASCII, Arabic yeh and kaf to their Persian forms
+_TRANSLATE = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩يك', '01234567890123456789یک')
+
+
+def normalize(text):
+    """Fold presentation forms, digits and letter variants so the text can be matched"""
+    return unicodedata.normalize('NFKC', text).translate(_TRANSLATE)
+
+
+def words(line):
+    """
+    The words of a line in reading order.
+
+    pdfplumber returns the right-to-left text in visual order, so every word
+    comes out reversed. Digits glued to a word are split off.
+    """
+    found = []
+    for token in re.split(r'\s+|(?<=\d)(?=\D)|(?<=\D)(?=\d)', line):
+        if token:
+            found.append(token if token[0].isdigit() else token[::-1])
+    return found
+
+
+def parse_period(title):
+    """Return (current year, previous year, month) of a comparison report title, month is 'all' for a year"""
+    title_words = words(normalize(title))
+    if 'مقایسه' not in title_words:
+        return None, 'not a two-year comparison report'
+    if 'نوروز' in title_words:
+        return None, 'Nowruz holiday period'
+
+    numbers = [int(word) for word in title_words if word.isdigit()]
+    # Two digit years are printed without the leading 13
+    years = sorted({number + 1300 if number < 100 else number for number in numbers if number >= 90})
+    if len(years) != 2:
+        return None, f'expected two years in the title, found {years}'
+
+    span = [number for number in numbers if number < 90]
+    if 'ماهه' in title_words:
+        if span != [12]:
+            return None, f'{span[0] if span else "?"} month total'
+        month = 'all'
+    else:
+        months = [index + 1 for index, name in enumerate(MONTHS) if name in title_words]
+        if months:
+            month = months[0]
+        elif 'سال' in title_words or 'سالهای' in title_words:
+            month = 'all'
+        else:
+            return None, 'period not recognised'
+    return (years[1], years[0], month), None
+
+
+def parse_total(lines):
+    """
+    Deaths and wounded of both years from the national total row.
+
+    The row reads, left to right: wounded growth, previous, current, women,
+    men, then the same five columns for the deaths, then the label.
+    """
+    for line in reversed(lines):
+        tokens = normalize(line).split()
+        if len(tokens) < 11 or 'عمج' not in tokens[10:]:
+            continue
+        try:
+            values = [int(token) for token in tokens[1:5] + tokens[6:10]]
+        except ValueError:
+            continue
+        wounded_previous, wounded, wounded_a, wounded_b, deaths_previous, deaths, deaths_a, deaths_b = values
+        # The current year columns are split by sex, their sum checks the column positions
+        if wounded != wounded_a + wounded_b or deaths != deaths_a + deaths_b:
+            continue
+        return {'death': deaths, 'wounded': wounded, 'death_previous': deaths_previous,
+                'wounded_previous': wounded_previous}
+    return None
+
+
+def parse_text(text):
+    """Return the records of one report, or the reason it was skipped"""
+    lines = text.splitlines()
+    if not lines:
+        return {'records': [], 'skipped': 'no text layer'}
+    period, reason = parse_period(lines[0])
+    if period is None:
+        return {'records': [], 'skipped': reason}
+    total = parse_total(lines)
+    if total is None:
+        return {'records': [], 'skipped': 'no national total row'}
+    year, previous_year, month = period
+    return {
+        'records': [
+            {'year': year, 'month': month, 'death': total['death'], 'wounded': total['wounded']},
+            {'year': previous_year, 'month': month, 'death': total['death_previous'],
+             'wounded': total['wounded_previous']},
+        ],
+        'skipped': None,
+    }
+
+
+def parse_pdf(path):
+    """Extract the text of the first page and parse it"""
+    with pdfplumber.open(path) as pdf:
+        text = pdf.pages[0].extract_text() or ''
+    return parse_text(text)
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _cache_path(digest):
+    return os.path.join(cache_dir, f'{digest}.v{PARSER_VERSION}.json')
+
+
+def parse_reports(paths, jobs=None):
+    """Return {path: parsed result}, parsing only the files whose content is not cached"""
+    results = {}
+    pending = {}
+    for path in paths:
+        digest = file_hash(path)
+        try:
+            with open(_cache_path(digest), 'r', encoding='utf-8') as f:
+                results[path] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pending[path] = digest
+
+    if pending and pdfplumber is None:
+        raise SystemExit(f"{len(pending)} reports are not cached yet and pdfplumber is not installed "
+                         "(pip install pdfplumber)")
+
+    if jobs == 1 or len(pending) <= 1:
+        parsed = [parse_pdf(path) for path in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parsed = list(pool.map(parse_pdf, pending, chunksize=4))
+
+    for (path, digest), result in zip(pending.items(), parsed):
+        result['file'] = os.path.basename(path)
+        os.makedirs(cache_dir, exist_ok=True)
+        write_json(_cache_path(digest), result, compact=True)
+        results[path] = result
+    return results, len(pending)
+
+
+def merge_records(results):
+    """Combine the records of every report, keeping the first value and listing disagreements"""
+    merged = {}
+    conflicts = []
+    for path in sorted(results):
+        for record in results[path]['records']:
+            key = (record['year'], str(record['month']))
+            if key not in merged:
+                merged[key] = record
+            elif (merged[key]['death'], merged[key]['wounded']) != (record['death'], record['wounded']):
+                conflicts.append((key, merged[key], record, os.path.basename(path)))
+    return merged, conflicts
+
+
+def _read_rows(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return list(csv.reader(f))
+
+
+def append_rows(path, records, layout):
+    """Append the records whose key is not in the CSV yet, return the appended rows and the conflicts"""
+    key_of, values_of, row_of = layout
+    existing = {}
+    for row in _read_rows(path)[1:]:
+        key = key_of(row)
+        if key is not None:
+            existing[key] = values_of(row)
+    appended = []
+    conflicts = []
+    for key, record in sorted(records.items()):
+        if key not in existing:
+            appended.append(row_of(record))
+        elif existing[key] != (str(record['death']), str(record['wounded'])):
+            conflicts.append((key, existing[key], record))
+    if appended:
+        with open(path, 'a', encoding='utf-8', newline='') as f:
+            csv.writer(f, lineterminator='\n').writerows(appended)
+    return appended, conflicts
+
+
+# (key of a CSV row, its (death, wounded) cells, CSV row of a record) per file
+YEARLY_LAYOUT = (
+    lambda row: (int(row[0]), row[1]) if len(row) > 3 and row[0].isdigit() and row[1] == 'all' else None,
+    lambda row: (row[2], row[3]),
+    lambda record: [record['year'], 'all', record['death'], record['wounded'],
+                    record['death'] / 365, record['death'] / 12],
+)
+MONTHLY_LAYOUT = (
+    # The first of the two year columns is not the year of the row, it is left empty
+    lambda row: (int(row[1]), row[2]) if len(row) > 4 and row[1].isdigit() and row[3] else None,
+    lambda row: (row[3], row[4]),
+    lambda record: ['', record['year'], record['month'], record['death'], record['wounded']],
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract the accident totals from the PDF reports in done/')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be appended without writing')
+    parser.add_argument('--verbose', action='store_true', help='list every report and why it was skipped')
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(reports_dir, '*.pdf')))
+    results, parsed = parse_reports(paths, args.jobs)
+    print(f"{len(paths)} reports, {parsed} parsed, {len(paths) - parsed} from the cache")
+    if args.verbose:
+        for path in paths:
+            result = results[path]
+            status = result['skipped'] or ', '.join(f"{r['year']}/{r['month']}" for r in result['records'])
+            print(f"  {os.path.basename(path)}: {status}")
+
+    merged, conflicts = merge_records(results)
+    for key, kept, other, name in conflicts:
+        print(f"Reports disagree on {key}: kept {kept['death']}/{kept['wounded']}, {name} has {other['death']}/{other['wounded']}")
+
+    yearly = {(year, month): record for (year, month), record in merged.items() if month == 'all'}
+    monthly = {(year, month): record for (year, month), record in merged.items() if month != 'all'}
+    if args.dry_run:
+        print(f"{len(yearly)} yearly and {len(monthly)} monthly totals found, nothing written")
+        return 0
+
+    for path, records, layout in ((yearly_path, yearly, YEARLY_LAYOUT), (monthly_path, monthly, MONTHLY_LAYOUT)):
+        appended, differing = append_rows(path, records, layout)
+        print(f"{os.path.basename(path)}: appended {len(appended)} rows")
+        for key, (death, wounded), record in differing:
+            print(f"  {key} differs: CSV has {death}/{wounded}, reports have {record['death']}/{record['wounded']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,44 +1,50 @@
-import pandas as pd
 import os
+import sys
 
 # Get the script directory
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-#import the data
-data = pd.read_csv(os.path.join(script_dir, 'data.csv'))
+# Shared build modules live in the parent data directory
+sys.path.insert(0, os.path.dirname(script_dir))
+import fast_forecast
+import jalali
+import store
+import analysis_options
+import charts
+
+options = analysis_options.parse_args('Analyse and forecast the air pollution deaths')
+
+#import the data, data.csv through the long-format store
+data = store.frame('Air/data.csv')
 
 import numpy as np
 
 
-# plot time series of accidents
-import matplotlib.pyplot as plt
+# Figures are described here and drawn by charts.py, at the 100 dpi and full canvas they were always saved with
+figures = []
 
-# Convert Persian year to Gregorian year for proper datetime handling
-# Persian year 1395 ≈ 2016 CE, so we add 621 to convert
-data['gregorian_year'] = data['year'] + 621
-data['year_datetime'] = pd.to_datetime(data['gregorian_year'], format='%Y')
-data.set_index('year_datetime', inplace=True)
+# Index every Persian year by the day it starts on (Nowruz), 1395 starts on 2016-03-20
+data.index = jalali.year_index(data['year'])
 data.sort_index(inplace=True)
 
 
 #save a plot of the time series
-plt.figure(figsize=(12,8))
-plt.plot(data.index, data['Deaths'], label='Deaths')
-plt.title('Time Series of Air Pollution Related Deaths')
-plt.xlabel('Year')
-plt.ylabel('Number of Deaths')
-plt.legend()
-plt.grid()
-plt.savefig(os.path.join(script_dir, 'air_pollution.png'))
-plt.close()
+if options.plots:
+    figures.append(charts.figure('air_pollution', [
+        charts.axes(
+            charts.line(data.index, data['Deaths'], label='Deaths'),
+            title='Time Series of Air Pollution Related Deaths', xlabel='Year', ylabel='Number of Deaths',
+            legend=True, grid=True),
+    ], tight=False, dpi=100))
 
 #From ther plot we can see that the time series is not stationary
 # Test the stationarity of the time series using Augmented Dickey-Fuller test
-from statsmodels.tsa.stattools import adfuller
+if options.diagnostics:
+    from statsmodels.tsa.stattools import adfuller
 
-result = adfuller(data['Deaths'].dropna())
-print('ADF Statistic:', result[0])
-print('p-value:', result[1])
+    result = adfuller(data['Deaths'].dropna())
+    print('ADF Statistic:', result[0])
+    print('p-value:', result[1])
 
 # create th growth rate column
 data['Growth_Rate'] = data['Deaths'].pct_change() * 100
@@ -47,53 +53,43 @@ data['Growth_Rate'] = data['Growth_Rate'].fillna(0)
 data['Growth_Rate'] = data['Growth_Rate'].round(2)
 
 #plot the growth rate
-plt.figure(figsize=(12,8))
-plt.plot(data.index, data['Growth_Rate'], marker='o', linestyle='-', color='orange', label='Growth Rate (%)')
-plt.title('Growth Rate of Air Pollution Related Deaths')
-plt.xlabel('Year')
-plt.ylabel('Growth Rate (%)')
-plt.axhline(0, color='gray', linestyle='--')
-plt.legend()
-plt.grid()
-plt.savefig(os.path.join(script_dir, 'air_pollution_growth_rate.png'))
-plt.close()
-
-# Forcasting using OLS regression
-import statsmodels.api as sm
-
-X = data.index.year.values.reshape(-1, 1)  # Years as the feature
-y = data['Deaths'].values  # Deaths as the target variable
-
-X = sm.add_constant(X)  # Adds a constant term to the predictor
-
-model = sm.OLS(y, X, missing='drop').fit()
+if options.plots:
+    figures.append(charts.figure('air_pollution_growth_rate', [
+        charts.axes(
+            charts.line(data.index, data['Growth_Rate'], marker='o', linestyle='-', color='orange', label='Growth Rate (%)'),
+            charts.axhline(0, color='gray', linestyle='--'),
+            title='Growth Rate of Air Pollution Related Deaths', xlabel='Year', ylabel='Growth Rate (%)',
+            legend=True, grid=True),
+    ], tight=False, dpi=100))
+
+# Forcasting using OLS regression, solved in closed form (no statsmodels needed for a straight line)
+# Forecast for the next Persian year, labelled by the Gregorian year its Nowruz falls in
+forecast_datetime = jalali.year_index([data['year'].max() + 1])[0]
+next_year = forecast_datetime.year
+
+years = data.index.year.values  # Years as the feature
+deaths = data['Deaths'].values  # Deaths as the target variable
+forecast, forecast_lower, forecast_upper, fitted = fast_forecast.trend(years, deaths, horizon=1)
 
 #print the regression results
-print(model.summary())
-
+print(fast_forecast.summary(years, deaths, name='Deaths'))
 
-# Forecast for the next year 
-next_year = pd.DataFrame({'const': 1, 'year': [data.index.year.max() + 1]})
-forecast = model.predict(next_year)
-print(f"Forecasted Deaths for {next_year['year'].values[0]}: {int(round(forecast[0]))}")
+forecast = forecast[0]
+print(f"Forecasted Deaths for {next_year}: {int(round(forecast[0]))}")
 # Save the forecast to a text file
 with open(os.path.join(script_dir, 'forecast.txt'), 'w') as f:
-    f.write(f"Forecasted Deaths for {next_year['year'].values[0]}: {int(round(forecast[0]))}\n")
+    f.write(f"Forecasted Deaths for {next_year}: {int(round(forecast[0]))}\n")
 # End of the forecast
 #plot the  regression line and the original time series and forcaseted point
-plt.figure(figsize=(12,8))
-#Only plot after 2020
-plt.plot(data.index, data['Deaths'], marker='o', linestyle='-', color='blue', label='Actual Deaths')
-plt.plot(data.index, model.predict(X), color='red', linestyle='--', label='Regression Line')
-
-# Convert forecast year to datetime to match the data index
-forecast_datetime = pd.to_datetime(next_year['year'].values[0], format='%Y')
-plt.scatter(forecast_datetime, forecast, color='green', s=100, label='Forecasted Point')
-
-plt.title('OLS Regression and Forecast of Air Pollution Related Deaths')
-plt.xlabel('Year')
-plt.ylabel('Number of Deaths')
-plt.legend()
-plt.grid()
-plt.savefig(os.path.join(script_dir, 'air_pollution_regression_forecast.png'))
-plt.close()
\ No newline at end of file
+if options.plots:
+    figures.append(charts.figure('air_pollution_regression_forecast', [
+        charts.axes(
+            charts.line(data.index, data['Deaths'], marker='o', linestyle='-', color='blue', label='Actual Deaths'),
+            charts.line(data.index, fitted[0], color='red', linestyle='--', label='Regression Line'),
+            charts.scatter([forecast_datetime], forecast, color='green', s=100, label='Forecasted Point'),
+            title='OLS Regression and Forecast of Air Pollution Related Deaths', xlabel='Year',
+            ylabel='Number of Deaths', legend=True, grid=True),
+    ], tight=False, dpi=100))
+
+# Render the figures, or leave them to the charts stage of the pipeline
+analysis_options.emit_figures(script_dir, figures, options)
\ No newline at end of file
@@ -1,65 +1,66 @@
 import os
+import sys
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-#import libraries
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
+# Shared build modules live in the parent data directory
+sys.path.insert(0, os.path.dirname(script_dir))
+import analysis_options
+import bootstrap
+import jalali
+import store
+import charts
 
+options = analysis_options.parse_args('Analyse and forecast the number of death penalties')
 
-#load data
-data = pd.read_csv(os.path.join(script_dir, 'data.csv'))
+# Figures are described here and drawn by charts.py
+figures = []
 
-# Convert Persian year to Gregorian year for proper datetime handling
-# Persian year 1395 ≈ 2016 CE, so we add 621 to convert
-data['gregorian_year'] = data['year'] + 621
-data['year_datetime'] = pd.to_datetime(data['gregorian_year'], format='%Y')
-data.set_index('year_datetime', inplace=True)
+
+#load data, data.csv through the long-format store
+data = store.frame('Death penalty/data.csv')
+
+# Index every Persian year by the day it starts on (Nowruz), 1395 starts on 2016-03-20
+data.index = jalali.year_index(data['year'])
 data.sort_index(inplace=True)
 print(data.head())
 #plot time series of students
-plt.figure(figsize=(12,8))
-
-# Create subplot for deaths and wounded
-plt.plot(data.index, data['Death penalty'], marker='o', linestyle='-', color='blue', label='Death Penalties')
-plt.title('Number of Death Penalties Over Years')
-plt.xlabel('Year')
-plt.ylabel('Number of Death Penalties')
-plt.grid()
-plt.legend()
-plt.tight_layout()
-plt.savefig(os.path.join(script_dir, 'death_penalties_analysis.png'), dpi=300, bbox_inches='tight')
-print("Plot saved as 'death_penalties_analysis.png'")
+if options.plots:
+    figures.append(charts.figure('death_penalties_analysis', [
+        # Create subplot for deaths and wounded
+        charts.axes(
+            charts.line(data.index, data['Death penalty'], marker='o', linestyle='-', color='blue', label='Death Penalties'),
+            title='Number of Death Penalties Over Years', xlabel='Year', ylabel='Number of Death Penalties',
+            grid=True, legend=True),
+    ]))
 
 
 #test stationarity with adfuller for growth rate of deaths
-from statsmodels.tsa.stattools import adfuller
+if options.diagnostics:
+    from statsmodels.tsa.stattools import adfuller
 
-result = adfuller(data['Death penalty'].diff().dropna())
-print('ADF Statistic:', result[0])
-print('p-value:', result[1])
+    result = adfuller(data['Death penalty'].diff().dropna())
+    print('ADF Statistic:', result[0])
+    print('p-value:', result[1])
 
 #calculating the growth rate of deaths
 data['death_growth_rate'] = data['Death penalty'].pct_change()
 print(data['death_growth_rate'])
 
 #plot the growth rate of deaths
-plt.figure(figsize=(12,8))
-plt.plot(data.index, data['death_growth_rate'], marker='o', linestyle='-', color='orange', label='Growth Rate of Death Penalties')
-plt.title('Growth Rate of Death Penalties Over Years')
-plt.xlabel('Year')
-plt.ylabel('Growth Rate of Death Penalties')
-plt.grid()
-plt.legend()
-plt.tight_layout()
-plt.savefig(os.path.join(script_dir, 'death_penalties_growth_rate.png'), dpi=300, bbox_inches='tight')
-print("Plot saved as 'death_penalties_growth_rate.png'")
+if options.plots:
+    figures.append(charts.figure('death_penalties_growth_rate', [
+        charts.axes(
+            charts.line(data.index, data['death_growth_rate'], marker='o', linestyle='-', color='orange', label='Growth Rate of Death Penalties'),
+            title='Growth Rate of Death Penalties Over Years', xlabel='Year', ylabel='Growth Rate of Death Penalties',
+            grid=True, legend=True),
+    ]))
 
 # ADF test on growth rate
-result_growth = adfuller(data['death_growth_rate'].dropna())
-print('ADF Statistic for Growth Rate:', result_growth[0])
-print('p-value for Growth Rate:', result_growth[1]) 
+if options.diagnostics:
+    result_growth = adfuller(data['death_growth_rate'].dropna())
+    print('ADF Statistic for Growth Rate:', result_growth[0])
+    print('p-value for Growth Rate:', result_growth[1]) 
 
 # data is not stationary
 # Limited number of observations, so we will not do extensive modeling here !!!
@@ -68,4 +69,9 @@ last_value = data['Death penalty'].iloc[-1]
 print(f"Last recorded number of death penalties: {last_value}")
 next_year_forecast = last_value  # Naive forecast
 print(f"Forecasted number of death penalties for next year: {next_year_forecast}")
+# Interval from the year-on-year changes, resampled
+_, lower, upper = bootstrap.closed_form('naive', data['Death penalty'].to_numpy())
+print(f"95% bootstrap interval: {lower[0, 0]:.0f} - {upper[0, 0]:.0f}")
 
+# Render the figures, or leave them to the charts stage of the pipeline
+analysis_options.emit_figures(script_dir, figures, options)
@@ -1,9 +1,19 @@
 # Get the script directory 
 #data obtained from factnameh
 import os
-from turtle import color
+import sys
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
+# Shared build modules live in the parent data directory
+sys.path.insert(0, os.path.dirname(script_dir))
+import forecast_cache
+import jalali
+import model_selection
+import analysis_options
+import charts
+
+options = analysis_options.parse_args('Analyse and forecast the education dropouts')
+
 #import libraries
 import pandas as pd
 import numpy as np
@@ -21,8 +31,8 @@ def load_education_data_from_json(json_file_path):
     # Convert to DataFrame
     df = pd.DataFrame(education_records)
     
-    # Rename columns to match original CSV structure
-    df = df.rename(columns={'students': 'Students', 'persian_year': 'year'})
+    # Rename columns to match original CSV structure ('year' already holds the Persian year)
+    df = df.drop(columns=['year']).rename(columns={'students': 'Students', 'persian_year': 'year'})
     
     return df
 
@@ -30,45 +40,33 @@ def load_education_data_from_json(json_file_path):
 json_file_path = os.path.join(script_dir, 'data.json')
 data = load_education_data_from_json(json_file_path)
 
-# plot time series of accidents
-import matplotlib.pyplot as plt
+# Figures are described here and drawn by charts.py
+figures = []
 
-# Convert Persian year to Gregorian year for proper datetime handling
-# Persian year 1395 ≈ 2016 CE, so we add 621 to convert
-data['gregorian_year'] = data['year'] + 621
-data['year_datetime'] = pd.to_datetime(data['gregorian_year'], format='%Y')
-data.set_index('year_datetime', inplace=True)
+# Index every Persian year by the day it starts on (Nowruz), 1395 starts on 2016-03-20
+data.index = jalali.year_index(data['year'])
 data.sort_index(inplace=True)
 print(data.head())
 #plot time series of students
-plt.figure(figsize=(12,8))
-
-# Create subplot for deaths and wounded
-plt.plot(data.index, data['Students'], marker='o', linestyle='-', color='blue', label='Students')
-plt.title('Number of Students Over Years')
-plt.xlabel('Year')
-plt.ylabel('Number of Students')
-plt.grid()
-plt.legend()
-
-
-plt.tight_layout()
-plt.savefig(os.path.join(script_dir, 'students_analysis.png'), dpi=300, bbox_inches='tight')
-print("Plot saved as 'students_analysis.png'")
-# plt.show()  # Comment out for headless environments
+if options.plots:
+    figures.append(charts.figure('students_analysis', [
+        # Create subplot for deaths and wounded
+        charts.axes(
+            charts.line(data.index, data['Students'], marker='o', linestyle='-', color='blue', label='Students'),
+            title='Number of Students Over Years', xlabel='Year', ylabel='Number of Students', grid=True, legend=True),
+    ]))
 
 # Test the stationarity of the time series using Augmented Dickey-Fuller test
-from statsmodels.tsa.stattools import adfuller
 #drop the first row with NaN values in  students
 data = data.dropna(subset=['Students'])
 
 print(f"Data shape after dropping NaN: {data.shape}")
 print(f"Available years: {data['year'].min()} to {data['year'].max()}")
-print(f"Available Gregorian years: {data['gregorian_year'].min()} to {data['gregorian_year'].max()}")
+print(f"Available Gregorian dates: {data.index.min():%Y-%m-%d} to {data.index.max():%Y-%m-%d}")
 
-#remove the data before covid (2019) - use Gregorian year for filtering
+#remove the data before covid (2019) - the Persian years from 1398, the first to start in 2019
 data_before_filter = data.copy()
-data = data[data['gregorian_year'] >= 2019]
+data = data[data.index >= '2019-01-01']
 
 print(f"Data shape after filtering for years >= 2019: {data.shape}")
 if data.empty:
@@ -77,6 +75,7 @@ if data.empty:
 
 def test_stationarity(timeseries):
     # Perform Augmented Dickey-Fuller test
+    from statsmodels.tsa.stattools import adfuller
     result = adfuller(timeseries)
     print('ADF Statistic:', result[0])
     print('p-value:', result[1])
@@ -86,109 +85,88 @@ def test_stationarity(timeseries):
 
 #change the type of Students from integer to float
 data['Students'] = data['Students'].astype(float)
+data['Students_diff'] = data['Students'].diff()
 
 # Test stationarity for Students
-print("Stationarity Test for Students:")
-test_stationarity(data['Students'])
+if options.diagnostics:
+    print("Stationarity Test for Students:")
+    test_stationarity(data['Students'])
 
 #p value analysis - p is small < 0.05 so we can reject the null hypothesis of non-stationarity so we do not need to difference the series
 
 #plot differenced series and ACF and PACF and original series
-from statsmodels.graphics.tsaplots import plot_acf, plot_pacf 
-plt.figure(figsize=(12,12))
-
-# Calculate appropriate number of lags
-max_lags_acf = min(4, len(data)-1)
-max_lags_pacf = max(1, len(data)//2 - 1)  # PACF requires lags < 50% of sample size
-
-plt.subplot(3, 2, 1)
-plt.plot(data.index, data['Students'], marker='o', linestyle='-', color='blue', label='Students')
-plt.title('Original Students Series')
-plt.xlabel('Year')
-plt.ylabel('Number of Students')
-plt.grid()
-plt.legend()
-
-plt.subplot(3, 2, 2)
-if len(data) > 2:
-    plot_acf(data['Students'], ax=plt.gca(), lags=max_lags_acf)
-    plt.title('ACF of Original Students Series')
-else:
-    plt.text(0.5, 0.5, 'Insufficient data for ACF', ha='center', va='center', transform=plt.gca().transAxes)
-    plt.title('ACF of Original Students Series')
-
-plt.subplot(3, 2, 4)
-if len(data) > 2:
-    plot_acf(data['Students_diff'], ax=plt.gca(), lags=max_lags_acf)
-    plt.title('ACF of Differenced Students Series')
-else:
-    plt.text(0.5, 0.5, 'Insufficient data for ACF', ha='center', va='center', transform=plt.gca().transAxes)
-    plt.title('ACF of Differenced Students Series')
-
-plt.subplot(3, 2, 5)
-if max_lags_pacf >= 1:
-    plot_pacf(data['Students_diff'], ax=plt.gca(), lags=max_lags_pacf)
-    plt.title('PACF of Differenced Students Series')
-else:
-    plt.text(0.5, 0.5, 'Insufficient data for PACF', ha='center', va='center', transform=plt.gca().transAxes)
-    plt.title('PACF of Differenced Students Series')
-
-plt.tight_layout()
-plt.savefig(os.path.join(script_dir, 'students_acf_pacf.png'), dpi=300, bbox_inches='tight')
-print("Plot saved as 'students_acf_pacf.png'")
-# plt.show()  # Comment out for headless environments
+if options.plots and options.diagnostics:
+    # Calculate appropriate number of lags
+    max_lags_acf = min(4, len(data)-1)
+    max_lags_pacf = max(1, len(data)//2 - 1)  # PACF requires lags < 50% of sample size
+
+    if len(data) > 2:
+        acf_original = charts.acf(data['Students'], lags=max_lags_acf)
+        acf_diff = charts.acf(data['Students_diff'].dropna(), lags=max_lags_acf)
+    else:
+        acf_original = acf_diff = charts.note('Insufficient data for ACF', ha='center', va='center')
+    if max_lags_pacf >= 1:
+        pacf_diff = charts.pacf(data['Students_diff'].dropna(), lags=max_lags_pacf)
+    else:
+        pacf_diff = charts.note('Insufficient data for PACF', ha='center', va='center')
+
+    figures.append(charts.figure('students_acf_pacf', [
+        charts.axes(
+            charts.line(data.index, data['Students'], marker='o', linestyle='-', color='blue', label='Students'),
+            position=(3, 2, 1), title='Original Students Series', xlabel='Year', ylabel='Number of Students',
+            grid=True, legend=True),
+        charts.axes(acf_original, position=(3, 2, 2), title='ACF of Original Students Series'),
+        charts.axes(acf_diff, position=(3, 2, 4), title='ACF of Differenced Students Series'),
+        charts.axes(pacf_diff, position=(3, 2, 5), title='PACF of Differenced Students Series'),
+    ], figsize=(12, 12)))
 
 # Analyze the p-value to determine if differenced series is stationary
 print(f"\nNote: With only {len(data)} data points after filtering, the analysis has limited statistical power.")
 
 # fit ARIMA model to the  series
-from statsmodels.tsa.arima.model import ARIMA
-# Fit ARIMA model (p=1, d=1, q=0) based on ACF and PACF plots
-model = ARIMA(data['Students'], order=(1, 1, 0))
-model_fit = model.fit()
-print(model_fit.summary())
+# Fit ARIMA model (p=1, d=1, q=0) based on ACF and PACF plots, or the order searched with --auto-order,
+# reusing the cached fit if the series did not change
 # Forecast the next 3 years and plot the results with confidence intervals
-forecast = model_fit.get_forecast(steps=3)
+order = model_selection.select_order(data['Students']) if options.auto_order else (1, 1, 0)
+print(f"ARIMA order: {order}")
+forecast = forecast_cache.arima_forecast(data['Students'], order=order, steps=3)
+print(forecast['summary'])
 
-# Create proper forecast index - should start from next year after data ends
-last_year = data.index[-1].year
-forecast_years = [last_year + i for i in range(1, 4)]  # Next 3 years
-forecast_index = pd.to_datetime([f'{year}-01-01' for year in forecast_years])
+# Forecast the next 3 Persian years after the data ends, indexed by their Nowruz
+last_year = int(data['year'].iloc[-1])
+forecast_years = [last_year + i for i in range(1, 4)]
+forecast_index = jalali.year_index(forecast_years)
 
-forecast_series = pd.Series(forecast.predicted_mean, index=forecast_index)
-forecast_ci = forecast.conf_int()
+forecast_series = pd.Series(forecast['predicted_mean'], index=forecast_index)
+forecast_ci = pd.DataFrame({'lower': forecast['conf_int'][0], 'upper': forecast['conf_int'][1]}, index=forecast_index)
 
 print(f"Data ends at: {data.index[-1]}")
 print(f"Forecast starts at: {forecast_index[0]}")
 print(f"Forecast years: {[year for year in forecast_years]}")
-# Plot historical and forecasted 
-plt.figure(figsize=(12,6))
-plt.plot(data.index, data['Students'], marker='o', linestyle='-', color='red', label='Historical')  
-
-plt.plot(forecast_index, forecast_series, marker='o', linestyle='--', color='blue', label='Forecasted'  , markersize=8)
-plt.fill_between(forecast_index, forecast_ci.iloc[:, 0], forecast_ci.iloc[:, 1], color='blue', alpha=0.2, label='Confidence Interval')
-# Calculate and plot unconditional mean
+# Calculate the unconditional mean, plotted below
 unconditional_mean = data['Students'].mean()
-plt.axhline(y=unconditional_mean, color='green', linestyle=':', linewidth=2, label=f'Unconditional Mean ({unconditional_mean:.1f})')
-
-# Add forecast values as text annotations
-for i, (date, value) in enumerate(zip(forecast_index, forecast_series)):
-    persian_year = date.year - 621
-    plt.annotate(f'{persian_year}\n{value:.0f}', 
-                xy=(date, value), 
-                xytext=(10, 10), 
-                textcoords='offset points',
-                bbox=dict(boxstyle='round,pad=0.3', facecolor='blue', alpha=0.3),
-                fontsize=9)
-plt.title('Forecast of Students for Next 3 Years')
-plt.xlabel('Year')
-plt.ylabel('Number of Students')
-plt.grid()
-plt.legend()
-plt.tight_layout()
-plt.savefig(os.path.join(script_dir, 'students_forecast.png'), dpi=300, bbox_inches='tight')
-print("Plot saved as 'students_forecast.png'")
-# plt.show()  # Comment out for headless environments
+
+# Plot historical and forecasted 
+if options.plots:
+    figures.append(charts.figure('students_forecast', [
+        charts.axes(
+            charts.line(data.index, data['Students'], marker='o', linestyle='-', color='red', label='Historical'),
+            charts.line(forecast_index, forecast_series, marker='o', linestyle='--', color='blue', label='Forecasted', markersize=8),
+            charts.fill_between(forecast_index, forecast_ci.iloc[:, 0], forecast_ci.iloc[:, 1], color='blue', alpha=0.2, label='Confidence Interval'),
+            charts.axhline(unconditional_mean, color='green', linestyle=':', linewidth=2, label=f'Unconditional Mean ({unconditional_mean:.1f})'),
+            # Add forecast values as text annotations
+            *[charts.annotate(f'{year}\n{value:.0f}', (date, value),
+                              xytext=(10, 10),
+                              textcoords='offset points',
+                              bbox=dict(boxstyle='round,pad=0.3', facecolor='blue', alpha=0.3),
+                              fontsize=9)
+              for year, date, value in zip(forecast_years, forecast_index, forecast_series)],
+            title='Forecast of Students for Next 3 Years', xlabel='Year', ylabel='Number of Students',
+            grid=True, legend=True),
+    ], figsize=(12, 6)))
+
+# Render the figures, or leave them to the charts stage of the pipeline
+analysis_options.emit_figures(script_dir, figures, options)
 # Extract forecasted values for summary statistics
 forecasted_students = forecast_series.values
 unconditional_mean_students = unconditional_mean    
@@ -212,17 +190,17 @@ def export_results_to_json():
             "analysis_date": pd.Timestamp.now().isoformat(),
             "data_source": "factnameh",
             "analysis_type": "ARIMA_forecast",
-            "model_order": "(1,1,0)"
+            "model_order": f"({','.join(map(str, order))})"
         },
         "historical_data": {
             "years": data['year'].tolist(),
-            "gregorian_years": data['gregorian_year'].tolist(),
+            "gregorian_years": data.index.year.tolist(),
             "students": data['Students'].tolist(),
             "mean_students": float(unconditional_mean_students),
             "data_points": len(data)
         },
         "forecast": {
-            "forecast_years": forecast_years,
+            "forecast_years": forecast_index.year.tolist(),
             "forecasted_students": forecasted_students.tolist(),
             "forecast_mean": float(np.mean(forecasted_students)),
             "confidence_intervals": {
@@ -0,0 +1,45 @@
+"""
+Command line options shared by the topic analysis scripts.
+
+    --no-plots      compute and print the numbers but do not describe any figure
+    --data-only     also skip the stationarity tests and ACF/PACF diagnostics
+    --defer-plots   write the figure specs but leave rendering to charts.py
+    --preset        resolution preset for the figures (charts.PRESETS)
+    --formats       output formats for the figures
+    --auto-order    search the ARIMA order (model_selection.py) instead of the fixed one
+
+The scripts never import matplotlib, charts.py draws their figure specs. The
+statsmodels diagnostics are only imported when they run, so --data-only also
+cuts the start-up time. bench_startup.py measures the difference.
+"""
+
+import argparse
+
+import charts
+
+
+def parse_args(description=None, argv=None):
+    """Parse the analysis options, adding the derived plots, render and diagnostics switches"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--no-plots', action='store_true', help='skip every figure')
+    parser.add_argument('--data-only', action='store_true',
+                        help='skip figures and diagnostics, only refresh the numbers')
+    parser.add_argument('--defer-plots', action='store_true',
+                        help='only write figures.json, render later with charts.py')
+    parser.add_argument('--preset', choices=list(charts.PRESETS), default=charts.DEFAULT_PRESET,
+                        help='figure resolution preset')
+    parser.add_argument('--formats', nargs='+', choices=charts.FORMATS, default=['png'],
+                        help='figure output formats')
+    parser.add_argument('--auto-order', action='store_true',
+                        help='search the ARIMA order instead of using the one read off the ACF/PACF plots')
+    args = parser.parse_args(argv)
+    args.plots = not (args.no_plots or args.data_only)
+    args.render = args.plots and not args.defer_plots
+    args.diagnostics = not args.data_only
+    return args
+
+
+def emit_figures(script_dir, figures, options):
+    """Hand the figure specs of one script to the rendering stage"""
+    if options.plots:
+        charts.emit(script_dir, figures, render_now=options.render, preset=options.preset, formats=options.formats)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Rolling-origin backtest of every forecast method on every published series.
+
+For each series of the forecasting panel and each origin (the first
+MIN_TRAIN observations, then one more at a time) the series is cut after
+the origin and forecast HORIZON years ahead, to be compared with what was
+observed then. All cut series of all origins are stacked into one panel, so
+the naive, drift and least-squares trend methods are scored in a single
+vectorized call each (fast_forecast.py); ARIMA is fitted per cut series in a
+process pool, through forecast_cache like the build's own fits.
+
+The results table (backtest.csv) has one row per topic, country and method
+with the number of origins, MAE, MAPE and the share of actual values inside
+the 95% interval. Per topic, the cheapest method whose MAPE is within
+TOLERANCE of the best one is suggested, so ARIMA is only paid for where it
+forecasts noticeably better.
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import fast_forecast
+import forecasting
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backtest_path = os.path.join(script_dir, 'backtest.csv')
+
+# Cheapest first
+METHODS = ('naive', 'drift', 'ols', 'arima')
+
+# Every method is scored on the same origins, long enough for the one needing the most points
+MIN_TRAIN = max(forecasting.MIN_POINTS.values())
+
+# MAPE, relative to the best method of a topic, a cheaper method may be off by
+TOLERANCE = 0.10
+
+COLUMNS = ['Topic', 'Country', 'Method', 'Origins', 'MAE', 'MAPE', 'Coverage']
+
+
+def cut_panel(panel, horizon=1, min_train=MIN_TRAIN):
+    """
+    Every (series, origin) of the panel as one row of a stacked panel with
+    the years after the origin masked, and the observed value horizon years
+    after each origin. Origins whose target year was not observed are left out.
+    """
+    values = panel.to_numpy(dtype=float)
+    observed = ~np.isnan(values)
+    # Observations so far, per cell
+    count = np.cumsum(observed, axis=1)
+    # An origin is an observed year with at least min_train observations up to it and horizon years after it
+    target_column = np.arange(values.shape[1]) + horizon
+    has_target = np.zeros_like(observed)
+    has_target[:, :values.shape[1] - horizon] = observed[:, horizon:]
+    rows, columns = np.nonzero(observed & (count >= min_train) & has_target)
+
+    cut = np.where(np.arange(values.shape[1])[None, :] <= columns[:, None], values[rows], np.nan)
+    keys = panel.index[rows]
+    origins = pd.DataFrame({'Topic': keys.get_level_values(0), 'Country': keys.get_level_values(1),
+                            'Origin': panel.columns.to_numpy()[columns],
+                            'Actual': values[rows, target_column[columns]]})
+    return cut, origins
+
+
+def closed_form(method, years, cut, horizon):
+    """Forecast of the last step of every cut series in one call, as (mean, lower, upper)"""
+    if method == 'ols':
+        mean, lower, upper, _ = fast_forecast.trend(years, cut, horizon)
+    else:
+        mean, lower, upper = getattr(fast_forecast, method)(cut, horizon)
+    return mean[:, -1], lower[:, -1], upper[:, -1]
+
+
+def arima_chunk(items, horizon):
+    """ARIMA forecasts of the last step of a chunk of (years, values, differenced) cut series"""
+    results = []
+    with warnings.catch_warnings():
+        # The early origins are tiny samples, statsmodels warns about most of them
+        warnings.simplefilter('ignore')
+        for years, values, differenced in items:
+            mean, lower, upper = forecasting.fit_arima(years, values, horizon, differenced=differenced)
+            results.append((mean[-1], lower[-1], upper[-1]))
+    return results
+
+
+def arima(years, cut, horizon, differenced, jobs=None, chunk_size=8):
+    """differenced flags the cut series fitted on their changes, like forecasting.py fits their topic"""
+    items = []
+    for row, row_differenced in zip(cut, differenced):
+        observed = ~np.isnan(row)
+        items.append((years[observed], row[observed], row_differenced))
+    chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+    if jobs == 1 or len(chunks) <= 1:
+        results = [result for chunk in chunks for result in arima_chunk(chunk, horizon)]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = [result for chunk in pool.map(arima_chunk, chunks, [horizon] * len(chunks))
+                       for result in chunk]
+    return tuple(np.array(column, dtype=float) for column in zip(*results)) if results else (np.array([]),) * 3
+
+
+def backtest(panel, methods=METHODS, horizon=1, jobs=None):
+    """Return the per-origin forecasts of every method and the seconds each method took"""
+    years = panel.columns.to_numpy()
+    cut, origins = cut_panel(panel, horizon)
+    frames = []
+    seconds = {}
+    for method in methods:
+        start = time.perf_counter()
+        if method == 'arima':
+            mean, lower, upper = arima(years, cut, horizon, origins['Topic'].map(forecasting.is_differenced), jobs)
+        else:
+            mean, lower, upper = closed_form(method, years, cut, horizon)
+        seconds[method] = time.perf_counter() - start
+        frames.append(origins.assign(Method=method, Forecast=mean, Lower=lower, Upper=upper))
+    return pd.concat(frames, ignore_index=True), seconds
+
+
+def score(forecasts):
+    """MAE, MAPE (%) and interval coverage per topic, country and method"""
+    error = (forecasts['Forecast'] - forecasts['Actual']).abs()
+    scored = forecasts.assign(
+        AbsoluteError=error,
+        PercentError=100 * error / forecasts['Actual'].abs().replace(0, np.nan),
+        Covered=forecasts['Actual'].between(forecasts['Lower'], forecasts['Upper']).astype(float),
+    )
+    table = scored.groupby(['Topic', 'Country', 'Method'], sort=False).agg(
+        Origins=('Actual', 'size'), MAE=('AbsoluteError', 'mean'), MAPE=('PercentError', 'mean'),
+        Coverage=('Covered', 'mean')).reset_index()
+    # Series together, their methods in the order they were run
+    return table.sort_values(['Topic', 'Country'], kind='stable', ignore_index=True)[COLUMNS]
+
+
+def recommend(table, tolerance=TOLERANCE):
+    """
+    Per topic, the cheapest method whose mean MAPE over the topic's series is
+    within tolerance of the best, NaN for a topic without any scored origin.
+    """
+    by_topic = table.groupby(['Topic', 'Method'], sort=False)['MAPE'].mean().unstack()
+    by_topic = by_topic[[method for method in METHODS if method in by_topic.columns]]
+    scored = by_topic.dropna(how='all')
+    best = scored.min(axis=1)
+    good_enough = scored.le(best * (1 + tolerance), axis=0)
+    return good_enough.idxmax(axis=1).reindex(by_topic.index)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backtest every forecast method on every series from rolling origins')
+    parser.add_argument('--horizon', type=int, default=1, help='years ahead to forecast from every origin')
+    parser.add_argument('--methods', nargs='+', choices=METHODS, default=list(METHODS), help='methods to compare')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of worker processes for ARIMA')
+    parser.add_argument('--output', default=backtest_path, help='CSV to write the results table to')
+    args = parser.parse_args(argv)
+
+    forecasts, seconds = backtest(forecasting.load_panel(), args.methods, args.horizon, args.jobs)
+    table = score(forecasts)
+    table.to_csv(args.output, index=False)
+
+    with pd.option_context('display.width', 120, 'display.max_rows', None):
+        print(table.to_string(index=False, float_format=lambda value: f'{value:,.2f}'))
+    print(f"\n{len(forecasts) // len(args.methods)} origins per method, "
+          + ', '.join(f"{method} {seconds[method]:.2f} s" for method in args.methods))
+    print(f"\nCheapest method within {TOLERANCE:.0%} of the best MAPE, per topic (in use):")
+    for topic, method in recommend(table).items():
+        method = 'insufficient history' if pd.isna(method) else method
+        print(f"  {topic}: {method} ({forecasting.DEFAULT_METHODS.get(topic, 'naive')})")
+    print(f"\nResults written to {os.path.relpath(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
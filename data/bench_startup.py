@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Start-up cost benchmark for the topic analysis scripts.
+
+Runs every analysis script in a fresh interpreter with "python -X importtime"
+once per mode (full, --no-plots, --data-only) and reports the wall time, the
+total time spent importing modules and the most expensive top-level packages.
+Running the scripts refreshes their outputs exactly like a normal run.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from json_writer import write_json
+from topics import TOPICS
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+MODES = {
+    'full': [],
+    'no-plots': ['--no-plots'],
+    'data-only': ['--data-only'],
+}
+
+# "import time:       self |  cumulative | <indent>module"
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(stderr):
+    """Return the total import time and the cumulative time per top-level package, in seconds"""
+    total = 0
+    packages = defaultdict(int)
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        # Only the outermost imports, the nested ones are part of their cumulative time
+        if not match or len(match.group(3)) != 1:
+            continue
+        cumulative = int(match.group(2))
+        total += cumulative
+        packages[match.group(4).split('.')[0]] += cumulative
+    return total / 1e6, {name: us / 1e6 for name, us in packages.items()}
+
+
+def measure(path, script_args):
+    """Run one script once and return its wall time, import time and per-package import time"""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', path, *script_args],
+                               cwd=os.path.dirname(path), capture_output=True, text=True,
+                               env={**os.environ, 'MPLBACKEND': 'Agg'})
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"{path} failed:\n{completed.stderr[-2000:]}")
+    imports, packages = parse_importtime(completed.stderr)
+    return {'wall': wall, 'imports': imports, 'packages': packages}
+
+
+def best_of(path, script_args, repeat):
+    """Fastest of repeat runs, the others only measure noise"""
+    return min((measure(path, script_args) for _ in range(repeat)), key=lambda result: result['wall'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure start-up and import time of the analysis scripts')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES), help='modes to measure')
+    parser.add_argument('--topics', nargs='+', choices=[spec['topic'] for spec in TOPICS],
+                        default=[spec['topic'] for spec in TOPICS], help='only measure these topics')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per script and mode, the fastest is kept')
+    parser.add_argument('--top', type=int, default=3, help='number of heaviest packages to list')
+    parser.add_argument('--output', help='also write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'script':<34} {'mode':<10} {'wall':>8} {'imports':>8}  heaviest imports")
+    for spec in TOPICS:
+        if spec['topic'] not in args.topics:
+            continue
+        relative_path = os.path.join(*spec['analysis'])
+        for mode in args.modes:
+            result = best_of(os.path.join(script_dir, relative_path), MODES[mode], args.repeat)
+            heaviest = sorted(result['packages'].items(), key=lambda item: -item[1])[:args.top]
+            print(f"{relative_path:<34} {mode:<10} {result['wall']:7.2f}s {result['imports']:7.2f}s  "
+                  + ', '.join(f'{name} {seconds:.2f}s' for name, seconds in heaviest))
+            results.append({'topic': spec['topic'], 'script': relative_path, 'mode': mode, **result})
+
+    if args.output:
+        write_json(args.output, {'python': sys.version.split()[0], 'results': results})
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
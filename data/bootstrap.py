@@ -0,0 +1,198 @@
+"""
+Residual bootstrap prediction intervals for a whole panel of series at once.
+
+Every forecaster is served through the same three arrays: its point
+forecast (series x horizon), its in-sample residuals (series x
+observations, NaN where a series has none) and the psi weights of its
+error recursion (series x horizon), the effect of a shock j steps back on
+the forecast error. A random walk (naive, drift) has all weights at one,
+a trend line only the first, an ARIMA the weights of its AR, MA and
+differencing polynomials (arima_psi). Paths are the point forecast plus
+resampled residuals pushed through those weights, simulated for all series
+together as one (series x paths x horizon) array: a single draw of
+residual positions, a gather and a batched matmul with the lower triangular
+psi matrices. The intervals are quantiles over the paths. A Bootstrap
+keeps its random generator and its arrays between calls, so panels of the
+same shape are simulated without allocating again, and a seed makes the
+intervals reproducible.
+"""
+
+import numpy as np
+
+import fast_forecast
+
+DEFAULT_PATHS = 2000
+DEFAULT_SEED = 1404
+
+
+def compact(residuals):
+    """Residuals as a float 2-D array with the valid values of every row moved to the front, and their count"""
+    residuals = np.atleast_2d(np.asarray(residuals, dtype=float))
+    valid = ~np.isnan(residuals)
+    # Stable sort of the invalid flags keeps the valid values in their order
+    order = np.argsort(~valid, axis=1, kind='stable')
+    return np.take_along_axis(residuals, order, axis=1), valid.sum(axis=1)
+
+
+def random_walk_psi(series, horizon):
+    return np.ones((series, horizon))
+
+
+def white_noise_psi(series, horizon):
+    psi = np.zeros((series, horizon))
+    psi[:, 0] = 1.0
+    return psi
+
+
+def arima_psi(ar, ma, d, horizon):
+    """
+    psi weights of ARIMA(p, d, q) with the given AR and MA coefficients: the
+    coefficients of theta(L) / (phi(L) (1 - L)^d) up to lag horizon - 1.
+    """
+    # phi(L) (1 - L)^d as 1 - a_1 L - a_2 L^2 - ...
+    polynomial = np.r_[1.0, -np.asarray(ar, dtype=float)]
+    for _ in range(d):
+        polynomial = np.convolve(polynomial, [1.0, -1.0])
+    a = -polynomial[1:]
+    theta = np.r_[1.0, np.asarray(ma, dtype=float)]
+
+    psi = np.zeros(horizon)
+    for j in range(horizon):
+        psi[j] = (theta[j] if j < len(theta) else 0.0) + sum(a[i - 1] * psi[j - i] for i in range(1, min(j, len(a)) + 1))
+    return psi
+
+
+class Bootstrap:
+    """Seeded residual bootstrap that reuses its arrays between panels of the same shape"""
+
+    def __init__(self, paths=DEFAULT_PATHS, seed=DEFAULT_SEED):
+        self.paths = paths
+        self.rng = np.random.default_rng(seed)
+        self._buffers = {}
+
+    def _buffer(self, name, shape, dtype=float):
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self._buffers[name] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def simulate(self, mean, residuals, psi):
+        """
+        Simulated paths, shaped (series, paths, horizon). The array is reused
+        by the next call with the same shape, copy it to keep it.
+        """
+        mean = np.atleast_2d(np.asarray(mean, dtype=float))
+        psi = np.atleast_2d(np.asarray(psi, dtype=float))
+        pool, counts = compact(residuals)
+        series, horizon = mean.shape
+        shape = (series, self.paths, horizon)
+
+        # Residual positions, drawn uniformly within each row's valid residuals
+        draws = self._buffer('draws', shape)
+        self.rng.random(out=draws)
+        np.multiply(draws, np.maximum(counts, 1)[:, None, None], out=draws)
+        positions = self._buffer('positions', shape, np.intp)
+        np.floor(draws, out=draws)
+        positions[...] = draws
+        # Gather from the flattened pool, each row offset to its own residuals
+        positions += (np.arange(series) * pool.shape[1])[:, None, None]
+        shocks = self._buffer('shocks', shape)
+        np.take(pool.ravel(), positions, out=shocks)
+        # Rows without residuals get no spread
+        shocks[counts == 0] = 0.0
+
+        # error[h] = sum over j <= h of psi[h - j] * shock[j], one lower triangular matrix per series
+        lags = np.arange(horizon)[:, None] - np.arange(horizon)[None, :]
+        weights = np.where(lags >= 0, np.take(psi, np.clip(lags, 0, None), axis=1), 0.0)
+        paths = self._buffer('paths', shape)
+        np.matmul(shocks, weights.transpose(0, 2, 1), out=paths)
+        paths += mean[:, None, :]
+        return paths
+
+    def intervals(self, mean, residuals, psi, level=0.95):
+        """(lower, upper) bounds, each (series, horizon), of the central level share of the paths"""
+        paths = self.simulate(mean, residuals, psi)
+        lower, upper = np.quantile(paths, [0.5 - level / 2, 0.5 + level / 2], axis=1)
+        return lower, upper
+
+
+def closed_form(method, values, horizon=1, x=None, level=0.95, bootstrap=None):
+    """
+    naive, drift or least-squares trend ('ols', over x) forecasts of every
+    row of values with bootstrap intervals, as (mean, lower, upper).
+
+    The random walks resample their year-on-year changes minus the mean
+    change (the slope for drift), so a trending series keeps its interval
+    around its own forecast. The trend resamples its leverage-adjusted
+    residuals and widens each forecast step by sqrt(1 + leverage) of that
+    step, the uncertainty of the fitted line itself. With the handful of
+    residuals of a yearly series the resampled tails are still thinner than
+    the Student t of the analytic intervals (fast_forecast.py), so the two
+    are not interchangeable: bootstrap intervals come out narrower.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    bootstrap = bootstrap or Bootstrap()
+    if method == 'ols':
+        mean, _, _, fitted = fast_forecast.trend(x, values, horizon)
+        leverage, future_leverage = _trend_leverage(x, values, horizon)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # In-sample residuals are shrunk by sqrt(1 - leverage), undo that
+            residuals = (values - fitted) / np.sqrt(1 - leverage)
+        residuals[~np.isfinite(residuals)] = np.nan
+        psi = white_noise_psi(len(values), horizon)
+        lower, upper = bootstrap.intervals(mean, residuals, psi, level)
+        # Quantiles scale with the spread, step by step
+        scale = np.sqrt(1 + future_leverage)
+        return mean, mean + (lower - mean) * scale, mean + (upper - mean) * scale
+
+    mean, _, _ = getattr(fast_forecast, method)(values, horizon)
+    changes = np.diff(values, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if method == 'drift':
+            centre = mean[:, :1] - _last(values)
+        else:
+            centre = np.nansum(changes, axis=1, keepdims=True) / np.sum(~np.isnan(changes), axis=1, keepdims=True)
+        residuals = changes - centre
+    psi = random_walk_psi(len(values), horizon)
+    lower, upper = bootstrap.intervals(mean, residuals, psi, level)
+    return mean, lower, upper
+
+
+def _trend_leverage(x, values, horizon):
+    """
+    Leverage 1/n + (x - mean x)^2 / Sxx of every observation of each row's
+    trend fit, and of its forecast points, placed like fast_forecast.trend() places them.
+    """
+    x = np.asarray(x, dtype=float)
+    observed = ~np.isnan(values)
+    n = observed.sum(axis=1, keepdims=True)
+    last = values.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+    step = np.median(np.diff(x)) if len(x) > 1 else 1.0
+    future = x[last][:, None] + step * np.arange(1, horizon + 1)[None, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.where(observed, x, 0.0).sum(axis=1, keepdims=True) / n
+        sxx = np.where(observed, (x - x_mean) ** 2, 0.0).sum(axis=1, keepdims=True)
+        return 1 / n + (x - x_mean) ** 2 / sxx, 1 / n + (future - x_mean) ** 2 / sxx
+
+
+def _last(values):
+    """Last observed value of every row, as a column"""
+    observed = ~np.isnan(values)
+    last = values.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+    return values[np.arange(len(values)), last][:, None]
+
+
+def arima(mean, fit, order, integrate=0, level=0.95, bootstrap=None):
+    """
+    Bootstrap intervals around the point forecast mean of one ARIMA(order)
+    fit, a forecast_cache.arima_forecast() result with its residuals and
+    coefficients. integrate is how many more times the forecast was summed
+    up, when the model was fitted on differences of the series of mean. The
+    first p + d residuals only absorb the start of the series and are left out.
+    """
+    p, d, _ = order
+    mean = np.asarray(mean, dtype=float)
+    residuals = np.asarray(fit['resid'], dtype=float)[p + d:]
+    psi = arima_psi(fit['ar'], fit['ma'], d + integrate, len(mean))
+    lower, upper = (bootstrap or Bootstrap()).intervals(mean[None, :], residuals[None, :], psi[None, :], level)
+    return lower[0], upper[0]
@@ -0,0 +1,107 @@
+"""
+Chart-ready series for the counter modals.
+
+The details files used to carry every series as a full array over the year
+axis, mostly null for the world countries, which the page handed to a new
+Chart.js instance on every modal open. Here each series becomes its sparse
+(year, value) pairs, with the axis bounds computed once at build time, so
+the page only swaps the datasets of the chart it already has.
+
+The pairs are written as two integer lists, plain or delta coded (the
+first number, then the differences, mostly small), or as a base64 string
+of zigzag varints of those differences, the smallest of the three. A series
+with non-integral values is always written plain, and says so.
+"""
+
+import base64
+
+ENCODINGS = ('plain', 'delta', 'varint')
+DEFAULT_ENCODING = 'delta'
+
+
+def sparse(years, values):
+    """The (years, values) of a series with the missing years left out"""
+    pairs = [(year, value) for year, value in zip(years, values or []) if value is not None]
+    return [year for year, _ in pairs], [value for _, value in pairs]
+
+
+def _deltas(numbers):
+    return [current - previous for previous, current in zip([0] + numbers, numbers)]
+
+
+def _varints(numbers):
+    """Zigzag LEB128 bytes of signed integers"""
+    out = bytearray()
+    for number in numbers:
+        number = (number << 1) ^ (number >> 63)
+        while number >= 0x80:
+            out.append(number & 0x7F | 0x80)
+            number >>= 7
+        out.append(number)
+    return bytes(out)
+
+
+def integral(numbers):
+    return all(float(number).is_integer() for number in numbers)
+
+
+def encode(numbers, encoding=DEFAULT_ENCODING):
+    """Numbers in one of ENCODINGS, see decodeSeries() in scripts.js for the reverse"""
+    if encoding == 'plain':
+        return list(numbers)
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown chart encoding {encoding!r}, expected one of {ENCODINGS}")
+    if not integral(numbers):
+        # The differences are integers, a fractional value would be silently truncated
+        raise ValueError(f"Chart encoding {encoding!r} needs integral values, use 'plain'")
+    numbers = [int(number) for number in numbers]
+    if encoding == 'delta':
+        return _deltas(numbers)
+    # varint
+    return base64.b64encode(_varints(_deltas(numbers))).decode('ascii')
+
+
+def chart_payload(details, encoding=DEFAULT_ENCODING):
+    """
+    The chart of one details entry: Iran first, then the world countries in
+    their CSV order, with the year axis and value bounds over all of them.
+    """
+    series = [('Iran', details.get('chartYears', []), details.get('chartData'))]
+    world = details.get('world') or {}
+    series += [(country, world['chartYears'], entry.get('chartData'))
+               for country, entry in world.items() if country != 'chartYears']
+
+    axis_years = [year for _, years, _ in series for year in years]
+    payload = {
+        'encoding': encoding,
+        'years': [min(axis_years), max(axis_years)] if axis_years else [],
+        'y': [],
+        'series': [],
+    }
+    all_values = []
+    for key, years, values in series:
+        years, values = sparse(years, values)
+        if not values:
+            continue
+        all_values += values
+        entry = {'key': key}
+        if not integral(values):
+            # Fractional values, this series alone is written plain
+            entry['encoding'] = series_encoding = 'plain'
+        else:
+            series_encoding = encoding
+        entry.update(years=encode(years, series_encoding), values=encode(values, series_encoding))
+        payload['series'].append(entry)
+    if all_values:
+        payload['y'] = [min(all_values), max(all_values)]
+    return payload
+
+
+def shard_details(details, encoding=DEFAULT_ENCODING):
+    """A details entry for api/details/: the chart payload in place of the full series arrays"""
+    shard = {key: value for key, value in details.items() if key not in ('chartData', 'chartYears', 'world')}
+    if 'world' in details:
+        shard['world'] = {country: {key: value for key, value in entry.items() if key != 'chartData'}
+                          for country, entry in details['world'].items() if country != 'chartYears'}
+    shard['chart'] = chart_payload(details, encoding)
+    return shard
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Figure rendering stage.
+
+The analysis scripts do not draw with matplotlib themselves. They describe
+every figure as a JSON-able spec (axes, layers and the data behind them,
+built with the helpers below) and hand the list to emit(), which saves it as
+figures.json in the topic directory. render() then draws the specs in a
+process pool on the Agg backend, at the DPI of a named preset (unless the
+figure pins its own) and in any of png, svg and webp. A figure is only drawn
+again when its spec, the preset or the format changed since the last render,
+which chart_manifest.json records.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from json_writer import write_json
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+manifest_path = os.path.join(script_dir, 'chart_manifest.json')
+
+SPEC_FILE = 'figures.json'
+
+# The print preset matches what most scripts always rendered, web is for the site. A figure that was
+# always saved at another resolution keeps it through its own dpi (see figure())
+PRESETS = {
+    'print': {'dpi': 300},
+    'web': {'dpi': 100},
+}
+DEFAULT_PRESET = 'print'
+
+FORMATS = ('png', 'svg', 'webp')
+
+# Bump when draw() changes, so every figure is rendered again
+RENDERER_VERSION = 1
+
+
+def _plain(values):
+    """Return a list for JSON, with dates as ISO day strings"""
+    if hasattr(values, 'strftime'):
+        return list(values.strftime('%Y-%m-%d'))
+    if hasattr(values, 'tolist'):
+        return values.tolist()
+    return [_point(value) for value in values]
+
+
+def _point(value):
+    """A single x or y value for JSON"""
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def figure(name, axes, figsize=(12, 8), tight=True, dpi=None):
+    """
+    A figure written to <topic dir>/<name>.<format>, axes is a list of axes().
+    tight crops to the drawn area, dpi pins the resolution whatever the preset.
+    """
+    return {'name': name, 'figsize': list(figsize), 'tight': tight, 'dpi': dpi, 'axes': list(axes)}
+
+
+def axes(*layers, position=None, title=None, xlabel=None, ylabel=None, grid=False, legend=False,
+         title_style=None, label_style=None):
+    """
+    One set of axes. position is the (rows, columns, index) of plt.subplot,
+    grid and legend are True or a dict of keyword arguments.
+    """
+    return {
+        'position': list(position) if position else None,
+        'title': title,
+        'xlabel': xlabel,
+        'ylabel': ylabel,
+        'grid': grid,
+        'legend': legend,
+        'title_style': title_style or {},
+        'label_style': label_style or {},
+        'layers': list(layers),
+    }
+
+
+def line(x, y, **style):
+    return {'kind': 'plot', 'x': _plain(x), 'y': _plain(y), 'style': style}
+
+
+def scatter(x, y, **style):
+    return {'kind': 'scatter', 'x': _plain(x), 'y': _plain(y), 'style': style}
+
+
+def fill_between(x, lower, upper, **style):
+    return {'kind': 'fill_between', 'x': _plain(x), 'lower': _plain(lower), 'upper': _plain(upper), 'style': style}
+
+
+def axhline(y, **style):
+    return {'kind': 'axhline', 'y': _point(y), 'style': style}
+
+
+def annotate(text, xy, **style):
+    return {'kind': 'annotate', 'text': text, 'xy': [_point(value) for value in xy], 'style': style}
+
+
+def note(text, x=0.5, y=0.5, **style):
+    """Text placed in axes coordinates, (0.5, 0.5) is the centre"""
+    return {'kind': 'note', 'text': text, 'x': x, 'y': y, 'style': style}
+
+
+def acf(values, lags, **style):
+    return {'kind': 'acf', 'values': _plain(values), 'lags': lags, 'style': style}
+
+
+def pacf(values, lags, **style):
+    return {'kind': 'pacf', 'values': _plain(values), 'lags': lags, 'style': style}
+
+
+def spec_digest(spec, preset, fmt):
+    """Hash of everything that decides the rendered bytes"""
+    payload = {'spec': spec, 'preset': PRESETS[preset], 'format': fmt, 'version': RENDERER_VERSION}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _values(values):
+    """Turn ISO date strings back into datetime64 for matplotlib"""
+    import numpy as np
+
+    if values and isinstance(values[0], str):
+        return np.array(values, dtype='datetime64[D]')
+    return np.array(values, dtype=float)
+
+
+def _draw_layer(ax, layer):
+    import numpy as np
+
+    kind, style = layer['kind'], layer['style']
+    if kind == 'plot':
+        ax.plot(_values(layer['x']), _values(layer['y']), **style)
+    elif kind == 'scatter':
+        ax.scatter(_values(layer['x']), _values(layer['y']), **style)
+    elif kind == 'fill_between':
+        ax.fill_between(_values(layer['x']), _values(layer['lower']), _values(layer['upper']), **style)
+    elif kind == 'axhline':
+        ax.axhline(y=layer['y'], **style)
+    elif kind == 'annotate':
+        x, y = layer['xy']
+        ax.annotate(layer['text'], xy=(np.datetime64(x) if isinstance(x, str) else x, y), **style)
+    elif kind == 'note':
+        ax.text(layer['x'], layer['y'], layer['text'], transform=ax.transAxes, **style)
+    elif kind in ('acf', 'pacf'):
+        # statsmodels is only needed for the diagnostic figures
+        from statsmodels.graphics.tsaplots import plot_acf, plot_pacf
+
+        plot = plot_acf if kind == 'acf' else plot_pacf
+        plot(_values(layer['values']), ax=ax, lags=layer['lags'], **style)
+    else:
+        raise ValueError(f"Unknown layer kind {kind!r}")
+
+
+def draw(spec, stem, preset, formats):
+    """Render one figure spec to stem.<format> for every format"""
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=spec['figsize'])
+    try:
+        for axes_spec in spec['axes']:
+            ax = fig.add_subplot(*axes_spec['position']) if axes_spec['position'] else fig.add_subplot()
+            for layer in axes_spec['layers']:
+                _draw_layer(ax, layer)
+            # Titles and labels after the layers, plot_acf sets its own title
+            if axes_spec['title'] is not None:
+                ax.set_title(axes_spec['title'], **axes_spec['title_style'])
+            if axes_spec['xlabel'] is not None:
+                ax.set_xlabel(axes_spec['xlabel'], **axes_spec['label_style'])
+            if axes_spec['ylabel'] is not None:
+                ax.set_ylabel(axes_spec['ylabel'], **axes_spec['label_style'])
+            if axes_spec['grid']:
+                ax.grid(True, **(axes_spec['grid'] if isinstance(axes_spec['grid'], dict) else {}))
+            if axes_spec['legend']:
+                ax.legend(**(axes_spec['legend'] if isinstance(axes_spec['legend'], dict) else {}))
+        if spec['tight']:
+            fig.tight_layout()
+        paths = []
+        for fmt in formats:
+            path = f'{stem}.{fmt}'
+            fig.savefig(path, dpi=spec.get('dpi') or PRESETS[preset]['dpi'],
+                        bbox_inches='tight' if spec['tight'] else None)
+            paths.append(path)
+        return paths
+    finally:
+        plt.close(fig)
+
+
+def emit(topic_dir, figures, render_now=True, preset=DEFAULT_PRESET, formats=('png',)):
+    """Save the figure specs of one analysis as figures.json and, unless deferred, render them"""
+    write_json(os.path.join(topic_dir, SPEC_FILE), {'figures': figures}, compact=True)
+    if render_now:
+        render([topic_dir], preset=preset, formats=formats)
+
+
+def load_specs(topic_dirs=None):
+    """Return (topic_dir, spec) for every figure in the given (default: all) topic directories"""
+    if topic_dirs is None:
+        paths = sorted(glob.glob(os.path.join(script_dir, '*', SPEC_FILE)))
+    else:
+        paths = [os.path.join(topic_dir, SPEC_FILE) for topic_dir in topic_dirs]
+    specs = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for spec in json.load(f)['figures']:
+                specs.append((os.path.dirname(path), spec))
+    return specs
+
+
+def _pool_context():
+    # fork lets the workers inherit matplotlib if the parent already imported it
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else None)
+
+
+def render(topic_dirs=None, preset=DEFAULT_PRESET, formats=('png',), jobs=None, force=False):
+    """
+    Render every stale figure of the given topic directories.
+
+    A figure is stale when its output file is missing or the digest of its
+    spec, preset and format differs from chart_manifest.json. Returns the
+    number of figures rendered and skipped.
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+
+    tasks = []
+    skipped = 0
+    for topic_dir, spec in load_specs(topic_dirs):
+        stem = os.path.join(topic_dir, spec['name'])
+        stale = []
+        for fmt in formats:
+            key = os.path.relpath(f'{stem}.{fmt}', script_dir).replace(os.sep, '/')
+            digest = spec_digest(spec, preset, fmt)
+            if force or manifest.get(key) != digest or not os.path.exists(f'{stem}.{fmt}'):
+                stale.append((fmt, key, digest))
+        if stale:
+            tasks.append((spec, stem, stale))
+        else:
+            skipped += 1
+
+    def done(stale):
+        for _, key, digest in stale:
+            manifest[key] = digest
+
+    if jobs == 1 or len(tasks) <= 1:
+        for spec, stem, stale in tasks:
+            draw(spec, stem, preset, [fmt for fmt, _, _ in stale])
+            done(stale)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=_pool_context()) as pool:
+            futures = [(pool.submit(draw, spec, stem, preset, [fmt for fmt, _, _ in stale]), stale)
+                       for spec, stem, stale in tasks]
+            for future, stale in futures:
+                future.result()
+                done(stale)
+
+    write_json(manifest_path, manifest)
+    return len(tasks), skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render the figure specs written by the analysis scripts')
+    parser.add_argument('--preset', choices=list(PRESETS), default=DEFAULT_PRESET, help='resolution preset')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=['png'], help='output formats')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--force', action='store_true', help='render every figure even if unchanged')
+    args = parser.parse_args(argv)
+
+    rendered, skipped = render(preset=args.preset, formats=args.formats, jobs=args.jobs, force=args.force)
+    print(f"Rendered {rendered} figures, {skipped} unchanged ({args.preset}, {', '.join(args.formats)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
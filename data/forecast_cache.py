@@ -0,0 +1,200 @@
+"""
+On-disk cache for fitted forecasts.
+
+A forecast is identified by a hash of the input series (index and values),
+the model specification and the forecast horizon. The cached entry keeps the
+predicted mean, the confidence interval bounds and the fit summary, so a
+build whose yearly series did not change never calls model.fit() again.
+The cache is bounded in size, least recently used entries are evicted first.
+
+Seasonal models also keep the parameters of their last fit, so a series that
+only gained a new month is refitted from those instead of from scratch.
+"""
+
+import hashlib
+import json
+import math
+import os
+
+from json_writer import write_json
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+cache_dir = os.path.join(script_dir, '.forecast_cache')
+
+MAX_CACHE_BYTES = 8 * 1024 * 1024
+
+# Part of the ARIMA cache keys, bumped when the fields cached per fit change
+ARIMA_VERSION = 2
+
+
+def _plain(value):
+    """Return a JSON-able version of a series value or index label"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def cache_key(series, spec, horizon):
+    """Hash a pandas Series together with the model spec and horizon"""
+    payload = {
+        'index': [_plain(label) for label in series.index],
+        'values': [_plain(value) for value in series.tolist()],
+        'spec': spec,
+        'horizon': horizon,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(cache_dir, f'{key}.json')
+
+
+def load(key):
+    """Return the cached result for key, or None"""
+    path = _entry_path(key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        # Mark the entry as recently used for eviction
+        os.utime(path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        # Missing, or evicted by another worker in the meantime
+        return None
+    return result
+
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    """Delete the least recently used entries until the cache fits in max_bytes"""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.json'):
+            try:
+                stat = os.stat(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                # Another worker evicted it since the listing
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def store(key, result, max_bytes=MAX_CACHE_BYTES):
+    """Save a result under key and keep the cache within max_bytes"""
+    os.makedirs(cache_dir, exist_ok=True)
+    write_json(_entry_path(key), result, compact=True)
+    evict(max_bytes)
+
+
+def cached_forecast(series, spec, horizon, fit):
+    """
+    Return fit() for this series, spec and horizon, computing it only on a miss.
+
+    fit must return a JSON-able dict, by convention with 'predicted_mean',
+    'conf_int' ([lower, upper]) and 'summary'.
+    """
+    key = cache_key(series, spec, horizon)
+    result = load(key)
+    if result is None:
+        result = fit()
+        store(key, result)
+    return result
+
+
+def arima_forecast(series, order, steps, alpha=0.05):
+    """Fit ARIMA(order) on series and forecast steps ahead, through the cache"""
+    spec = {'model': 'ARIMA', 'order': list(order), 'alpha': alpha, 'version': ARIMA_VERSION}
+
+    def fit():
+        # Only needed on a cache miss
+        from statsmodels.tsa.arima.model import ARIMA
+
+        # Fitted on positions like sarimax_forecast(), yearly series are indexed by irregular Nowruz dates
+        model_fit = ARIMA(series.reset_index(drop=True), order=order).fit()
+        forecast = model_fit.get_forecast(steps=steps)
+        conf_int = forecast.conf_int(alpha=alpha)
+        return {
+            'predicted_mean': forecast.predicted_mean.tolist(),
+            'conf_int': [conf_int.iloc[:, 0].tolist(), conf_int.iloc[:, 1].tolist()],
+            'summary': str(model_fit.summary()),
+            'params': model_fit.params.tolist(),
+            # For bootstrap.arima()
+            'ar': model_fit.arparams.tolist(),
+            'ma': model_fit.maparams.tolist(),
+            'resid': [_plain(value) for value in model_fit.resid.tolist()],
+        }
+
+    return cached_forecast(series, spec, steps, fit)
+
+
+def _spec_key(spec):
+    encoded = json.dumps(spec, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _observations(series):
+    return {'index': [_plain(label) for label in series.index], 'values': [_plain(value) for value in series.tolist()]}
+
+
+def warm_start(model_spec, series):
+    """
+    Parameters of the last fit of model_spec, if series extends the series
+    that fit was made on (same observations, new ones appended), else None.
+    """
+    previous = load(f'warm-{_spec_key(model_spec)}')
+    if previous is None:
+        return None
+    observations = _observations(series)
+    length = len(previous['index'])
+    if len(observations['index']) < length or any(
+            observations[field][:length] != previous[field] for field in ('index', 'values')):
+        return None
+    return previous['params']
+
+
+def sarimax_forecast(series, order, seasonal_order, steps, exog=None, future_exog=None, alpha=0.05):
+    """
+    Fit SARIMAX on series and forecast steps ahead, through the cache.
+
+    exog and future_exog are a single regressor over the series and over the
+    forecast steps. On a cache miss the fit starts from the parameters of the
+    previous fit when the series only grew since (see warm_start()).
+    """
+    model_spec = {'model': 'SARIMAX', 'order': list(order), 'seasonal_order': list(seasonal_order)}
+    spec = {**model_spec, 'alpha': alpha,
+            'exog': None if exog is None else [_plain(value) for value in exog],
+            'future_exog': None if future_exog is None else [_plain(value) for value in future_exog]}
+
+    def fit():
+        # Only needed on a cache miss
+        import numpy as np
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+        # Fitted on positions, the index only identifies the observations
+        model = SARIMAX(series.to_numpy(dtype=float), exog=exog, order=order, seasonal_order=seasonal_order)
+        start_params = warm_start(model_spec, series)
+        model_fit = model.fit(start_params=start_params, disp=False)
+        forecast = model_fit.get_forecast(
+            steps=steps, exog=None if future_exog is None else np.asarray(future_exog, dtype=float).reshape(steps, 1))
+        conf_int = forecast.conf_int(alpha=alpha)
+        store(f'warm-{_spec_key(model_spec)}', {**_observations(series), 'params': model_fit.params.tolist()})
+        return {
+            'predicted_mean': forecast.predicted_mean.tolist(),
+            'conf_int': [conf_int[:, 0].tolist(), conf_int[:, 1].tolist()],
+            'summary': str(model_fit.summary()),
+            'params': model_fit.params.tolist(),
+            'warm_start': start_params is not None,
+        }
+
+    return cached_forecast(series, spec, steps, fit)
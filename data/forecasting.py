@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Batched forecasting engine for every published series.
+
+Builds one panel out of every Iran topic in time_series_Iran.csv and every
+country row in time_series_World.csv, then forecasts all of them at once with
+the model family chosen per topic: naive, drift and least-squares trend
+forecasts are solved for all their series at once in NumPy (fast_forecast.py),
+ARIMA fits are spread over a process pool in chunks. The result is a tidy table (one row per
+series and forecast year) written to forecasts.csv, which json_creator.py
+reads next to the other topic tables. With --auto-order every ARIMA series
+gets the order model_selection.py picks for it instead of ARIMA_ORDER, and
+with --intervals bootstrap the intervals of every method come from the
+residual bootstrap of bootstrap.py instead of the analytic formulas.
+
+The ARIMA topics are prepared like their analysis scripts prepare them
+(ARIMA_SERIES): Car Accidents is fitted on its year-on-year changes and
+summed back up, Education Dropout only from 1398 on. The data is the
+published time series, not the scripts' own files, so the forecasts can
+still differ from the scripts' numbers. An ARIMA series with missing years
+inside its span is not fitted, it gets the naive forecast and is reported.
+"""
+
+import argparse
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import bootstrap
+import fast_forecast
+import forecast_cache
+import model_selection
+import store
+from series_index import TimeSeriesIndex
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+forecasts_path = os.path.join(script_dir, 'forecasts.csv')
+
+# Model family per topic, the same choices the topic analysis scripts make
+DEFAULT_METHODS = {
+    'Car Accidents': 'arima',
+    'Education Dropout': 'arima',
+    'Air Pollution': 'ols',
+    'Workers Died': 'naive',
+    'Death Penalty': 'naive',
+}
+
+ARIMA_ORDER = (1, 1, 0)
+
+# How the analysis scripts prepare their ARIMA series: Accidents_Process.py fits the
+# year-on-year changes and adds them back up, Education_process.py leaves out the years before covid
+ARIMA_SERIES = {
+    'Car Accidents': {'differenced': True},
+    'Education Dropout': {'first_year': 1398},
+}
+
+# Series shorter than this fall back to the naive forecast
+MIN_POINTS = {'arima': 5, 'ols': 3, 'drift': 2, 'naive': 1}
+
+INTERVALS = ('analytic', 'bootstrap')
+
+COLUMNS = ['Topic', 'Country', 'Method', 'Horizon', 'Year', 'Forecast', 'Lower', 'Upper']
+
+
+def load_panel():
+    """Return a float frame indexed by (Topic, Country) with one column per Persian year"""
+    connection = store.connect()
+    try:
+        frames = [TimeSeriesIndex.from_store(dataset, connection=connection).frame()
+                  for dataset in ('time_series_Iran.csv', 'time_series_World.csv')]
+    finally:
+        connection.close()
+    return pd.concat(frames).sort_index(axis=1)
+
+
+def _observed(years, values):
+    """Drop the missing years of one series"""
+    mask = ~np.isnan(values)
+    return years[mask], values[mask]
+
+
+def closed_form_batch(method, panel, horizon, intervals='analytic'):
+    """Naive, drift or trend forecasts for every row of the panel in one vectorized pass"""
+    values = panel.to_numpy(dtype=float)
+    years = panel.columns.to_numpy()
+    if intervals == 'bootstrap':
+        mean, lower, upper = bootstrap.closed_form(method, values, horizon, x=years)
+    elif method == 'ols':
+        mean, lower, upper, _ = fast_forecast.trend(years, values, horizon)
+    else:
+        mean, lower, upper = getattr(fast_forecast, method)(values, horizon)
+
+    # Forecast years start after the last observed year of each row
+    observed = ~np.isnan(values)
+    last = values.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+
+    records = []
+    for row, (topic, country) in enumerate(panel.index):
+        if not observed[row].any():
+            continue
+        for h in range(horizon):
+            records.append((topic, country, method, h + 1, int(years[last[row]]) + h + 1,
+                            float(mean[row, h]), float(lower[row, h]), float(upper[row, h])))
+    return records
+
+
+def is_differenced(topic):
+    return ARIMA_SERIES.get(topic, {}).get('differenced', False)
+
+
+def arima_input(values, differenced=False):
+    """The series an ARIMA is fitted on, the year-on-year changes of a differenced topic"""
+    return np.diff(values) if differenced else values
+
+
+def fit_arima(years, values, horizon, order=ARIMA_ORDER, intervals='analytic', differenced=False):
+    """ARIMA forecast through the on-disk cache"""
+    # Fitted on positions, the years only label the result
+    result = forecast_cache.arima_forecast(pd.Series(arima_input(values, differenced)), order=order, steps=horizon)
+    if differenced:
+        mean = values[-1] + np.cumsum(result['predicted_mean'])
+        # The bounds of the changes cannot be summed up, so the residuals are bootstrapped
+        # through the model integrated once more, like Accidents_Process.py does
+        return (mean, *bootstrap.arima(mean, result, order, integrate=1))
+    if intervals == 'bootstrap':
+        return (result['predicted_mean'], *bootstrap.arima(result['predicted_mean'], result, order))
+    return result['predicted_mean'], result['conf_int'][0], result['conf_int'][1]
+
+
+def fit_chunk(items, horizon, intervals='analytic'):
+    """Fit ARIMA on a chunk of (topic, country, years, values, order) series"""
+    records = []
+    for topic, country, years, values, order in items:
+        with warnings.catch_warnings():
+            # The fit summary of a short series has no heteroskedasticity test
+            warnings.filterwarnings('ignore', message='.*too few non-missing observations')
+            mean, lower, upper = fit_arima(years, values, horizon, order, intervals, is_differenced(topic))
+        for h in range(horizon):
+            records.append((topic, country, 'arima', h + 1, int(years[-1]) + h + 1,
+                            float(mean[h]), float(lower[h]), float(upper[h])))
+    return records
+
+
+def assign_methods(panel, methods=None):
+    """
+    The panel rows of each closed-form method, the (topic, country, years,
+    values) of the ARIMA series (their observed years from ARIMA_SERIES'
+    first_year on) and the (topic, country) of the ARIMA series refused
+    for missing years inside their span.
+
+    methods maps a Topic to 'naive', 'drift', 'ols' or 'arima'
+    (DEFAULT_METHODS by default, topics not listed use the naive forecast).
+    Series too short for their model, or refused, get the naive forecast instead.
+    """
+    methods = {**DEFAULT_METHODS, **(methods or {})}
+    years = panel.columns.to_numpy()
+
+    rows = {'naive': [], 'drift': [], 'ols': []}
+    arima_items = []
+    gapped = []
+    for row, (topic, country) in enumerate(panel.index):
+        method = methods.get(topic, 'naive')
+        observed_years, observed_values = _observed(years, panel.iloc[row].to_numpy(dtype=float))
+        first_year = ARIMA_SERIES.get(topic, {}).get('first_year')
+        if method == 'arima' and first_year is not None:
+            recent = observed_years >= first_year
+            observed_years, observed_values = observed_years[recent], observed_values[recent]
+        if len(observed_values) < MIN_POINTS[method]:
+            method = 'naive'
+        if method == 'arima' and np.any(np.diff(observed_years) != 1):
+            # ARIMA would take the years on each side of a gap for neighbours
+            gapped.append((topic, country))
+            method = 'naive'
+        if method == 'arima':
+            arima_items.append((topic, country, observed_years, observed_values))
+        else:
+            rows[method].append(row)
+    return rows, arima_items, gapped
+
+
+def arima_series(panel, methods=None):
+    return assign_methods(panel, methods)[1]
+
+
+def forecast_panel(panel, methods=None, horizon=1, jobs=None, chunk_size=8, auto_order=False, intervals='analytic'):
+    """
+    Forecast every series of the panel and return the tidy forecasts table.
+
+    See assign_methods() for methods. auto_order searches the order of every
+    ARIMA series (model_selection.py) instead of using ARIMA_ORDER. intervals
+    is 'analytic' or 'bootstrap'.
+    """
+    rows, arima_items, gapped = assign_methods(panel, methods)
+    for topic, country in gapped:
+        print(f"{topic} / {country}: missing years inside the series, naive forecast instead of ARIMA")
+    if auto_order:
+        series_list = [pd.Series(arima_input(values, is_differenced(topic))) for topic, _, _, values in arima_items]
+        selections = model_selection.select_orders(series_list, jobs=jobs)
+        orders = [tuple(selection['order']) for selection in selections]
+        for (topic, country, _, _), selection in zip(arima_items, selections):
+            if selection.get('fallback'):
+                print(f"{topic} / {country}: no candidate order could be fitted, ARIMA{ARIMA_ORDER} kept")
+    else:
+        orders = [ARIMA_ORDER] * len(arima_items)
+    arima_items = [(*item, order) for item, order in zip(arima_items, orders)]
+
+    records = []
+    for method, method_rows in rows.items():
+        if method_rows:
+            records.extend(closed_form_batch(method, panel.iloc[method_rows], horizon, intervals))
+
+    # Only ARIMA needs statsmodels, one fit per series
+    chunks = [arima_items[start:start + chunk_size] for start in range(0, len(arima_items), chunk_size)]
+    if jobs == 1 or len(chunks) <= 1:
+        for items in chunks:
+            records.extend(fit_chunk(items, horizon, intervals))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(fit_chunk, items, horizon, intervals) for items in chunks]
+            for future in futures:
+                records.extend(future.result())
+
+    forecasts = pd.DataFrame.from_records(records, columns=COLUMNS)
+    return forecasts.sort_values(['Topic', 'Country', 'Horizon'], ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Forecast every Iran and world series in one batch')
+    parser.add_argument('--horizon', type=int, default=1, help='number of years to forecast')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--output', default=forecasts_path, help='CSV to write the forecasts table to')
+    parser.add_argument('--auto-order', action='store_true', help='search the order of every ARIMA series')
+    parser.add_argument('--intervals', choices=INTERVALS, default='analytic', help='how the 95%% intervals are computed')
+    args = parser.parse_args(argv)
+
+    forecasts = forecast_panel(load_panel(), horizon=args.horizon, jobs=args.jobs, auto_order=args.auto_order,
+                               intervals=args.intervals)
+    forecasts.to_csv(args.output, index=False)
+    print(f"Wrote {len(forecasts)} forecasts for {forecasts.groupby(['Topic', 'Country']).ngroups} series to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
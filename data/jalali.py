@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Persian (Jalali) calendar and Iran time, the same arithmetic as scripts.js.
+
+Kept line for line with gregorianToJalali(), getPersianDate() and
+getPersianTime() in assets/js/scripts.js, so a value computed here at build
+time is the value the page computes in the browser.
+
+The build also ships api/calendar.json: the day Farvardin 1 falls on for the
+first of a range of Persian years around the current one and which of those
+years are leap years. Every month start follows from that, so the page (and
+CalendarTable here) finds the Persian date and the progress through the
+month or year with one binary search over the month starts, with the real
+length of Esfand, instead of running the conversion again.
+
+For the analysis scripts the same arithmetic runs on NumPy arrays:
+to_gregorian() and from_gregorian() convert whole columns of dates, and
+year_index() and month_index() build the (cached) DatetimeIndex of the days
+Persian years and months start on, so yearly data sits on Nowruz and not on
+January 1 of a Gregorian year 621 later. Pandas periods only follow
+Gregorian boundaries, hence the start days rather than a PeriodIndex.
+"""
+
+import argparse
+import bisect
+import functools
+import itertools
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from json_writer import write_json
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+calendar_path = os.path.join(script_dir, 'api', 'calendar.json')
+
+MONTH_NAMES = ['فروردین', 'اردیبهشت', 'خرداد', 'تیر', 'مرداد', 'شهریور',
+               'مهر', 'آبان', 'آذر', 'دی', 'بهمن', 'اسفند']
+
+GREGORIAN_MONTH_DAYS = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+# Iran is UTC+3:30 all year
+IRAN_OFFSET = timedelta(hours=3, minutes=30)
+
+# Persian years on each side of the current one in api/calendar.json
+CALENDAR_SPAN = 50
+
+# Day numbers count days since 1970-01-01, like Date.UTC() / 86400000 in the page
+EPOCH = date(1970, 1, 1)
+
+# The arithmetic below counts days from here, see gregorian_to_jalali()
+GREGORIAN_BASE = np.datetime64('1600-01-01', 'D')
+
+# Days before each Persian month within its year
+JALALI_MONTH_OFFSETS = np.cumsum([0] + [31] * 6 + [30] * 5)
+
+_PERSIAN_DIGITS = str.maketrans('0123456789', '۰۱۲۳۴۵۶۷۸۹')
+
+
+def iran_time(now=None):
+    """The wall-clock time in Iran as a naive datetime, now defaults to the current time"""
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    return (now.astimezone(timezone.utc) + IRAN_OFFSET).replace(tzinfo=None)
+
+
+def gregorian_to_jalali(gy, gm, gd):
+    """Return the Jalali (year, month, day) of a Gregorian date"""
+    g_y = gy - 1600
+    g_m = gm - 1
+    g_d = gd - 1
+
+    g_day_no = 365 * g_y + (g_y + 3) // 4 - (g_y + 99) // 100 + (g_y + 399) // 400
+    g_day_no += sum(GREGORIAN_MONTH_DAYS[:g_m])
+    if g_m > 1 and ((gy % 4 == 0 and gy % 100 != 0) or gy % 400 == 0):
+        g_day_no += 1
+    g_day_no += g_d
+
+    j_day_no = g_day_no - 79
+    j_np = j_day_no // 12053
+    j_day_no %= 12053
+
+    jy = 979 + 33 * j_np + 4 * (j_day_no // 1461)
+    j_day_no %= 1461
+
+    if j_day_no >= 366:
+        jy += (j_day_no - 1) // 365
+        j_day_no = (j_day_no - 1) % 365
+
+    if j_day_no < 186:
+        jm = 1 + j_day_no // 31
+        jd = 1 + j_day_no % 31
+    else:
+        jm = 7 + (j_day_no - 186) // 30
+        jd = 1 + (j_day_no - 186) % 30
+    return jy, jm, jd
+
+
+def from_gregorian(dates):
+    """Jalali (years, months, days) integer arrays of an array of dates, gregorian_to_jalali() on all at once"""
+    j_day_no = (np.asarray(dates, dtype='datetime64[D]') - GREGORIAN_BASE).astype(np.int64) - 79
+    j_np, j_day_no = np.divmod(j_day_no, 12053)
+
+    jy = 979 + 33 * j_np + 4 * (j_day_no // 1461)
+    j_day_no %= 1461
+
+    late = j_day_no >= 366
+    jy += np.where(late, (j_day_no - 1) // 365, 0)
+    j_day_no = np.where(late, (j_day_no - 1) % 365, j_day_no)
+
+    first_half = j_day_no < 186
+    jm = np.where(first_half, 1 + j_day_no // 31, 7 + (j_day_no - 186) // 30)
+    jd = np.where(first_half, 1 + j_day_no % 31, 1 + (j_day_no - 186) % 30)
+    return jy, jm, jd
+
+
+def to_gregorian(years, months=1, days=1):
+    """datetime64[D] array of Jalali dates, years, months and days are arrays or scalars broadcast together"""
+    jy, jm, jd = np.broadcast_arrays(*(np.asarray(part, dtype=np.int64) for part in (years, months, days)))
+    jy = jy - 979
+    # 8 leap years in every 33, the reverse of the cycles in gregorian_to_jalali()
+    j_day_no = 365 * jy + (jy // 33) * 8 + (jy % 33 + 3) // 4 + JALALI_MONTH_OFFSETS[jm - 1] + jd - 1
+    return GREGORIAN_BASE + (j_day_no + 79).astype('timedelta64[D]')
+
+
+@functools.lru_cache(maxsize=64)
+def _month_index(years, months, name):
+    return pd.DatetimeIndex(to_gregorian(years, months), name=name)
+
+
+def year_index(years, name='year_datetime'):
+    """DatetimeIndex of the Nowruz (Farvardin 1) of every Persian year, cached per sequence of years"""
+    years = tuple(int(year) for year in years)
+    return _month_index(years, (1,) * len(years), name)
+
+
+def month_index(years, months, name='month_datetime'):
+    """DatetimeIndex of the first day of every Persian (year, month), cached like year_index()"""
+    return _month_index(tuple(int(year) for year in years), tuple(int(month) for month in months), name)
+
+
+def month_key(year, month):
+    """The "1404-04" key of a Persian month, as in the monthly_forecast of statistics.json"""
+    return f'{int(year)}-{int(month):02d}'
+
+
+def persian_date(moment):
+    """The Jalali date of an Iran wall-clock datetime, like getPersianDate()"""
+    jy, jm, jd = gregorian_to_jalali(moment.year, moment.month, moment.day)
+    return {
+        'year': jy,
+        'month': jm,
+        'day': jd,
+        'month_name': MONTH_NAMES[jm - 1],
+        'formatted': f'{jd} {MONTH_NAMES[jm - 1]} {jy}',
+    }
+
+
+def persian_digits(text):
+    return str(text).translate(_PERSIAN_DIGITS)
+
+
+def persian_time(moment):
+    """HH:MM:SS in Persian digits, like getPersianTime()"""
+    return persian_digits(moment.strftime('%H:%M:%S'))
+
+
+def day_number(moment):
+    """Days since 1970-01-01 of the date of a datetime or date"""
+    return (date(moment.year, moment.month, moment.day) - EPOCH).days
+
+
+def month_lengths(leap):
+    return [31] * 6 + [30] * 5 + [30 if leap else 29]
+
+
+def farvardin_first(year):
+    """Day number of Farvardin 1 of a Persian year, by the conversion above"""
+    return int((to_gregorian(year) - np.datetime64(EPOCH, 'D')).astype(np.int64))
+
+
+class CalendarTable:
+    """Start days of the Persian months of a range of years, for lookups by binary search"""
+
+    def __init__(self, first_year, first_day, leap):
+        self.first_year = first_year
+        self.first_day = first_day
+        self.leap = [bool(flag) for flag in leap]
+        lengths = itertools.chain.from_iterable(month_lengths(flag) for flag in self.leap)
+        # starts[i] is the first day of month i % 12 + 1 of year first_year + i // 12, the last entry ends the range
+        self.starts = list(itertools.accumulate(lengths, initial=first_day))
+
+    @classmethod
+    def build(cls, year=None, span=CALENDAR_SPAN):
+        """The table of the Persian years from year - span to year + span, year defaults to the current one"""
+        if year is None:
+            year = persian_date(iran_time())['year']
+        firsts = [farvardin_first(y) for y in range(year - span, year + span + 2)]
+        leap = [following - first == 366 for first, following in zip(firsts, firsts[1:])]
+        return cls(year - span, firsts[0], leap)
+
+    @classmethod
+    def load(cls, path=calendar_path):
+        with open(path, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        return cls(table['first_year'], table['first_day'], table['leap'])
+
+    def to_json(self):
+        return {'first_year': self.first_year, 'first_day': self.first_day, 'leap': [int(flag) for flag in self.leap]}
+
+    def locate(self, moment):
+        """Index into starts of the month an Iran wall-clock datetime falls in, and its day number"""
+        day = day_number(moment)
+        index = bisect.bisect_right(self.starts, day) - 1
+        if index < 0 or index >= len(self.starts) - 1:
+            raise ValueError(f"{moment:%Y-%m-%d} is outside the calendar table")
+        return index, day
+
+    def date(self, moment):
+        """The Jalali (year, month, day) of an Iran wall-clock datetime"""
+        index, day = self.locate(moment)
+        return self.first_year + index // 12, index % 12 + 1, day - self.starts[index] + 1
+
+    def progress(self, period, moment):
+        """Share (0-1) of the current Persian month or year that has passed, by whole days like the page"""
+        index, day = self.locate(moment)
+        if period == 'monthly':
+            start, end = self.starts[index], self.starts[index + 1]
+        else:
+            year_start = index - index % 12
+            start, end = self.starts[year_start], self.starts[year_start + 12]
+        return (day - start) / (end - start)
+
+    def day_of_year(self, moment):
+        index, day = self.locate(moment)
+        return day - self.starts[index - index % 12] + 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the Persian calendar lookup table for the page')
+    parser.add_argument('--output', default=calendar_path, help='where to write the table')
+    parser.add_argument('--span', type=int, default=CALENDAR_SPAN, help='Persian years on each side of the current one')
+    args = parser.parse_args(argv)
+
+    table = CalendarTable.build(span=args.span)
+    write_json(args.output, table.to_json(), compact=True)
+    print(f"Calendar table for {table.first_year}-{table.first_year + len(table.leap) - 1} "
+          f"written to {os.path.relpath(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,422 +1,241 @@
 import os
+import argparse
 import pandas as pd
 import json
 from datetime import datetime
 
+from chart_payload import DEFAULT_ENCODING, ENCODINGS
+import jalali
+from json_writer import write_json
+from manifest import file_digest, slice_digest, load_manifest, save_manifest
+from publish import unpublish
+from series_index import TimeSeriesIndex
+from shards import write_shards
+import store
+from topics import TOPICS, get_path
+
 #get the script directory
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Read the data 
-data = pd.read_csv(os.path.join(script_dir, 'data.csv'))
-details_data = pd.read_csv(os.path.join(script_dir, 'details.csv'))
-time_series_Iran_data = pd.read_csv(os.path.join(script_dir, 'time_series_Iran.csv'))
-time_series_World_data = pd.read_csv(os.path.join(script_dir, 'time_series_World.csv'))
-time_series_World_data_sources = pd.read_csv(os.path.join(script_dir, 'world_sources.csv'))
-
-#Accidents data
-accidents_rows = data[data['Topic'] == 'Car Accidents'] 
-
-#get the last daily monthly and yearly average (extract first value from Series)
-last_daily_avg = int(round(accidents_rows['Daily_Average'].iloc[0]))
-last_monthly_avg = int(round(accidents_rows['Monthly_Average'].iloc[0]))
-last_yearly_avg = int(accidents_rows['Forecast_Number'].iloc[0])
-
-#get the details of accidents
-details_accidents_rows = details_data[details_data['Topic'] == 'Car Accidents']
-accidents_title = details_accidents_rows['Title'].iloc[0]
-accidents_description = details_accidents_rows['Description'].iloc[0]
-accidents_sources = details_accidents_rows['Sources'].iloc[0].split(';')
-accidents_sources_links = details_accidents_rows['Sources_Link'].iloc[0].split(';')
-
-
-#get the time series data for accidents in Iran
-time_series_accidents_years = time_series_Iran_data.columns[1:].tolist()  # Exclude the 'Topic' column
-time_series_accidents_rows = time_series_Iran_data[time_series_Iran_data['Topic'] == 'Car Accidents']
-# Convert to regular Python list with proper int conversion
-time_series_accidents_values = [int(val) if pd.notna(val) else None for val in time_series_accidents_rows.iloc[0, 1:].tolist()]
-# print(time_series_accidents_values)
-
-
-# Get the row corresponding to 'Car Accidents' for time series_world_data
-time_series_accidents_world_rows = time_series_World_data[time_series_World_data['Topic'] == 'Car Accidents']
-print(time_series_accidents_world_rows)
-
-# Create lists to store country names and their corresponding data
-countries_list = []
-countries_data = []
-
-# Get the country names and data (columns excluding 'Topic')
-number_of_countries = len(time_series_accidents_world_rows)
-for i in range(len(time_series_accidents_world_rows)):
-    country_name = time_series_accidents_world_rows.iloc[i, 1]
-    countries_list.append(country_name)
-    print(f"Country {i}: {country_name}")
-    
-    country_data = time_series_accidents_world_rows.iloc[i, 2:].tolist()
-    countries_data.append(country_data)
-    print(f"Data for {country_name}: {country_data}")
-
-#get the world years and values
-time_series_accidents_years_world = time_series_World_data.columns[2:].tolist()  # Exclude both 'Topic' and 'Country' columns
-
-# Get the sources for world data
-time_series_accidents_world_sources_rows = time_series_World_data_sources[time_series_World_data_sources['Topic'] == 'Car Accidents']
-print(time_series_accidents_world_sources_rows)
-# Create lists to store country names and their corresponding data
-countries_sources_list = []
-countries_sources_data = []
-
-# Get the country names and data (columns excluding 'Topic')
-number_of_countries_sources = len(time_series_accidents_world_sources_rows)
-for i in range(len(time_series_accidents_world_sources_rows)):
-    country_name = time_series_accidents_world_sources_rows.iloc[i, 1]
-    countries_sources_list.append(country_name)
-    print(f"Country {i}: {country_name}")
-    country_data = time_series_accidents_world_sources_rows.iloc[i, 2:].tolist()
-    countries_sources_data.append(country_data)
-    print(f"Data for {country_name}: {country_data}")
-# Path to the JSON file
-json_file_path = os.path.join(script_dir, '..', 'website', 'data', 'statistics.json')
-
-# Read existing JSON file
-with open(json_file_path, 'r', encoding='utf-8') as f:
-    json_data = json.load(f)
-
-# Update the traffic accidents deaths data
-json_data['iran_statistics']['statistics']['traffic_accidents_deaths']['deaths']['daily_average'] = last_daily_avg
-json_data['iran_statistics']['statistics']['traffic_accidents_deaths']['deaths']['monthly_average'] = last_monthly_avg
-json_data['iran_statistics']['statistics']['traffic_accidents_deaths']['deaths']['yearly_average'] = last_yearly_avg
-json_data['iran_statistics']['details']['traffic_accidents_deaths']['title'] = accidents_title
-json_data['iran_statistics']['details']['traffic_accidents_deaths']['description'] = accidents_description
-json_data['iran_statistics']['details']['traffic_accidents_deaths']['sources'] = accidents_sources
-json_data['iran_statistics']['details']['traffic_accidents_deaths']['sources_links'] = accidents_sources_links
-json_data['iran_statistics']['details']['traffic_accidents_deaths']['chartYears'] = [int(year) for year in time_series_accidents_years]
-json_data['iran_statistics']['details']['traffic_accidents_deaths']['chartData'] = time_series_accidents_values 
-
-# Get the world years and values
-json_data['iran_statistics']['details']['traffic_accidents_deaths']['world']['chartYears'] = [int(year) for year in time_series_accidents_years_world]
-
-# Initialize the world countries data structure
-for i in range(number_of_countries):
-    country_name = countries_list[i]
-    country_data = countries_data[i]
-    
-    # Clean and convert data: handle commas, NaN values, and int64 types
-    cleaned_data = []
-    for value in country_data:
-        if pd.notna(value) and str(value).strip() != '':
-            # Remove commas and convert to regular Python int
-            clean_value = str(value).replace(',', '')
-            try:
-                cleaned_data.append(int(clean_value))
-            except ValueError:
-                cleaned_data.append(None)
-        else:
-            cleaned_data.append(None)
-    
-    # Create a proper structure for each country
-    json_data['iran_statistics']['details']['traffic_accidents_deaths']['world'][country_name] = {
-        'chartData': cleaned_data,
-        'source' : 'Source',
-        'sources_link': countries_sources_data[i] if i < len(countries_sources_data) else []
+# Path to the JSON file, the one index.html fetches
+json_file_path = os.path.join(script_dir, 'statistics.json')
+
+# Sharded endpoints: a small counters index plus one detail file per counter
+api_dir = os.path.join(script_dir, 'api')
+
+# Content hashes of the inputs and topic slices used by the last build
+manifest_path = os.path.join(script_dir, 'build_manifest.json')
+
+INPUT_FILES = ['data.csv', 'details.csv', 'time_series_Iran.csv', 'time_series_World.csv', 'world_sources.csv',
+               'forecasts.csv'] + [os.path.join(*spec['monthly_forecast']) for spec in TOPICS if spec['monthly_forecast']]
+
+
+def group_by_topic(frame):
+    """Split a table into one sub-frame per Topic in a single pass"""
+    return {topic: rows for topic, rows in frame.groupby('Topic', sort=False)}
+
+
+def load_inputs():
+    """Read every input table once and index it by Topic"""
+    data = pd.read_csv(os.path.join(script_dir, 'data.csv'))
+    details_data = pd.read_csv(os.path.join(script_dir, 'details.csv'))
+    # The time series (and the world sources) come from the store, indexed by (topic, country)
+    connection = store.connect()
+    try:
+        iran = TimeSeriesIndex.from_store('time_series_Iran.csv', connection=connection)
+        world = TimeSeriesIndex.from_store('time_series_World.csv', connection=connection)
+    finally:
+        connection.close()
+    # Written by forecasting.py, the build works without it
+    forecasts_path = os.path.join(script_dir, 'forecasts.csv')
+    forecasts = pd.read_csv(forecasts_path) if os.path.exists(forecasts_path) else None
+    # Written by the analysis scripts that forecast months, also optional
+    monthly_forecasts = {}
+    for spec in TOPICS:
+        if spec['monthly_forecast'] and os.path.exists(os.path.join(script_dir, *spec['monthly_forecast'])):
+            monthly_forecasts[spec['topic']] = pd.read_csv(os.path.join(script_dir, *spec['monthly_forecast']))
+
+    return {
+        'data': group_by_topic(data),
+        'details': group_by_topic(details_data),
+        'iran': iran,
+        'world': world,
+        'forecasts': group_by_topic(forecasts) if forecasts is not None else {},
+        'monthly_forecasts': monthly_forecasts,
+        'iran_years': iran.years.tolist(),
+        'world_years': world.years.tolist(),
     }
 
 
-#End of the Accidents data
-
-# Importing the Air Pollution rows
-air_pollution_rows = data[data['Topic'] == 'Air Pollution']
-print(air_pollution_rows)
-#get the last daily monthly and yearly average (extract first value from Series)
-last_daily_avg = int(round(air_pollution_rows['Daily_Average'].iloc[0]))
-last_monthly_avg = int(round(air_pollution_rows['Monthly_Average'].iloc[0]))
-last_yearly_avg = int(air_pollution_rows['Forecast_Number'].iloc[0])
-
-
-#get the details of pollution
-details_pollution_rows = details_data[details_data['Topic'] == 'Air Pollution']
-pollution_title = details_pollution_rows['Title'].iloc[0]
-pollution_description = details_pollution_rows['Description'].iloc[0]
-pollution_sources = details_pollution_rows['Sources'].iloc[0].split(';')
-pollution_sources_links = details_pollution_rows['Sources_Link'].iloc[0].split(';')
-
-
-
-#get the time series data for pollution in Iran
-time_series_pollution_years = time_series_Iran_data.columns[1:].tolist()  # Exclude the 'Topic' column
-time_series_pollution_rows = time_series_Iran_data[time_series_Iran_data['Topic'] == 'Air Pollution']
-# Convert to regular Python list with proper int conversion
-time_series_pollution_values = [int(val) if pd.notna(val) else None for val in time_series_pollution_rows.iloc[0, 1:].tolist()]
-# print(time_series_pollution_values)
-
-
-# Get the row corresponding to 'Air Pollution' for time series_world_data
-time_series_pollution_world_rows = time_series_World_data[time_series_World_data['Topic'] == 'Air Pollution']
-print(time_series_pollution_world_rows)
-
-# Create lists to store country names and their corresponding data
-countries_list = []
-countries_data = []
-
-# Get the country names and data (columns excluding 'Topic')
-number_of_countries = len(time_series_pollution_world_rows)
-for i in range(len(time_series_pollution_world_rows)):
-    country_name = time_series_pollution_world_rows.iloc[i, 1]
-    countries_list.append(country_name)
-    print(f"Country {i}: {country_name}")
-    
-    country_data = time_series_pollution_world_rows.iloc[i, 2:].tolist()
-    countries_data.append(country_data)
-    print(f"Data for {country_name}: {country_data}")
-
-#get the world years and values
-time_series_years_world = time_series_World_data.columns[2:].tolist()  # Exclude both 'Topic' and 'Country' columns
-
-# Get the sources for world data
-time_series_air_pollution_world_sources_rows = time_series_World_data_sources[time_series_World_data_sources['Topic'] == 'Air Pollution']
-print(time_series_air_pollution_world_sources_rows)
-# Create lists to store country names and their corresponding data
-countries_sources_list = []
-countries_sources_data = []
-
-# Get the country names and data (columns excluding 'Topic')
-number_of_countries_sources = len(time_series_air_pollution_world_sources_rows)
-for i in range(len(time_series_air_pollution_world_sources_rows)):
-    country_name = time_series_air_pollution_world_sources_rows.iloc[i, 1]
-    countries_sources_list.append(country_name)
-    print(f"Country {i}: {country_name}")
-    country_data = time_series_air_pollution_world_sources_rows.iloc[i, 2:].tolist()
-    countries_sources_data.append(country_data)
-    print(f"Data for {country_name}: {country_data}")
-
-# Update the traffic pollution deaths data
-json_data['iran_statistics']['statistics']['air_pollution']['deaths']['daily_average'] = last_daily_avg
-json_data['iran_statistics']['statistics']['air_pollution']['deaths']['monthly_average'] = last_monthly_avg
-json_data['iran_statistics']['statistics']['air_pollution']['deaths']['yearly_average'] = last_yearly_avg
-json_data['iran_statistics']['details']['air_pollution_deaths']['title'] = pollution_title
-json_data['iran_statistics']['details']['air_pollution_deaths']['description'] = pollution_description
-json_data['iran_statistics']['details']['air_pollution_deaths']['sources'] = pollution_sources
-json_data['iran_statistics']['details']['air_pollution_deaths']['sources_links'] = pollution_sources_links
-json_data['iran_statistics']['details']['air_pollution_deaths']['chartYears'] = [int(year) for year in time_series_pollution_years]
-json_data['iran_statistics']['details']['air_pollution_deaths']['chartData'] = time_series_pollution_values
-
-
-# Get the world years and values
-json_data['iran_statistics']['details']['air_pollution_deaths']['world']['chartYears'] = [int(year) for year in time_series_years_world]
-
-# Initialize the world countries data structure
-for i in range(number_of_countries):
-    country_name = countries_list[i]
-    country_data = countries_data[i]
-    
-    # Clean and convert data: handle commas, NaN values, and int64 types
-    cleaned_data = []
-    for value in country_data:
-        if pd.notna(value) and str(value).strip() != '':
-            # Remove commas and convert to regular Python int
-            clean_value = str(value).replace(',', '')
-            try:
-                cleaned_data.append(int(clean_value))
-            except ValueError:
-                cleaned_data.append(None)
-        else:
-            cleaned_data.append(None)
-    
-    # Create a proper structure for each country
-    json_data['iran_statistics']['details']['air_pollution_deaths']['world'][country_name] = {
-        'chartData': cleaned_data,
-        'source' : 'Source',
-        'sources_link': countries_sources_data[i] if i < len(countries_sources_data) else []
-    }
+def series_slice(index, topic):
+    """The countries, values and sources of one topic's series, for the topic digest"""
+    rows = index.rows(topic)
+    if not rows:
+        return None
+    return [[index.keys[row] for row in rows], index.chart_data(rows), [index.sources[row] for row in rows]]
 
 
-#End of the Air Pollution data
-
-# Start the education dropout data
-education_dropout_rows = data[data['Topic'] == 'Education Dropout']
-
-#get the last daily monthly and yearly average (extract first value from Series)
-last_daily_avg = int(round(education_dropout_rows['Daily_Average'].iloc[0]))
-last_monthly_avg = int(round(education_dropout_rows['Monthly_Average'].iloc[0]))
-last_yearly_avg = int(education_dropout_rows['Forecast_Number'].iloc[0])
-
-#get the details of education dropout
-details_education_rows = details_data[details_data['Topic'] == 'Education Dropout']
-education_title = details_education_rows['Title'].iloc[0]
-education_description = details_education_rows['Description'].iloc[0]
-education_sources = details_education_rows['Sources'].iloc[0].split(';')
-education_sources_links = details_education_rows['Sources_Link'].iloc[0].split(';')
-
-#get the time series data for education dropout in Iran
-time_series_education_years = time_series_Iran_data.columns[1:].tolist()  # Exclude the 'Topic' column
-time_series_education_rows = time_series_Iran_data[time_series_Iran_data['Topic'] == 'Education Dropout']
-# Convert to regular Python list with proper int conversion
-time_series_education_values = [int(val) if pd.notna(val) else None for val in time_series_education_rows.iloc[0, 1:].tolist()]
-# print(time_series_education_values)
-
-# Update the traffic education dropout data
-json_data['iran_statistics']['statistics']['education']['dropouts']['daily_average'] = last_daily_avg
-json_data['iran_statistics']['statistics']['education']['dropouts']['monthly_average'] = last_monthly_avg
-json_data['iran_statistics']['statistics']['education']['dropouts']['yearly_average'] = last_yearly_avg
-json_data['iran_statistics']['details']['education_dropouts']['title'] = education_title
-json_data['iran_statistics']['details']['education_dropouts']['description'] = education_description
-json_data['iran_statistics']['details']['education_dropouts']['sources'] = education_sources
-json_data['iran_statistics']['details']['education_dropouts']['sources_links'] = education_sources_links
-json_data['iran_statistics']['details']['education_dropouts']['chartYears'] = [int(year) for year in time_series_education_years]
-json_data['iran_statistics']['details']['education_dropouts']['chartData'] = time_series_education_values
-
-# End of the education dropout data
-
-# Workers data
-workers_rows = data[data['Topic'] == 'Workers Died']
-
-#get the last daily monthly and yearly average (extract first value from Series)
-last_daily_avg = int(round(workers_rows['Daily_Average'].iloc[0]))
-last_monthly_avg = int(round(workers_rows['Monthly_Average'].iloc[0]))
-last_yearly_avg = int(workers_rows['Forecast_Number'].iloc[0])
-
-#get the details of workers deaths
-details_workers_rows = details_data[details_data['Topic'] == 'Workers Died']
-workers_title = details_workers_rows['Title'].iloc[0]
-workers_description = details_workers_rows['Description'].iloc[0]
-workers_sources = details_workers_rows['Sources'].iloc[0].split(';')
-workers_sources_links = details_workers_rows['Sources_Link'].iloc[0].split(';')
-
-
-#get the time series data for workers deaths in Iran
-time_series_workers_years = time_series_Iran_data.columns[1:].tolist()  # Exclude the 'Topic' column
-time_series_workers_rows = time_series_Iran_data[time_series_Iran_data['Topic'] == 'Workers Died']
-# Convert to regular Python list with proper int conversion
-time_series_workers_values = [int(val) if pd.notna(val) else None for val in time_series_workers_rows.iloc[0, 1:].tolist()]
-# print(time_series_workers_values)
-
-# Get the row corresponding to 'Air Pollution' for time series_world_data
-time_series_workers_world_rows = time_series_World_data[time_series_World_data['Topic'] == 'Workers Died']
-print(time_series_workers_world_rows)
-
-# Create lists to store country names and their corresponding data
-countries_list = []
-countries_data = []
-
-# Get the country names and data (columns excluding 'Topic')
-number_of_countries = len(time_series_workers_world_rows)
-for i in range(len(time_series_workers_world_rows)):
-    country_name = time_series_workers_world_rows.iloc[i, 1]
-    countries_list.append(country_name)
-    print(f"Country {i}: {country_name}")
-
-    country_data = time_series_workers_world_rows.iloc[i, 2:].tolist()
-    countries_data.append(country_data)
-    print(f"Data for {country_name}: {country_data}")
-
-#get the world years and values
-time_series_years_world = time_series_World_data.columns[2:].tolist()  # Exclude both 'Topic' and 'Country' columns
-
-# Get the sources for world data
-time_series_workers_world_sources_rows = time_series_World_data_sources[time_series_World_data_sources['Topic'] == 'Workers Died']
-print(time_series_workers_world_sources_rows)
-# Create lists to store country names and their corresponding data
-countries_sources_list = []
-countries_sources_data = []
-
-# Get the country names and data (columns excluding 'Topic')
-number_of_countries_sources = len(time_series_workers_world_sources_rows)
-for i in range(len(time_series_workers_world_sources_rows)):
-    country_name = time_series_workers_world_sources_rows.iloc[i, 1]
-    countries_sources_list.append(country_name)
-    print(f"Country {i}: {country_name}")
-    country_data = time_series_workers_world_sources_rows.iloc[i, 2:].tolist()
-    countries_sources_data.append(country_data)
-    print(f"Data for {country_name}: {country_data}")
-
-
-
-
-
-# Update the workers deaths data
-json_data['iran_statistics']['statistics']['workers']['deaths']['daily_average'] = last_daily_avg
-json_data['iran_statistics']['statistics']['workers']['deaths']['monthly_average'] = last_monthly_avg
-json_data['iran_statistics']['statistics']['workers']['deaths']['yearly_average'] = last_yearly_avg
-json_data['iran_statistics']['details']['workers_deaths']['title'] = workers_title
-json_data['iran_statistics']['details']['workers_deaths']['description'] = workers_description
-json_data['iran_statistics']['details']['workers_deaths']['sources'] = workers_sources
-json_data['iran_statistics']['details']['workers_deaths']['sources_links'] = workers_sources_links
-json_data['iran_statistics']['details']['workers_deaths']['chartYears'] = [int(year) for year in time_series_workers_years]
-json_data['iran_statistics']['details']['workers_deaths']['chartData'] = time_series_workers_values
-
-
-# Get the world years and values
-json_data['iran_statistics']['details']['workers_deaths']['world']['chartYears'] = [int(year) for year in time_series_years_world]
-
-# Initialize the world countries data structure
-for i in range(number_of_countries):
-    country_name = countries_list[i]
-    country_data = countries_data[i]
-    
-    # Clean and convert data: handle commas, NaN values, and int64 types
-    cleaned_data = []
-    for value in country_data:
-        if pd.notna(value) and str(value).strip() != '':
-            # Remove commas and convert to regular Python int
-            clean_value = str(value).replace(',', '')
-            try:
-                cleaned_data.append(int(clean_value))
-            except ValueError:
-                cleaned_data.append(None)
-        else:
-            cleaned_data.append(None)
-    
-    # Create a proper structure for each country
-    json_data['iran_statistics']['details']['workers_deaths']['world'][country_name] = {
-        'chartData': cleaned_data,
-        'source' : 'Source',
-        'sources_link': countries_sources_data[i] if i < len(countries_sources_data) else []
+def forecast_block(rows):
+    """Return the forecast years, values and interval of one series from the forecasts table"""
+    rows = rows.sort_values('Horizon')
+    return {
+        'method': rows['Method'].iloc[0],
+        'years': rows['Year'].astype(int).tolist(),
+        'data': rows['Forecast'].round().astype(int).tolist(),
+        'lower': rows['Lower'].round().astype(int).tolist(),
+        'upper': rows['Upper'].round().astype(int).tolist(),
     }
 
-# End of the workers deaths data
-
-# Death penalty data
-death_penalty_rows = data[data['Topic'] == 'Death Penalty']
-
-
-#get the last daily monthly and yearly average (extract first value from Series)
-last_daily_avg = int(round(death_penalty_rows['Daily_Average'].iloc[0]))
-last_monthly_avg = int(round(death_penalty_rows['Monthly_Average'].iloc[0]))
-last_yearly_avg = int(death_penalty_rows['Forecast_Number'].iloc[0])
-
-#get the details of death penalty
-details_death_penalty_rows = details_data[details_data['Topic'] == 'Death Penalty']
-death_penalty_title = details_death_penalty_rows['Title'].iloc[0]
-death_penalty_description = details_death_penalty_rows['Description'].iloc[0]
-death_penalty_sources = details_death_penalty_rows['Sources'].iloc[0].split(';')
-death_penalty_sources_links = details_death_penalty_rows['Sources_Link'].iloc[0].split(';')
 
-#get the time series data for death penalty in Iran
-time_series_death_penalty_years = time_series_Iran_data.columns[1:].tolist()  # Exclude the 'Topic' column
-time_series_death_penalty_rows = time_series_Iran_data[time_series_Iran_data['Topic'] == 'Death Penalty']
-# Convert to regular Python list with proper int conversion
-time_series_death_penalty_values = [int(val) if pd.notna(val) else None for val in time_series_death_penalty_rows.iloc[0, 1:].tolist()]
-# print(time_series_death_penalty_values)
+def build_topic(spec, tables):
+    """Extract the counter averages and modal details of one topic"""
+    topic = spec['topic']
+    rows = tables['data'][topic]
+    details_rows = tables['details'][topic]
 
-# Update the death penalty data
-json_data['iran_statistics']['statistics']['death_penalty']['daily_average'] = last_daily_avg
-json_data['iran_statistics']['statistics']['death_penalty']['monthly_average'] = last_monthly_avg
-json_data['iran_statistics']['statistics']['death_penalty']['yearly_average'] = last_yearly_avg
-json_data['iran_statistics']['details']['death_penalty']['title'] = death_penalty_title
-json_data['iran_statistics']['details']['death_penalty']['description'] = death_penalty_description
-json_data['iran_statistics']['details']['death_penalty']['sources'] = death_penalty_sources
-json_data['iran_statistics']['details']['death_penalty']['sources_links'] = death_penalty_sources_links
-json_data['iran_statistics']['details']['death_penalty']['chartYears'] = [int(year) for year in time_series_death_penalty_years]
-json_data['iran_statistics']['details']['death_penalty']['chartData'] = time_series_death_penalty_values
-
-
-# Update the last_updated timestamp
-json_data['iran_statistics']['metadata']['last_updated'] = datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
-
-# Write the updated data back to JSON file
-with open(json_file_path, 'w', encoding='utf-8') as f:
-    json.dump(json_data, f, indent=2, ensure_ascii=False)
-
-print(f"Successfully updated JSON file with:")
+    #get the last daily monthly and yearly average (extract first value from Series)
+    statistics = {
+        'daily_average': int(round(rows['Daily_Average'].iloc[0])),
+        'monthly_average': int(round(rows['Monthly_Average'].iloc[0])),
+        'yearly_average': int(rows['Forecast_Number'].iloc[0]),
+    }
 
+    # Expected total per Persian month ("1404-04"), the counter's monthly period uses it over the average
+    monthly_rows = tables['monthly_forecasts'].get(topic)
+    if monthly_rows is not None:
+        statistics['monthly_forecast'] = {
+            jalali.month_key(year, month): int(round(value))
+            for year, month, value in zip(monthly_rows['Year'], monthly_rows['Month'], monthly_rows['Forecast'])
+        }
+
+    details = {
+        'title': details_rows['Title'].iloc[0],
+        'description': details_rows['Description'].iloc[0],
+        'sources': details_rows['Sources'].iloc[0].split(';'),
+        'sources_links': details_rows['Sources_Link'].iloc[0].split(';'),
+        'chartYears': tables['iran_years'],
+    }
 
+    # Convert to regular Python list with proper int conversion
+    if (topic, 'Iran') in tables['iran']:
+        details['chartData'] = tables['iran'].chart_data([tables['iran'].row(topic, 'Iran')])[0]
+
+    forecast_rows = tables['forecasts'].get(topic)
+    forecasts_by_country = {}
+    if forecast_rows is not None:
+        forecasts_by_country = {country: rows for country, rows in forecast_rows.groupby('Country', sort=False)}
+    if 'Iran' in forecasts_by_country:
+        details['forecast'] = forecast_block(forecasts_by_country['Iran'])
+
+    world = None
+    if spec['world']:
+        world_index = tables['world']
+        world = {'chartYears': tables['world_years']}
+        rows = world_index.rows(topic)
+        # The store matched the world rows and their sources by position, like the CSVs are edited
+        countries = zip([world_index.keys[row][1] for row in rows], world_index.chart_data(rows),
+                        [world_index.sources[row] for row in rows])
+        for country_name, chart_data, source in countries:
+            world[country_name] = {
+                'chartData': chart_data,
+                'source': 'Source',
+                'sources_link': [source] if source is not None else []
+            }
+            if country_name in forecasts_by_country:
+                world[country_name]['forecast'] = forecast_block(forecasts_by_country[country_name])
+
+    return statistics, details, world
+
+
+def topic_digest(spec, tables):
+    """Hash every input row that feeds one topic"""
+    topic = spec['topic']
+    parts = [spec, tables['data'].get(topic), tables['details'].get(topic),
+             series_slice(tables['iran'], topic), tables['iran_years'], tables['forecasts'].get(topic),
+             tables['monthly_forecasts'].get(topic)]
+    if spec['world']:
+        parts += [series_slice(tables['world'], topic), tables['world_years']]
+    return slice_digest(*parts)
+
+
+def apply_topic(json_data, spec, statistics, details, world):
+    """Write one topic's values into the statistics document"""
+    iran_statistics = json_data['iran_statistics']
+    get_path(iran_statistics['statistics'], spec['statistics_path']).update(statistics)
+    topic_details = iran_statistics['details'][spec['details_key']]
+    topic_details.update(details)
+    if world is not None:
+        topic_details.setdefault('world', {}).update(world)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Update statistics.json from the topic CSVs')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only regenerate topics whose input rows changed since the last build')
+    parser.add_argument('--output', default=json_file_path, help='statistics.json to patch and rewrite')
+    parser.add_argument('--compact', action='store_true', help='write without indentation to shrink the payload')
+    parser.add_argument('--stream', action='store_true',
+                        help='encode straight to disk instead of building the whole JSON text in memory')
+    parser.add_argument('--api-dir', default=api_dir, help='directory for counters.json, calendar.json and the per-counter detail files')
+    parser.add_argument('--chart-encoding', choices=ENCODINGS, default=DEFAULT_ENCODING,
+                        help='how the chart series of the detail files are written')
+    args = parser.parse_args(argv)
+
+    manifest = load_manifest(manifest_path)
+    input_digests = {name: file_digest(os.path.join(script_dir, name)) for name in INPUT_FILES}
+    settings = {'chart_encoding': args.chart_encoding, 'topics': slice_digest(TOPICS)}
+    # Someone else rewrote the output since our last build, so patching it is not safe,
+    # and other settings change every topic's output however little its inputs did
+    reuse = args.incremental and manifest.get('output') == file_digest(args.output) and manifest['settings'] == settings
+
+    if reuse and manifest['inputs'] == input_digests:
+        print("No input changed since the last build, nothing to do")
+        return
+
+    tables = load_inputs()
+
+    # Read existing JSON file
+    with open(args.output, 'r', encoding='utf-8') as f:
+        json_data = json.load(f)
+
+    topic_digests = {}
+    updated_topics = []
+    for spec in TOPICS:
+        if spec['topic'] not in tables['data'] or spec['topic'] not in tables['details']:
+            print(f"Skipping {spec['topic']}: no row in data.csv or details.csv")
+            continue
+        topic_digests[spec['topic']] = topic_digest(spec, tables)
+        if reuse and manifest['topics'].get(spec['topic']) == topic_digests[spec['topic']]:
+            continue
+        statistics, details, world = build_topic(spec, tables)
+        apply_topic(json_data, spec, statistics, details, world)
+        updated_topics.append(spec['topic'])
+
+    if updated_topics:
+        # Update the last_updated timestamp
+        json_data['iran_statistics']['metadata']['last_updated'] = datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        # Write the updated data back to JSON file, replacing it atomically
+        write_json(args.output, json_data, compact=args.compact, stream=args.stream)
+
+        print(f"Successfully updated JSON file with: {', '.join(updated_topics)}")
+
+        details_keys = {spec['details_key'] for spec in TOPICS if spec['topic'] in updated_topics}
+        sharded = write_shards(json_data, args.api_dir, details_keys=None if not reuse else details_keys,
+                               chart_encoding=args.chart_encoding)
+        print(f"Endpoints written to {args.api_dir}: counters.json, calendar.json, details for {', '.join(sharded)}")
+        # The published copies are stale now, publish.py marks the page again
+        unpublish()
+    else:
+        print("Inputs changed but no topic slice did, statistics.json left as is")
+
+    save_manifest(manifest_path, {
+        'inputs': input_digests,
+        'topics': topic_digests,
+        'output': file_digest(args.output),
+        'settings': settings,
+    })
+
+
+if __name__ == "__main__":
+    main()
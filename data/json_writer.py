@@ -0,0 +1,63 @@
+"""
+Output stage for the generated JSON files.
+
+Files are written to a temporary file in the target directory and renamed
+into place, so a browser or CDN fetching statistics.json while the build runs
+sees either the old file or the new one, never a truncated one.
+"""
+
+import json
+import os
+import tempfile
+
+
+def _encoder(compact):
+    """Return the JSON encoder for pretty (indent=2) or compact output"""
+    if compact:
+        return json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    return json.JSONEncoder(ensure_ascii=False, indent=2)
+
+
+def atomic_write(path, write):
+    """Call write(f) on a temporary text file and rename it over path"""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file as 0600, keep the permissions the site was served with
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_json(path, document, compact=False, stream=False):
+    """
+    Atomically write document as JSON to path.
+
+    compact drops the indentation and the spaces after separators.
+    stream encodes chunk by chunk straight into the file instead of building
+    the whole text first, which keeps large world sub-trees out of memory at
+    the cost of the slower pure-Python encoder.
+    """
+    encoder = _encoder(compact)
+
+    def write(f):
+        if stream:
+            for chunk in encoder.iterencode(document):
+                f.write(chunk)
+        else:
+            f.write(encoder.encode(document))
+
+    atomic_write(path, write)
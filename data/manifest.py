@@ -0,0 +1,58 @@
+"""
+Content hashes for the incremental statistics build.
+
+The manifest records a digest for every input file and for every topic's
+slice of those inputs, so json_creator.py can tell which topics changed since
+the last build without comparing the generated JSON. The build settings that
+shape the output without being inputs, the chart encoding and the topic
+registry, are recorded too: a build with other settings starts from scratch.
+"""
+
+import hashlib
+import json
+import os
+
+from json_writer import write_json
+
+
+def file_digest(path):
+    """Return the sha256 of a file's bytes, or None if it does not exist"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def slice_digest(*parts):
+    """Return the sha256 of a topic slice made of frames and JSON-able values"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            digest.update(b'\0')
+        elif hasattr(part, 'to_csv'):
+            digest.update(part.to_csv(index=False).encode('utf-8'))
+        else:
+            digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    """Load a manifest, returning an empty one if it is missing or unreadable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'inputs': {}, 'topics': {}, 'settings': {}}
+    manifest.setdefault('inputs', {})
+    manifest.setdefault('topics', {})
+    manifest.setdefault('settings', {})
+    return manifest
+
+
+def save_manifest(path, manifest):
+    """Write the manifest next to the build inputs, replacing it atomically"""
+    write_json(path, manifest)
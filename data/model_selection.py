@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Automatic ARIMA order selection.
+
+Instead of the (1, 1, 0) read off the ACF/PACF plots, --auto-order searches
+a bounded (p, d, q) grid per series. The grid is split into one chain per
+(d, q) that walks p upwards, so every fit after the first starts from the
+parameters of its neighbour with one AR lag less (the new coefficient at
+zero) and the chains run in a process pool. Each candidate is scored by
+AIC, BIC and the RMSE of one-step forecasts from rolling origins over the
+last FOLDS observations; the winner has the best mean rank over the three,
+the simpler model on ties. Candidates that fail to fit stay in the list,
+last, with their error, so it shows how much of the grid was scored; a series
+where every candidate fails keeps FALLBACK_ORDER and is flagged. The chosen
+order is cached in forecast_cache by the hash of the series, so the search
+only runs again when the data changes.
+"""
+
+import argparse
+import itertools
+import math
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import forecast_cache
+
+MAX_P = 2
+MAX_D = 1
+MAX_Q = 2
+
+# Rolling origins for the out-of-sample error, and the shortest training window
+FOLDS = 4
+MIN_TRAIN = 5
+
+CRITERIA = ('aic', 'bic', 'rmse')
+
+# forecasting.ARIMA_ORDER, the order read off the plots, for series where no candidate fits
+FALLBACK_ORDER = (1, 1, 0)
+
+
+def grid_spec(max_p=MAX_P, max_d=MAX_D, max_q=MAX_Q):
+    return {'model': 'ARIMA order search', 'max_order': [max_p, max_d, max_q], 'folds': FOLDS,
+            'min_train': MIN_TRAIN, 'criteria': list(CRITERIA)}
+
+
+def _fit(values, order, start=None):
+    """Fit one ARIMA, starting from the parameters of start (a fitted neighbour) where their names match"""
+    from statsmodels.tsa.arima.model import ARIMA
+
+    model = ARIMA(values, order=order)
+    start_params = None
+    if start is not None:
+        start_params = [start.get(name, 0.0) for name in model.param_names]
+    with warnings.catch_warnings():
+        # Tiny samples make statsmodels warn about almost every fit
+        warnings.simplefilter('ignore')
+        return model.fit(start_params=start_params)
+
+
+def rolling_rmse(values, order, start):
+    """RMSE of one-step forecasts refitted at each of the last FOLDS origins, NaN if the series is too short"""
+    origins = range(max(MIN_TRAIN, len(values) - FOLDS), len(values))
+    errors = []
+    for origin in origins:
+        model_fit = _fit(values[:origin], order, start)
+        errors.append(float(model_fit.forecast(1)[0]) - values[origin])
+    return math.sqrt(np.mean(np.square(errors))) if errors else math.nan
+
+
+def fit_chain(values, d, q, max_p=MAX_P):
+    """Score ARIMA(p, d, q) for p = 0..max_p, each fit warm-started from the one before"""
+    values = np.asarray(values, dtype=float)
+    scores = []
+    previous = None
+    for p in range(max_p + 1):
+        order = (p, d, q)
+        try:
+            model_fit = _fit(values, order, previous)
+            params = dict(zip(model_fit.model.param_names, model_fit.params))
+            rmse = rolling_rmse(values, order, params)
+        except (ValueError, np.linalg.LinAlgError) as exc:
+            # A degenerate candidate, the next p starts from the last good fit
+            scores.append({'order': list(order), 'error': str(exc) or type(exc).__name__})
+            continue
+        if not np.isfinite(model_fit.aic):
+            scores.append({'order': list(order), 'error': 'non-finite AIC'})
+            continue
+        scores.append({'order': list(order), 'aic': float(model_fit.aic), 'bic': float(model_fit.bic),
+                       'rmse': rmse, 'params': len(params)})
+        previous = params
+    return scores
+
+
+def rank(scores):
+    """
+    Order the candidates best first: mean rank over CRITERIA (NaN ranks
+    last), then fewer parameters. Failed candidates follow in grid order.
+    """
+    failed = [score for score in scores if 'error' in score]
+    scored = [score for score in scores if 'error' not in score]
+    if not scored:
+        return failed
+    table = pd.DataFrame(scored)
+    ranks = table[list(CRITERIA)].rank(na_option='bottom').mean(axis=1)
+    table = table.assign(rank=ranks).sort_values(['rank', 'params'], kind='stable')
+    return table.drop(columns='params').to_dict('records') + failed
+
+
+def chains(max_p=MAX_P, max_d=MAX_D, max_q=MAX_Q):
+    return [(d, q, max_p) for d, q in itertools.product(range(max_d + 1), range(max_q + 1))]
+
+
+def select_orders(series_list, jobs=None, max_p=MAX_P, max_d=MAX_D, max_q=MAX_Q):
+    """
+    The selection of every series of series_list (pandas Series), from the
+    cache where the series did not change, with the chains of all the others
+    fitted in one process pool. A selection is {'order': [p, d, q], 'candidates': [...]},
+    with 'fallback': True when no candidate could be fitted and the order is FALLBACK_ORDER.
+    """
+    spec = grid_spec(max_p, max_d, max_q)
+    results = [forecast_cache.load(forecast_cache.cache_key(series, spec, 0)) for series in series_list]
+    misses = [position for position, result in enumerate(results) if result is None]
+
+    tasks = [(position, chain) for position in misses for chain in chains(max_p, max_d, max_q)]
+    arguments = [(series_list[position].to_numpy(dtype=float), *chain) for position, chain in tasks]
+    if jobs == 1 or len(tasks) <= 1 or (jobs is None and os.cpu_count() == 1):
+        outputs = [fit_chain(*argument) for argument in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            outputs = list(pool.map(fit_chain, *zip(*arguments)))
+
+    for position in misses:
+        scores = [score for (task_position, _), output in zip(tasks, outputs) if task_position == position
+                  for score in output]
+        candidates = rank(scores)
+        if candidates and 'error' not in candidates[0]:
+            results[position] = {'order': candidates[0]['order'], 'candidates': candidates}
+        else:
+            results[position] = {'order': list(FALLBACK_ORDER), 'candidates': candidates, 'fallback': True}
+        forecast_cache.store(forecast_cache.cache_key(series_list[position], spec, 0), results[position])
+    return results
+
+
+def select_order(series, jobs=None):
+    """The selected ARIMA order of one series, as a tuple"""
+    selection = select_orders([series], jobs=jobs)[0]
+    if selection.get('fallback'):
+        print(f"No candidate order could be fitted, using ARIMA{FALLBACK_ORDER}")
+    return tuple(selection['order'])
+
+
+def main(argv=None):
+    import forecasting
+
+    parser = argparse.ArgumentParser(description='Search the ARIMA order of every ARIMA series of the panel')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of worker processes')
+    args = parser.parse_args(argv)
+
+    items = forecasting.arima_series(forecasting.load_panel())
+    selections = select_orders([pd.Series(forecasting.arima_input(values, forecasting.is_differenced(topic)))
+                                for topic, _, _, values in items], jobs=args.jobs)
+    for (topic, country, _, _), selection in zip(items, selections):
+        scored = sum('error' not in candidate for candidate in selection['candidates'])
+        if selection.get('fallback'):
+            print(f"{topic} / {country}: no candidate could be fitted, ARIMA{FALLBACK_ORDER} kept")
+            continue
+        best = selection['candidates'][0]
+        print(f"{topic} / {country}: ARIMA{tuple(selection['order'])} "
+              f"(AIC {best['aic']:.1f}, BIC {best['bic']:.1f}, rolling RMSE {best['rmse']:.1f}, "
+              f"{scored} of {len(selection['candidates'])} candidates scored)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
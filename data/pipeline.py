@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Full refresh of the website data in one process tree.
+
+The heavy libraries are imported once here. The topic analysis scripts then
+run in a fork-based process pool, so every worker starts with pandas and
+statsmodels already loaded instead of paying its own interpreter start and
+imports. The scripts only describe their figures, charts.py renders all of
+them afterwards in one pool and skips the unchanged ones. With --no-plots or
+--data-only the figures (and diagnostics) are skipped and matplotlib is not
+loaded at all. Every input CSV is validated against its schema first, so
+a malformed file stops the build before any model is fitted, and the CSVs
+that changed are converted into store.sqlite before anything reads them.
+When every analysis has finished, forecasting.py forecasts every Iran and
+world series in one batch, json_creator.py rebuilds statistics.json and the
+endpoints, optionally prerender.py writes the current counter values into
+index.html and publish.py writes the hashed artifacts. Wall time is reported
+per stage.
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import runpy
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+# Imported once in the parent so forked workers inherit them
+import numpy as np  # noqa: F401
+import pandas as pd  # noqa: F401
+
+import charts
+import forecasting
+import json_creator
+import prerender
+import publish
+import store
+import validation
+from topics import TOPICS
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Topic analysis scripts, relative to data/
+ANALYSES = {spec['topic']: os.path.join(*spec['analysis']) for spec in TOPICS}
+
+
+def preload(plots=True, diagnostics=True):
+    """Import the libraries the analysis scripts and the chart workers will need before they fork"""
+    if diagnostics:
+        from statsmodels.tsa.stattools import adfuller  # noqa: F401
+        from statsmodels.tsa.arima.model import ARIMA  # noqa: F401
+    if plots:
+        # Figures are only ever written to files, never shown
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot  # noqa: F401
+    if plots and diagnostics:
+        from statsmodels.graphics.tsaplots import plot_acf, plot_pacf  # noqa: F401
+
+
+def run_analysis(topic, relative_path, script_args=()):
+    """Run one analysis script as __main__ and return its timing and captured output"""
+    path = os.path.join(script_dir, relative_path)
+    output = io.StringIO()
+    start = time.perf_counter()
+    ok = True
+    argv = sys.argv
+    sys.argv = [path, *script_args]
+    try:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            runpy.run_path(path, run_name='__main__')
+    except BaseException:
+        ok = False
+        output.write(traceback.format_exc())
+    finally:
+        sys.argv = argv
+    return {
+        'topic': topic,
+        'script': relative_path,
+        'ok': ok,
+        'seconds': time.perf_counter() - start,
+        'output': output.getvalue(),
+    }
+
+
+def run_analyses(topics, jobs, script_args=()):
+    """Run the analyses of the given topics in a process pool"""
+    # fork keeps the imports done above, spawn would re-import everything per worker
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context) as pool:
+        futures = [pool.submit(run_analysis, topic, ANALYSES[topic], tuple(script_args)) for topic in topics]
+        return [future.result() for future in futures]
+
+
+def timed(timings, stage, function, *args):
+    """Call function and record its wall time under stage"""
+    start = time.perf_counter()
+    result = function(*args)
+    timings.append((stage, time.perf_counter() - start))
+    return result
+
+
+def print_timings(timings):
+    """Print the per-stage wall time table"""
+    width = max(len(stage) for stage, _ in timings)
+    print("\nStage timings:")
+    for stage, seconds in timings:
+        print(f"  {stage.ljust(width)}  {seconds:8.2f} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run every topic analysis in parallel, then rebuild the JSON')
+    parser.add_argument('--topics', nargs='+', choices=list(ANALYSES), default=list(ANALYSES),
+                        help='only analyse these topics')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--skip-analysis', action='store_true', help='only rebuild the JSON from the CSVs')
+    parser.add_argument('--incremental', action='store_true', help='pass --incremental to json_creator.py')
+    parser.add_argument('--publish', action='store_true', help='run publish.py after json_creator.py')
+    parser.add_argument('--prerender', action='store_true', help='bake the counter values into index.html')
+    parser.add_argument('--no-plots', action='store_true', help='pass --no-plots to the analysis scripts')
+    parser.add_argument('--data-only', action='store_true', help='pass --data-only to the analysis scripts')
+    parser.add_argument('--chart-preset', choices=list(charts.PRESETS), default=charts.DEFAULT_PRESET,
+                        help='resolution preset for the rendered figures')
+    parser.add_argument('--chart-formats', nargs='+', choices=charts.FORMATS, default=['png'],
+                        help='formats for the rendered figures')
+    parser.add_argument('--auto-order', action='store_true',
+                        help='search the ARIMA orders (model_selection.py) in the analyses and the forecasts')
+    parser.add_argument('--intervals', choices=forecasting.INTERVALS, default='analytic',
+                        help='analytic or bootstrap intervals for the batched forecasts')
+    parser.add_argument('--verbose', action='store_true', help='print the output of every analysis script')
+    args = parser.parse_args(argv)
+
+    timings = []
+    start = time.perf_counter()
+
+    if timed(timings, 'validation', validation.main, ['--quiet']) != 0:
+        print_timings(timings)
+        print(f"\nInput validation failed, see {os.path.relpath(validation.report_path)}")
+        return 1
+
+    # Once here instead of racing for the write lock in every analysis worker
+    timed(timings, 'store', store.main, [])
+
+    if not args.skip_analysis:
+        plots = not (args.no_plots or args.data_only)
+        script_args = ['--data-only' if args.data_only else '--no-plots' if args.no_plots else '--defer-plots']
+        if args.auto_order:
+            script_args.append('--auto-order')
+        timed(timings, 'imports', preload, plots, not args.data_only)
+        results = timed(timings, 'analysis (parallel)', run_analyses, args.topics, args.jobs, script_args)
+        for result in results:
+            timings.append((f"  {result['topic']}", result['seconds']))
+            if args.verbose or not result['ok']:
+                print(f"===== {result['script']} =====\n{result['output']}")
+        failed = [result['script'] for result in results if not result['ok']]
+        if failed:
+            print_timings(timings)
+            print(f"\nAnalysis failed for {', '.join(failed)}, statistics.json was not rebuilt")
+            return 1
+
+        if plots:
+            topic_dirs = [os.path.dirname(os.path.join(script_dir, ANALYSES[topic])) for topic in args.topics]
+            rendered, skipped = timed(timings, 'charts', charts.render, topic_dirs,
+                                      args.chart_preset, args.chart_formats, args.jobs)
+            print(f"Rendered {rendered} figures, {skipped} unchanged")
+
+    # statistics.json depends on every analysis having refreshed its numbers
+    timed(timings, 'forecasting', forecasting.main,
+          ['--jobs', str(args.jobs), '--intervals', args.intervals] + (['--auto-order'] if args.auto_order else []))
+    timed(timings, 'json_creator', json_creator.main, ['--incremental'] if args.incremental else [])
+    if args.prerender:
+        timed(timings, 'prerender', prerender.main, [])
+    if args.publish:
+        timed(timings, 'publish', publish.main, [])
+
+    timings.append(('total', time.perf_counter() - start))
+    print_timings(timings)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
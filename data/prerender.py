@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Server-side snapshot of the counters in index.html.
+
+Computes what scripts.js shows on load (the daily view): every counter's
+value so far today, its period and rate lines and the last update time,
+from api/counters.json and api/calendar.json with the period math of
+getProgressThroughPeriod() and initializeCounters(), and writes them into
+the counter elements of index.html. The page then paints real numbers before
+any script or JSON has loaded, and scripts.js takes over from there. --watch regenerates the
+snapshot every minute, the resolution the page itself updates with.
+"""
+
+import argparse
+import html
+import json
+import math
+import os
+import re
+import sys
+import time
+
+import jalali
+from json_writer import atomic_write
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+counters_path = os.path.join(script_dir, 'api', 'counters.json')
+index_path = os.path.join(os.path.dirname(script_dir), 'index.html')
+
+# periodConfig in scripts.js
+PERIOD_LABELS = {
+    'real-time': 'شمارش زنده از زمان بارگذاری صفحه',
+    'daily': 'امروز تا این لحظه',
+    'monthly': 'این ماه تا این لحظه',
+    'yearly': 'امسال تا این لحظه',
+}
+PERIODS = ('daily', 'monthly', 'yearly')
+
+
+def progress_through_period(period, now, calendar):
+    """Share (0-1) of the current Iran day, Persian month or Persian year that has passed at now"""
+    if period == 'daily':
+        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return max(0.0, min(1.0, (now - start_of_day).total_seconds() / (24 * 60 * 60)))
+    if period in ('monthly', 'yearly'):
+        return max(0.0, min(1.0, calendar.progress(period, now)))
+    return 1.0
+
+
+def period_total(counter, period, now):
+    """Expected total of a whole period, the current month's forecast for the monthly one when there is one"""
+    if period == 'monthly' and counter.get('monthly_forecast'):
+        date = jalali.persian_date(now)
+        month = jalali.month_key(date['year'], date['month'])
+        if month in counter['monthly_forecast']:
+            return counter['monthly_forecast'][month]
+        return counter['monthly']
+    return counter[period] or counter['daily']
+
+
+def load_counters(path=counters_path):
+    """The counters of api/counters.json as {id: {'daily', 'monthly', 'yearly', 'monthly_forecast'}}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    monthly = index.get('monthly', {})
+    return {
+        counter_id: {'daily': daily, 'monthly': monthly_average, 'yearly': yearly,
+                     'monthly_forecast': monthly.get(counter_id)}
+        for counter_id, (daily, monthly_average, yearly) in index['counters'].items()
+    }
+
+
+def fa_number(value):
+    """A number the way toLocaleString('fa-IR') writes it: grouped, up to 3 decimals, Persian digits"""
+    text = f'{value:,.3f}'.rstrip('0').rstrip('.') if isinstance(value, float) else f'{value:,}'
+    return jalali.persian_digits(text).replace(',', '٬').replace('.', '٫')
+
+
+def snapshot(counters, period='daily', now=None, calendar=None):
+    """The text of every element the page fills in for period, keyed by element id"""
+    now = now or jalali.iran_time()
+    calendar = calendar or jalali.CalendarTable.build()
+    date = jalali.persian_date(now)
+    time_text = jalali.persian_time(now)
+    progress = progress_through_period(period, now, calendar)
+    if period == 'daily':
+        progress_text = f'تا ساعت {time_text}'
+    elif period == 'monthly':
+        progress_text = f"تا روز {date['day']} {date['month_name']}"
+    else:
+        progress_text = f"تا روز {calendar.day_of_year(now)} سال {date['year']}"
+    rate_unit = {'daily': 'در روز', 'monthly': 'در ماه', 'yearly': 'در سال'}[period]
+
+    texts = {'last-update': f"{time_text} - {date['formatted']}"}
+    for counter_id, counter in counters.items():
+        total = period_total(counter, period, now)
+        texts[counter_id] = fa_number(math.floor(total * progress))
+        texts[f'{counter_id}-period'] = f'{PERIOD_LABELS[period]} {progress_text}'
+        rate = total if period == 'monthly' else counter[period]
+        texts[f'{counter_id}-rate'] = f'~{fa_number(rate)} {rate_unit}'
+    return texts
+
+
+# An element with an id and only text inside, as the counter elements are written
+ELEMENT = re.compile(r'(?P<open><(?P<tag>\w+)\b[^>]*\bid="(?P<id>[^"]+)"[^>]*>)[^<]*(?P<close></(?P=tag)>)')
+
+
+def render(page, texts):
+    """Replace the text content of the elements of page whose id is in texts"""
+    def replace(match):
+        if match['id'] not in texts:
+            return match[0]
+        return match['open'] + html.escape(texts[match['id']], quote=False) + match['close']
+
+    return ELEMENT.sub(replace, page)
+
+
+def prerender(index=index_path, counters=counters_path, period='daily', now=None):
+    """Write the current counter values into index.html, return whether the file changed"""
+    with open(index, 'r', encoding='utf-8') as f:
+        page = f.read()
+    # The table the page itself loads, next to counters.json
+    calendar_file = os.path.join(os.path.dirname(counters), 'calendar.json')
+    calendar = jalali.CalendarTable.load(calendar_file) if os.path.exists(calendar_file) else None
+    rendered = render(page, snapshot(load_counters(counters), period, now, calendar))
+    if rendered == page:
+        return False
+    atomic_write(index, lambda f: f.write(rendered))
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bake the current counter values into index.html')
+    parser.add_argument('--index', default=index_path, help='page to update')
+    parser.add_argument('--counters', default=counters_path, help='counters index written by json_creator.py')
+    parser.add_argument('--period', choices=PERIODS, default='daily', help='period the page opens with')
+    parser.add_argument('--watch', type=float, nargs='?', const=60, metavar='SECONDS',
+                        help='keep regenerating the snapshot, every minute by default')
+    args = parser.parse_args(argv)
+
+    while True:
+        changed = prerender(args.index, args.counters, args.period)
+        print(f"{os.path.relpath(args.index)} {'updated' if changed else 'unchanged'} at {jalali.iran_time():%H:%M:%S} Iran time")
+        if not args.watch:
+            return 0
+        # Regenerate on the period boundary, like the page's own setInterval
+        time.sleep(args.watch - time.time() % args.watch)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Publish stage, run after json_creator.py.
+
+Copies every JSON and chart the pipeline produced into data/dist under a
+content-hashed name (counters.3f2a9c1b04.json), writes .gz and .br siblings
+at maximum compression for the text formats and records the mapping from the
+original site path to the hashed one in data/dist/manifest.json. It then
+marks index.html with <meta name="asset-manifest">; scripts.js only fetches
+the manifest on a page that carries the mark, in the background, and
+resolves its fetches through it once it is in. The first paint fetches the
+plain api/counters.json without waiting.
+
+json_creator.py calls unpublish() whenever it rewrites the plain endpoints,
+so a manifest from an earlier publish never points the page at stale copies.
+
+Hashed files never change, so static hosting can serve them with
+"Cache-Control: public, max-age=31536000, immutable" and pick the
+pre-compressed sibling that matches Accept-Encoding. Only manifest.json has to
+be revalidated. Unchanged files keep their name and are not rewritten.
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import os
+import re
+
+from json_writer import atomic_write, write_json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+site_root = os.path.dirname(script_dir)
+dist_dir = os.path.join(script_dir, 'dist')
+index_path = os.path.join(site_root, 'index.html')
+
+# Pipeline outputs, relative to data/
+ARTIFACT_PATTERNS = ['statistics.json', 'api/*.json', 'api/details/*.json', '*/*.png', '*/*.svg', '*/*.webp']
+
+# PNGs are already deflate-compressed, gzip or brotli would not shrink them
+COMPRESSIBLE = {'.json', '.svg', '.txt', '.csv'}
+
+HASH_LENGTH = 10
+
+# The mark publish leaves in index.html, scripts.js reads the manifest path from it
+MANIFEST_META = re.compile(r'\n?[ \t]*<meta name="asset-manifest"[^>]*>')
+
+
+def content_hash(content):
+    """Return the short hash used in published file names"""
+    return hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(relative_path, digest):
+    """Insert the content hash before the extension: api/counters.json -> api/counters.<hash>.json"""
+    root, ext = os.path.splitext(relative_path)
+    return f'{root}.{digest}{ext}'
+
+
+def write_bytes(path, content):
+    """Write content to path through a temporary file and rename it into place"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def publish_file(source_path, relative_path, out_dir):
+    """Write the hashed copy of one artifact and its compressed siblings, return the hashed path"""
+    with open(source_path, 'rb') as f:
+        content = f.read()
+
+    target_relative = hashed_name(relative_path, content_hash(content))
+    target_path = os.path.join(out_dir, target_relative)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+    # The name is the content, an existing file is already up to date
+    if not os.path.exists(target_path):
+        write_bytes(target_path, content)
+    if os.path.splitext(relative_path)[1] in COMPRESSIBLE:
+        if not os.path.exists(target_path + '.gz'):
+            # mtime=0 keeps the .gz bytes reproducible from the same content
+            write_bytes(target_path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None and not os.path.exists(target_path + '.br'):
+            write_bytes(target_path + '.br', brotli.compress(content, quality=11))
+
+    return target_relative
+
+
+def collect_artifacts(base_dir):
+    """Return the relative paths of every artifact to publish"""
+    found = set()
+    for pattern in ARTIFACT_PATTERNS:
+        for path in glob.glob(os.path.join(base_dir, pattern)):
+            relative_path = os.path.relpath(path, base_dir)
+            if not relative_path.startswith('dist' + os.sep):
+                found.add(relative_path)
+    return sorted(found)
+
+
+def prune(out_dir, keep):
+    """Remove hashed files that the manifest no longer points to"""
+    removed = 0
+    for path in glob.glob(os.path.join(out_dir, '**', '*'), recursive=True):
+        if os.path.isdir(path) or os.path.basename(path) == 'manifest.json':
+            continue
+        relative_path = os.path.relpath(path, out_dir)
+        for suffix in ('.gz', '.br'):
+            if relative_path.endswith(suffix):
+                relative_path = relative_path[:-len(suffix)]
+        if relative_path not in keep:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def set_manifest_meta(manifest_path, page_path=index_path):
+    """Point the asset-manifest mark of the page at manifest_path, or remove it when manifest_path is None"""
+    if not os.path.exists(page_path):
+        return
+    with open(page_path, 'r', encoding='utf-8') as f:
+        page = f.read()
+    updated = MANIFEST_META.sub('', page)
+    if manifest_path is not None:
+        updated = updated.replace('</head>', f'    <meta name="asset-manifest" content="{manifest_path}">\n</head>', 1)
+    if updated != page:
+        atomic_write(page_path, lambda f: f.write(updated))
+
+
+def unpublish(out_dir=dist_dir, page_path=index_path):
+    """Drop the manifest and the page's mark, the hashed copies no longer match the plain endpoints"""
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    set_manifest_meta(None, page_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Publish content-hashed, pre-compressed build artifacts')
+    parser.add_argument('--out-dir', default=dist_dir, help='directory for the hashed files and manifest.json')
+    parser.add_argument('--index', default=index_path, help='page to mark with the manifest path')
+    parser.add_argument('--prune', action='store_true', help='delete hashed files left over from older builds')
+    args = parser.parse_args(argv)
+
+    if brotli is None:
+        print("brotli is not installed, only .gz siblings are written (pip install brotli)")
+
+    assets = {}
+    published = set()
+    for relative_path in collect_artifacts(script_dir):
+        target_relative = publish_file(os.path.join(script_dir, relative_path), relative_path, args.out_dir)
+        published.add(target_relative)
+        # Keys and values are site paths, the way scripts.js fetches them
+        site_path = os.path.relpath(os.path.join(script_dir, relative_path), site_root).replace(os.sep, '/')
+        assets[site_path] = os.path.relpath(os.path.join(args.out_dir, target_relative), site_root).replace(os.sep, '/')
+
+    manifest_path = os.path.join(args.out_dir, 'manifest.json')
+    write_json(manifest_path, {'assets': assets}, compact=True)
+    set_manifest_meta(os.path.relpath(manifest_path, site_root).replace(os.sep, '/'), args.index)
+    print(f"Published {len(assets)} artifacts to {args.out_dir}")
+
+    if args.prune:
+        print(f"Removed {prune(args.out_dir, published)} stale files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+In-memory index of the yearly time series.
+
+Every (topic, country) series is one row of a single contiguous float array
+that shares one year axis, so looking a series up is a dict access, slicing
+it by years is an offset computation and exporting it is a view, whatever
+the number of series. Missing years are NaN. The rows keep the order of the
+CSV they come from, which the world tables rely on.
+"""
+
+import numpy as np
+import pandas as pd
+
+import store
+
+
+class TimeSeriesIndex:
+    """Series keyed by (topic, country) over a shared, gapless year axis"""
+
+    def __init__(self, keys, years, values, sources=None):
+        self.keys = list(keys)
+        self.years = np.asarray(years, dtype=np.int64)
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.sources = list(sources) if sources is not None else [None] * len(self.keys)
+        if self.values.shape != (len(self.keys), len(self.years)):
+            raise ValueError(f"values has shape {self.values.shape}, expected {(len(self.keys), len(self.years))}")
+        if len(self.years) and not np.array_equal(self.years, np.arange(self.years[0], self.years[0] + len(self.years))):
+            raise ValueError("The year axis must be sorted and without gaps")
+
+        self._rows = {}
+        self._topics = {}
+        for row, (topic, country) in enumerate(self.keys):
+            # A repeated key resolves to its first row, like the CSV lookups did
+            self._rows.setdefault((topic, country), row)
+            self._topics.setdefault(topic, []).append(row)
+
+    @classmethod
+    def from_long(cls, rows):
+        """Build the index from long rows with row, topic, country, year, value and optionally source"""
+        first = min(rows['year'])
+        years = np.arange(first, max(rows['year']) + 1)
+        order = rows.drop_duplicates('row').sort_values('row')
+        position = {row: index for index, row in enumerate(order['row'])}
+
+        values = np.full((len(order), len(years)), np.nan)
+        values[rows['row'].map(position).to_numpy(), rows['year'].to_numpy() - first] = rows['value'].to_numpy(dtype=float)
+        sources = order['source'].tolist() if 'source' in order.columns else None
+        return cls(zip(order['topic'], order['country']), years, values, sources)
+
+    @classmethod
+    def from_store(cls, dataset, connection=None):
+        """Build the index of one wide time series dataset of the store"""
+        columns = ('row', 'topic', 'country', 'year', 'value', 'source')
+        return cls.from_long(store.series(dataset, columns, connection=connection))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def topics(self):
+        return list(self._topics)
+
+    def rows(self, topic):
+        """Positions of a topic's series, in CSV order"""
+        return self._topics.get(topic, [])
+
+    def countries(self, topic):
+        return [self.keys[row][1] for row in self.rows(topic)]
+
+    def row(self, topic, country):
+        return self._rows[(topic, country)]
+
+    def get(self, topic, country):
+        """The values of one series over the whole year axis, a view"""
+        return self.values[self._rows[(topic, country)]]
+
+    def source(self, topic, country):
+        return self.sources[self._rows[(topic, country)]]
+
+    def columns(self, start=None, end=None):
+        """The slice of the year axis from start to end, both included"""
+        first = int(self.years[0])
+        low = 0 if start is None else min(max(start - first, 0), len(self.years))
+        high = len(self.years) if end is None else min(max(end - first + 1, 0), len(self.years))
+        return slice(low, max(low, high))
+
+    def between(self, topic, country, start=None, end=None):
+        """Years and values of one series from start to end, both views"""
+        columns = self.columns(start, end)
+        return self.years[columns], self.get(topic, country)[columns]
+
+    def chart_data(self, rows=None):
+        """Values of the given rows (default: all) as lists of ints with None for missing years"""
+        values = self.values if rows is None else self.values[rows]
+        missing = np.isnan(values)
+        # One conversion for the whole block, NaN cells are overwritten with None afterwards
+        export = np.where(missing, 0, values).round().astype(np.int64).astype(object)
+        export[missing] = None
+        return export.tolist()
+
+    def frame(self):
+        """A float frame indexed by (Topic, Country) with one column per year"""
+        index = pd.MultiIndex.from_tuples(self.keys, names=['Topic', 'Country'])
+        return pd.DataFrame(self.values, index=index, columns=self.years.tolist())
@@ -0,0 +1,69 @@
+"""
+Sharded JSON endpoints for the website.
+
+The page only needs the three averages of every counter (and the monthly
+forecasts of the counters that have one) to start counting, so the build
+publishes them in a tiny api/counters.json and puts each counter's modal
+data (texts, sources and the chart payload of chart_payload.py) in its own
+api/details/<counter-id>.json, which scripts.js fetches when the modal opens.
+api/calendar.json carries the Persian calendar table the counters' period
+progress is looked up in.
+"""
+
+import os
+
+from chart_payload import DEFAULT_ENCODING, shard_details
+from jalali import CalendarTable
+from json_writer import write_json
+from topics import COUNTERS, get_path
+
+
+def counters_index(document):
+    """Return the [daily, monthly, yearly] averages of every counter and the monthly forecasts there are"""
+    iran_statistics = document['iran_statistics']
+    counters = {}
+    monthly = {}
+    for counter in COUNTERS:
+        try:
+            statistics = get_path(iran_statistics['statistics'], counter['statistics_path'])
+        except KeyError:
+            continue
+        counters[counter['id']] = [
+            statistics['daily_average'],
+            statistics['monthly_average'],
+            statistics['yearly_average'],
+        ]
+        if 'monthly_forecast' in statistics:
+            monthly[counter['id']] = statistics['monthly_forecast']
+    return {
+        'last_updated': iran_statistics['metadata']['last_updated'],
+        'counters': counters,
+        'monthly': monthly,
+    }
+
+
+def write_shards(document, api_dir, details_keys=None, chart_encoding=DEFAULT_ENCODING):
+    """
+    Write api/counters.json, api/calendar.json and the per-counter detail files.
+
+    details_keys limits the detail files that are rewritten to the given
+    iran_statistics.details keys; missing detail files are always written.
+    chart_encoding is how the chart series are written, see chart_payload.py.
+    """
+    details_dir = os.path.join(api_dir, 'details')
+    os.makedirs(details_dir, exist_ok=True)
+
+    write_json(os.path.join(api_dir, 'counters.json'), counters_index(document), compact=True)
+    write_json(os.path.join(api_dir, 'calendar.json'), CalendarTable.build().to_json(), compact=True)
+
+    details = document['iran_statistics']['details']
+    written = []
+    for counter in COUNTERS:
+        if counter['details_key'] not in details:
+            continue
+        path = os.path.join(details_dir, f"{counter['id']}.json")
+        if details_keys is not None and counter['details_key'] not in details_keys and os.path.exists(path):
+            continue
+        write_json(path, shard_details(details[counter['details_key']], chart_encoding), compact=True)
+        written.append(counter['id'])
+    return written
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Long-format store of every time series CSV.
+
+The CSVs stay the files that are edited by hand. store.sqlite holds the same
+numbers once, typed and in long format, one row per dataset, topic, country,
+year, month and measure with its value and source, so the scripts read only
+the rows and columns they ask for instead of parsing (and for the wide tables
+melting) every CSV on every run. The database is opened memory-mapped.
+
+A dataset is converted again only when one of the CSVs it comes from
+changed, which the files table records by content hash. Every reader
+refreshes the store first, so editing a CSV never needs a manual step.
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+from manifest import file_digest
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+store_path = os.path.join(script_dir, 'store.sqlite')
+
+# Bump when a loader below changes so every dataset is converted again
+STORE_VERSION = 1
+
+MMAP_BYTES = 64 * 1024 * 1024
+
+# row is the position of the source row in its CSV, it keeps the order of the tables
+COLUMNS = ['dataset', 'row', 'topic', 'country', 'year', 'month', 'measure', 'value', 'source']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    dataset TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    country TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER,
+    measure TEXT NOT NULL,
+    value REAL,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS series_by_dataset ON series (dataset, topic, measure);
+CREATE TABLE IF NOT EXISTS files (
+    dataset TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+"""
+
+
+def clean_year_columns(frame, year_columns):
+    """Convert the year columns of a whole frame to nullable integers at once"""
+    values = frame[year_columns].apply(
+        lambda column: pd.to_numeric(column.astype(str).str.replace(',', '', regex=False).str.strip(), errors='coerce')
+        if not pd.api.types.is_numeric_dtype(column) else column
+    )
+    # Non-integer cells are treated as missing, like blank ones
+    return values.where(values == values.round()).astype('Int64')
+
+
+def _path(name):
+    return os.path.join(script_dir, *name.split('/'))
+
+
+def _wide(paths):
+    """
+    A Topic[, Country] x year table. The Iran table has no Country column,
+    the world table gets its sources from the second CSV, matched by position
+    within a topic like json_creator.py always did.
+    """
+    frame = pd.read_csv(_path(paths[0]), thousands=',')
+    if 'Country' not in frame.columns:
+        frame.insert(1, 'Country', 'Iran')
+    year_columns = frame.columns[2:]
+    values = clean_year_columns(frame, year_columns).astype('float64')
+
+    sources = pd.Series(None, index=frame.index, dtype=object)
+    if len(paths) > 1:
+        table = pd.read_csv(_path(paths[1]))
+        for topic, rows in frame.groupby('Topic', sort=False):
+            links = table.loc[table['Topic'] == topic, 'Source'].tolist()
+            for position, row in enumerate(rows.index[:len(links)]):
+                sources[row] = links[position]
+
+    return pd.DataFrame({
+        'row': frame.index.repeat(len(year_columns)),
+        'topic': frame['Topic'].repeat(len(year_columns)).to_numpy(),
+        'country': frame['Country'].repeat(len(year_columns)).to_numpy(),
+        'year': [int(year) for year in year_columns] * len(frame),
+        'month': None,
+        'measure': 'value',
+        'value': values.to_numpy().ravel(),
+        'source': sources.repeat(len(year_columns)).to_numpy(),
+    })
+
+
+def _topic_table(paths, topic, measures, year='year', month=None):
+    """A topic script CSV with one row per year (or month) and one column per measure"""
+    frame = pd.read_csv(_path(paths[0])).dropna(subset=[year])
+    # Whole-year rows are marked 'all' in the month column
+    months = pd.to_numeric(frame[month], errors='coerce') if month else None
+    parts = []
+    for measure in measures:
+        parts.append(pd.DataFrame({
+            'row': frame.index,
+            'topic': topic,
+            'country': 'Iran',
+            'year': frame[year].astype(int),
+            'month': months,
+            'measure': measure,
+            'value': pd.to_numeric(frame[measure], errors='coerce'),
+            'source': None,
+        }))
+    return pd.concat(parts, ignore_index=True)
+
+
+# Dataset name: (CSVs it is converted from, relative to data/; loader)
+DATASETS = {
+    'time_series_Iran.csv': (('time_series_Iran.csv',), _wide),
+    'time_series_World.csv': (('time_series_World.csv', 'world_sources.csv'), _wide),
+    'Accidents/data_all.csv': (('Accidents/data_all.csv',),
+                               lambda paths: _topic_table(paths, 'Car Accidents', ['death', 'wounded'],
+                                                          month='month')),
+    # The first of the two year columns of data_12.csv is not the year of the row
+    'Accidents/data_12.csv': (('Accidents/data_12.csv',),
+                              lambda paths: _topic_table(paths, 'Car Accidents', ['death', 'wounded'],
+                                                         year='year.1', month='month')),
+    'Air/data.csv': (('Air/data.csv',), lambda paths: _topic_table(paths, 'Air Pollution', ['Deaths'])),
+    'Education/data.csv': (('Education/data.csv',), lambda paths: _topic_table(paths, 'Education Dropout', ['Students'])),
+    'Workers/data.csv': (('Workers/data.csv',), lambda paths: _topic_table(paths, 'Workers Died', ['death'])),
+    'Death penalty/data.csv': (('Death penalty/data.csv',),
+                               lambda paths: _topic_table(paths, 'Death Penalty', ['Death penalty'])),
+}
+
+
+def dataset_digest(dataset):
+    """Hash of the CSVs of one dataset and the store version"""
+    digest = hashlib.sha256(f'v{STORE_VERSION}'.encode('utf-8'))
+    for name in DATASETS[dataset][0]:
+        digest.update(f'\0{name}\0{file_digest(_path(name))}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def refresh(connection):
+    """Convert every dataset whose CSVs changed since it was stored, return their names"""
+    connection.executescript(SCHEMA)
+    digests = {dataset: dataset_digest(dataset) for dataset in DATASETS}
+    stored = dict(connection.execute('SELECT dataset, digest FROM files'))
+    if all(stored.get(dataset) == digest for dataset, digest in digests.items()):
+        return []
+
+    # The analyses run in parallel, the first one to get the write lock converts
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        stored = dict(connection.execute('SELECT dataset, digest FROM files'))
+        stale = [dataset for dataset, digest in digests.items() if stored.get(dataset) != digest]
+        for dataset in stale:
+            files, loader = DATASETS[dataset]
+            rows = loader(files)
+            rows.insert(0, 'dataset', dataset)
+            rows = rows[COLUMNS].astype(object).where(rows[COLUMNS].notna(), None)
+            connection.execute('DELETE FROM series WHERE dataset = ?', (dataset,))
+            connection.executemany(f"INSERT INTO series ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                                   rows.itertuples(index=False, name=None))
+            connection.execute('INSERT OR REPLACE INTO files (dataset, digest) VALUES (?, ?)',
+                               (dataset, digests[dataset]))
+        connection.execute('COMMIT')
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    return stale
+
+
+def connect(path=store_path, update=True):
+    """Open the store memory-mapped, bringing it up to date with the CSVs first unless update is False"""
+    # Autocommit mode, refresh() manages its own transaction
+    connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+    connection.execute(f'PRAGMA mmap_size = {MMAP_BYTES}')
+    if update:
+        refresh(connection)
+    return connection
+
+
+def series(dataset, columns=('topic', 'country', 'year', 'value'), connection=None, **where):
+    """
+    The long rows of one dataset, in CSV order, with only the given columns.
+
+    Keyword arguments filter on equality, e.g. topic='Air Pollution'.
+    """
+    for column in (*columns, *where):
+        if column not in COLUMNS:
+            raise ValueError(f"Unknown store column {column!r}")
+    filters = ''.join(f' AND {column} = ?' for column in where)
+    query = f"SELECT {', '.join(columns)} FROM series WHERE dataset = ?{filters} ORDER BY row, year, measure"
+    owned = connection is None
+    connection = connection or connect()
+    try:
+        return pd.read_sql_query(query, connection, params=(dataset, *where.values()))
+    finally:
+        if owned:
+            connection.close()
+
+
+def frame(dataset, measures=None, connection=None):
+    """
+    A topic script dataset back in the shape of its CSV: year (and month when
+    the CSV has one) and one column per measure. Measures without a missing
+    value come back as integers, like pd.read_csv() reads them.
+    """
+    rows = series(dataset, ('row', 'year', 'month', 'measure', 'value'), connection=connection)
+    if measures is not None:
+        rows = rows[rows['measure'].isin(measures)]
+    values = rows.pivot(index='row', columns='measure', values='value')
+    values = values[measures if measures is not None else rows['measure'].unique()]
+    keys = rows.drop_duplicates('row').set_index('row')[['year', 'month']]
+    if keys['month'].isna().all():
+        keys = keys.drop(columns='month')
+    elif keys['month'].notna().all():
+        keys['month'] = keys['month'].astype('int64')
+    result = keys.join(values).reset_index(drop=True)
+    result.columns.name = None
+    for column in values.columns:
+        whole = result[column].notna().all() and (result[column] == result[column].round()).all()
+        if whole:
+            result[column] = result[column].astype('int64')
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bring store.sqlite up to date with the time series CSVs')
+    parser.add_argument('--rebuild', action='store_true', help='convert every dataset again')
+    args = parser.parse_args(argv)
+
+    if args.rebuild and os.path.exists(store_path):
+        os.remove(store_path)
+    connection = connect(update=False)
+    try:
+        converted = refresh(connection)
+    finally:
+        connection.close()
+    if converted:
+        print(f"Converted into {os.path.basename(store_path)}: {', '.join(converted)}")
+    else:
+        print(f"{os.path.basename(store_path)} is up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Topic registry for the statistics build.
+
+Every topic that json_creator.py publishes is declared here once: the value
+of the 'Topic' column in the input CSVs, where its counter averages live under
+iran_statistics.statistics, which iran_statistics.details entry holds its
+modal data, which analysis script (relative to data/) refreshes its
+numbers and which CSV, if any, that script writes its monthly forecast to.
+Adding a topic to the website is a matter of adding a row here.
+"""
+
+TOPICS = [
+    {
+        'topic': 'Car Accidents',
+        'analysis': ('Accidents', 'Accidents_Process.py'),
+        'statistics_path': ('traffic_accidents_deaths', 'deaths'),
+        'details_key': 'traffic_accidents_deaths',
+        'world': True,
+        'monthly_forecast': ('Accidents', 'monthly_forecast.csv'),
+    },
+    {
+        'topic': 'Air Pollution',
+        'analysis': ('Air', 'Data_analysis.py'),
+        'statistics_path': ('air_pollution', 'deaths'),
+        'details_key': 'air_pollution_deaths',
+        'world': True,
+        'monthly_forecast': None,
+    },
+    {
+        'topic': 'Education Dropout',
+        'analysis': ('Education', 'Education_process.py'),
+        'statistics_path': ('education', 'dropouts'),
+        'details_key': 'education_dropouts',
+        'world': False,
+        'monthly_forecast': None,
+    },
+    {
+        'topic': 'Workers Died',
+        'analysis': ('Workers', 'data_analysis.py'),
+        'statistics_path': ('workers', 'deaths'),
+        'details_key': 'workers_deaths',
+        'world': True,
+        'monthly_forecast': None,
+    },
+    {
+        'topic': 'Death Penalty',
+        'analysis': ('Death penalty', 'Data_analysis.py'),
+        'statistics_path': ('death_penalty',),
+        'details_key': 'death_penalty',
+        'world': False,
+        'monthly_forecast': None,
+    },
+]
+
+
+# Counters shown on the page, keyed by the element id used in index.html and
+# scripts.js. Counters without a topic above are maintained by hand in
+# statistics.json but are still published through the sharded endpoints.
+COUNTERS = [
+    {'id': 'traffic-deaths', 'statistics_path': ('traffic_accidents_deaths', 'deaths'), 'details_key': 'traffic_accidents_deaths'},
+    {'id': 'education-dropouts', 'statistics_path': ('education', 'dropouts'), 'details_key': 'education_dropouts'},
+    {'id': 'pollution-deaths', 'statistics_path': ('air_pollution', 'deaths'), 'details_key': 'air_pollution_deaths'},
+    {'id': 'workers-deaths', 'statistics_path': ('workers', 'deaths'), 'details_key': 'workers_deaths'},
+    {'id': 'unemployment-claims', 'statistics_path': ('employment', 'unemployment_claims'), 'details_key': 'unemployment_claims'},
+    {'id': 'new-births', 'statistics_path': ('demographics', 'births'), 'details_key': 'births'},
+    {'id': 'violence-against-women', 'statistics_path': ('social', 'violence_against_women_deaths'), 'details_key': 'violence_against_women_deaths'},
+    {'id': 'soil-erosion', 'statistics_path': ('environment', 'soil_erosion'), 'details_key': 'soil_erosion'},
+    {'id': 'death-penalty', 'statistics_path': ('death_penalty',), 'details_key': 'death_penalty'},
+]
+
+
+def get_path(document, path):
+    """Return the nested dict of document found by following the keys in path"""
+    node = document
+    for key in path:
+        node = node[key]
+    return node
+
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Validation of every input CSV against its declared schema.
+
+Runs first in the pipeline, before the store conversion and any model is
+fitted, and checks in one pass over each file: the header (names, order,
+repeated names), the year columns of the wide tables (integers, increasing),
+the type of every declared column (all cells of a column at once) and
+duplicate keys. Errors abort the build, warnings only go to the report,
+validation_report.json, which lists every finding with its file, check,
+column and CSV line numbers.
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import pandas as pd
+
+from json_writer import write_json
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+report_path = os.path.join(script_dir, 'validation_report.json')
+
+# Cells read as missing, mixing several of them in one column is reported
+MISSING = ('', 'NA', 'N/A', 'nan', 'NaN')
+
+YEAR_RANGE = (1300, 1500)
+
+# Checks that never fail the build, the data is still read correctly
+WARNINGS = ('missing_markers', 'thousands', 'year_gaps', 'empty_rows', 'missing_key')
+
+# Line numbers listed per finding
+MAX_LINES = 10
+
+# Per file, relative to data/:
+#   columns       the header, in order (wide tables: the columns before the years)
+#   year_columns  the rest of the header are Persian years
+#   types         'text', 'number', 'int', 'year' (an int in YEAR_RANGE) or 'month' (1-12 or 'all')
+#   key           columns that identify a row
+#   warn          checks that are only warnings for this file
+SCHEMAS = {
+    'data.csv': {
+        'columns': ['Topic', 'Year', 'Forecast_Number', 'Unit', 'Real_Number', 'Daily_Average', 'Monthly_Average'],
+        'types': {'Topic': 'text', 'Year': 'year', 'Forecast_Number': 'number', 'Unit': 'text',
+                  'Real_Number': 'number', 'Daily_Average': 'number', 'Monthly_Average': 'number'},
+        'key': ['Topic'],
+    },
+    'details.csv': {
+        'columns': ['Topic', 'Title', 'Description', 'Sources', 'Sources_Link'],
+        'types': {'Topic': 'text'},
+        'key': ['Topic'],
+    },
+    'time_series_Iran.csv': {
+        'columns': ['Topic'],
+        'year_columns': True,
+        'types': {'Topic': 'text'},
+        'key': ['Topic'],
+    },
+    'time_series_World.csv': {
+        'columns': ['Topic', 'Country'],
+        'year_columns': True,
+        'types': {'Topic': 'text', 'Country': 'text'},
+        'key': ['Topic', 'Country'],
+    },
+    'world_sources.csv': {
+        'columns': ['Topic', 'Country', 'Source'],
+        'types': {'Topic': 'text', 'Country': 'text', 'Source': 'text'},
+        'key': ['Topic', 'Country'],
+    },
+    'Accidents/data_all.csv': {
+        'columns': ['year', 'month', 'death', 'wounded', 'average_daily', 'average_monthly'],
+        'types': {'year': 'year', 'month': 'month', 'death': 'int', 'wounded': 'int',
+                  'average_daily': 'number', 'average_monthly': 'number'},
+        'key': ['year', 'month'],
+    },
+    # The first year column is left over from editing, the second one is the year of the row
+    'Accidents/data_12.csv': {
+        'columns': ['year', 'year', 'month', 'death', 'wounded'],
+        'types': {'month': 'month', 'death': 'int', 'wounded': 'int'},
+        'key': [1, 'month'],
+        'warn': ['repeated_header'],
+    },
+    # Old export with two digit years, the build reads data_all.csv and data_12.csv
+    'Accidents/data.csv': {
+        'columns': ['year', 'month', 'death', 'wounded'],
+        'types': {'year': 'year', 'month': 'month', 'death': 'int', 'wounded': 'int'},
+        'key': ['year', 'month'],
+        'warn': ['type'],
+    },
+    'Accidents/world.csv': {
+        'columns': ['Topic', 'Country'],
+        'year_columns': True,
+        'types': {'Topic': 'text', 'Country': 'text'},
+        'key': ['Topic', 'Country'],
+    },
+    'Accidents/sources.csv': {
+        'columns': ['Country', 'Source'],
+        'types': {'Country': 'text', 'Source': 'text'},
+        'key': ['Country'],
+    },
+    'Air/data.csv': {
+        'columns': ['year', 'Deaths'],
+        'types': {'year': 'year', 'Deaths': 'int'},
+        'key': ['year'],
+    },
+    'Education/data.csv': {
+        'columns': ['year', 'Students'],
+        'types': {'year': 'year', 'Students': 'int'},
+        'key': ['year'],
+    },
+    'Workers/data.csv': {
+        'columns': ['year', 'death'],
+        'types': {'year': 'year', 'death': 'int'},
+        'key': ['year'],
+    },
+    'Death penalty/data.csv': {
+        'columns': ['year', 'Death penalty'],
+        'types': {'year': 'year', 'Death penalty': 'int'},
+        'key': ['year'],
+    },
+}
+
+
+def _lines(mask):
+    """CSV line numbers (the header is line 1) of the True cells of a mask over rows or (row, column) cells"""
+    rows = mask[mask].index
+    if isinstance(rows, pd.MultiIndex):
+        rows = rows.get_level_values(0).unique()
+    return [int(row) + 2 for row in rows[:MAX_LINES]]
+
+
+def check_header(header, schema):
+    """Findings about the header row, as (check, column, lines, message)"""
+    findings = []
+    expected = schema['columns']
+    if header[:len(expected)] != expected or (not schema.get('year_columns') and len(header) != len(expected)):
+        findings.append(('header', None, [1], f"expected the columns {expected}, found {header}"))
+    repeated = sorted({name for name in header if header.count(name) > 1})
+    if repeated:
+        findings.append(('repeated_header', None, [1], f"repeated column names {repeated}"))
+
+    if schema.get('year_columns'):
+        names = header[len(expected):]
+        years = pd.to_numeric(pd.Series(names, dtype=object), errors='coerce')
+        if years.isna().any():
+            not_years = [name for name, year in zip(names, years) if pd.isna(year)]
+            findings.append(('year_columns', None, [1], f"year columns that are not years: {not_years}"))
+        elif not years.is_monotonic_increasing or not years.is_unique:
+            out_of_order = [name for name, previous in zip(names[1:], years) if int(name) <= previous]
+            findings.append(('year_order', None, [1], f"year columns not increasing at {out_of_order}"))
+        elif (years.diff().dropna() != 1).any():
+            findings.append(('year_gaps', None, [1], "year columns skip years"))
+    return findings
+
+
+def check_column(values, kind):
+    """Findings about a column of raw strings, or a whole block of columns stacked into one"""
+    findings = []
+    cells = values.str.strip()
+    missing = cells.isin(MISSING)
+    markers = sorted(cells[missing].unique())
+    if len(markers) > 1:
+        findings.append(('missing_markers', _lines(missing), f"missing values written as {markers}"))
+    if kind == 'text':
+        return findings
+
+    present = ~missing
+    if kind == 'month':
+        numbers = pd.to_numeric(cells.where(cells != 'all', '1'), errors='coerce')
+        bad = present & ~numbers.between(1, 12)
+        if bad.any():
+            findings.append(('type', _lines(bad), "expected a month number or 'all'"))
+        return findings
+
+    separators = present & cells.str.contains(',', regex=False)
+    if separators.any():
+        findings.append(('thousands', _lines(separators), "numbers written with thousands separators"))
+    numbers = pd.to_numeric(cells.str.replace(',', '', regex=False), errors='coerce')
+    bad = present & numbers.isna()
+    if kind in ('int', 'year'):
+        bad |= present & numbers.notna() & (numbers != numbers.round())
+    if kind == 'year':
+        bad |= present & numbers.notna() & ~numbers.between(*YEAR_RANGE)
+    if bad.any():
+        expected = {'number': 'a number', 'int': 'a whole number',
+                    'year': f'a year from {YEAR_RANGE[0]} to {YEAR_RANGE[1]}'}[kind]
+        findings.append(('type', _lines(bad), f"expected {expected}, found {sorted(cells[bad].unique())[:MAX_LINES]}"))
+    return findings
+
+
+def validate_file(name, schema):
+    """Validate one CSV, return its report entry"""
+    path = os.path.join(script_dir, *name.split('/'))
+    entry = {'rows': 0, 'errors': [], 'warnings': []}
+    warn = set(schema.get('warn', ()))
+
+    def add(check, column, lines, message):
+        level = 'warnings' if check in warn or check in WARNINGS else 'errors'
+        entry[level].append({'check': check, 'column': column, 'lines': lines, 'message': message})
+
+    if not os.path.exists(path):
+        add('missing_file', None, [], "file not found")
+        return entry
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        header = next(csv.reader(f), [])
+    for finding in check_header(header, schema):
+        add(*finding)
+
+    # Raw strings, read once; positions instead of names because names can repeat
+    frame = pd.read_csv(path, dtype=str, keep_default_na=False, header=None, skiprows=1, names=range(len(header)))
+    entry['rows'] = len(frame)
+    if frame.empty:
+        return entry
+    position = {column: header.index(column) for column in schema['types'] if column in header}
+
+    empty = frame.apply(lambda column: column.str.strip().isin(MISSING)).all(axis=1)
+    if empty.any():
+        add('empty_rows', None, _lines(empty), "rows without any value")
+    rows = frame[~empty]
+
+    for column, kind in schema['types'].items():
+        if column in position:
+            for check, lines, message in check_column(rows[position[column]], kind):
+                add(check, column, lines, message)
+    if schema.get('year_columns') and len(header) > len(schema['columns']):
+        # Every year column at once, stacked into a single column of cells
+        block = rows.iloc[:, len(schema['columns']):].stack()
+        for check, lines, message in check_column(block, 'int'):
+            add(check, 'years', lines, message)
+
+    # Key columns by name, or by position where the name is repeated
+    key = [column if isinstance(column, int) else header.index(column) if column in header else None
+           for column in schema['key']]
+    if None not in key:
+        incomplete = rows[key].apply(lambda column: column.str.strip().isin(MISSING)).any(axis=1)
+        if incomplete.any():
+            add('missing_key', ', '.join(str(column) for column in schema['key']), _lines(incomplete),
+                "rows without a key, the build skips them")
+        duplicated = rows[~incomplete].duplicated(subset=key, keep=False)
+        if duplicated.any():
+            add('duplicate_key', ', '.join(str(column) for column in schema['key']), _lines(duplicated),
+                "rows with the same key")
+    return entry
+
+
+def validate(schemas=None):
+    """Validate every declared CSV and return the report"""
+    files = {name: validate_file(name, schema) for name, schema in (schemas or SCHEMAS).items()}
+    return {
+        'ok': not any(entry['errors'] for entry in files.values()),
+        'errors': sum(len(entry['errors']) for entry in files.values()),
+        'warnings': sum(len(entry['warnings']) for entry in files.values()),
+        'files': files,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validate the input CSVs before the build')
+    parser.add_argument('--report', default=report_path, help='where to write the JSON report')
+    parser.add_argument('--strict', action='store_true', help='fail on warnings too')
+    parser.add_argument('--quiet', action='store_true', help='only print errors')
+    args = parser.parse_args(argv)
+
+    report = validate()
+    write_json(args.report, report)
+    for name, entry in report['files'].items():
+        for level in ('errors', 'warnings'):
+            if level == 'warnings' and args.quiet:
+                continue
+            for finding in entry[level]:
+                column = f" [{finding['column']}]" if finding['column'] else ''
+                lines = f" (lines {', '.join(map(str, finding['lines']))})" if finding['lines'] else ''
+                print(f"{level[:-1]}: {name}{column}: {finding['message']}{lines}")
+    print(f"Validated {len(report['files'])} files: {report['errors']} errors, {report['warnings']} warnings, "
+          f"report in {os.path.relpath(args.report)}")
+    failed = not report['ok'] or (args.strict and report['warnings'])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())